@@ -1,24 +1,32 @@
-import os, json
 import hdefereval
 
-import sdm.houdini
-from sdm.houdini.dialog import checkForUpdates
-from sdm.houdini.shelves import addShelf
-from sdm.houdini.node import applyDefaultShapesAndColors
+# Imports are done within the deferred functions, so that SDMTools adds next to nothing to
+# Houdini's startup time: the (UI, network) modules they need are loaded once the UI is up
 
 def checkUpdates():
-	settingsPath = os.path.join(sdm.houdini.folder, 'settings.json')
+	from sdm.houdini.fileutils import SettingsFile
 
-	if os.path.exists(settingsPath):
-			with open(settingsPath) as file:
-				settingsJson = json.loads(file.read())
+	if not SettingsFile().get('autoCheckUpdates', False):
+		return
 
-				autoCheckUpdates = settingsJson.get('autoCheckUpdates', False)
+	from sdm.houdini.updates import checkForUpdatesInBackground
 
-				if not autoCheckUpdates:
-					return
+	checkForUpdatesInBackground(promptForUpdates)
 
-				checkForUpdates(silent=True)
+def promptForUpdates(newVersions, allVersions):
+	from sdm.houdini.dialog import promptForUpdates
+
+	promptForUpdates(newVersions, allVersions)
+
+def addShelf():
+	from sdm.houdini.shelves import addShelf
+
+	addShelf()
+
+def applyDefaultShapesAndColors():
+	from sdm.houdini.node import applyDefaultShapesAndColors
+
+	applyDefaultShapesAndColors()
 
 hdefereval.executeDeferred(checkUpdates)
 hdefereval.executeDeferred(addShelf)
@@ -0,0 +1,462 @@
+"""Persistent, local caches for expensive file system queries, such as the sequences discovered
+in a directory. Caches are kept as compact JSON files under the SDMTools cache directory, and are
+bounded by entry count and size with least-recently-used eviction.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, json, time, hashlib, threading, logging
+from collections import OrderedDict
+
+from sdm.utils import getCacheDir, writeFileAtomic, linkFileAtomic
+from sdm.files.fileclassification import iterFrameRuns
+
+logger = logging.getLogger(__name__)
+
+class LRUFileCache(object):
+	"""A dictionary of JSON-serializable entries persisted to a single file. The
+	file is loaded on first use and rewritten atomically on save, so concurrent
+	sessions can never see a partially written cache. Once the cache exceeds its
+	entry or size budget, the least recently used entries are evicted.
+
+	All public methods are safe to call from multiple threads.
+	"""
+
+	def __init__(self, path, maxEntries=512, maxBytes=16 * 1024 * 1024):
+		"""
+		Args:
+			path (str): The file the cache is persisted to
+			maxEntries (int, optional): The maximum number of entries to keep
+			maxBytes (int, optional): The maximum (approximate) size of the cache file
+		"""
+		self._path = path
+		self._maxEntries = maxEntries
+		self._maxBytes = maxBytes
+		self._entries = None
+		self._sizes = {}
+		self._totalBytes = 0
+		self._lock = threading.RLock()
+
+	def getPath(self):
+		return self._path
+
+	def _load(self):
+		if self._entries is not None:
+			return
+
+		self._entries = OrderedDict()
+
+		if not os.path.exists(self._path):
+			return
+
+		try:
+			with open(self._path) as f:
+				entries = json.load(f, object_pairs_hook=OrderedDict)
+		except (IOError, OSError, ValueError): # Unreadable or corrupt - start over
+			logger.warning('Could not load cache file: {}, ignoring'.format(self._path), exc_info=True)
+			return
+
+		for key, value in entries.items():
+			self._store(key, value)
+
+	def _store(self, key, value):
+		size = len(json.dumps(value, separators=(',', ':'))) + len(key)
+
+		self._discard(key)
+
+		self._entries[key] = value
+		self._sizes[key] = size
+		self._totalBytes += size
+
+	def _discard(self, key):
+		if key in self._entries:
+			del self._entries[key]
+			self._totalBytes -= self._sizes.pop(key)
+
+	def _isOverBudget(self):
+		return len(self._entries) > self._maxEntries or self._totalBytes > self._maxBytes
+
+	def _evict(self):
+		while self._entries and self._isOverBudget():
+			key = next(iter(self._entries))
+
+			logger.debug('Evicting cache entry: {}'.format(key))
+			self._onEvict(key, self._entries[key])
+			self._discard(key)
+
+	def _onEvict(self, key, value):
+		"""Called with each entry before it is evicted, for subclasses that keep
+		resources alongside their entries
+		"""
+		pass
+
+	def get(self, key, default=None):
+		"""Gets the entry stored for the given key, marking it as most recently used
+
+		Args:
+			key (str): The key of the entry
+			default (any, optional): Returned if there is no entry for the key
+
+		Returns:
+			any: The entry, or default if there is none
+		"""
+		with self._lock:
+			self._load()
+
+			if key not in self._entries:
+				return default
+
+			value = self._entries.pop(key)
+			self._entries[key] = value
+
+			return value
+
+	def set(self, key, value, save=True):
+		"""Stores the entry for the given key, evicting the least recently used
+		entries if the cache is now over budget
+
+		Args:
+			key (str): The key of the entry
+			value (any): The JSON-serializable entry
+			save (bool, optional): Whether to immediately persist the cache to disk.
+				True by default
+		"""
+		with self._lock:
+			self._load()
+			self._store(key, value)
+			self._evict()
+
+			if save:
+				self.save()
+
+	def remove(self, key, save=True):
+		with self._lock:
+			self._load()
+			self._discard(key)
+
+			if save:
+				self.save()
+
+	def save(self):
+		"""Writes the cache out to its file
+		"""
+		with self._lock:
+			self._load()
+
+			try:
+				writeFileAtomic(self._path, json.dumps(self._entries, separators=(',', ':')))
+			except (IOError, OSError):
+				logger.warning('Could not write cache file: {}'.format(self._path), exc_info=True)
+
+class SequenceIndexCache(LRUFileCache):
+	"""Caches the sequences discovered in directories, keyed by the directory and the
+	prefix/extension patterns it was scanned with. Only frame runs are stored, so even
+	large sequences take up very little space.
+
+	An entry is reused as long as the directory's stat signature (modification time,
+	size and link count) is unchanged, so a cached lookup costs a single stat rather
+	than a full listing. Scans of directories modified within the last RACY_SECONDS
+	are not cached, as further changes could land without the modification time
+	changing on file systems with coarse timestamps.
+	"""
+	RACY_SECONDS = 2.0
+
+	def __init__(self, path=None, maxEntries=512, maxBytes=16 * 1024 * 1024):
+		"""
+		Args:
+			path (str, optional): The file the cache is persisted to. By default,
+				sequenceIndex.json in the SDMTools cache directory
+			maxEntries (int, optional): The maximum number of directories to keep
+			maxBytes (int, optional): The maximum (approximate) size of the cache file
+		"""
+		LRUFileCache.__init__(self, path or getCacheDir('sequenceIndex.json'), maxEntries=maxEntries, maxBytes=maxBytes)
+
+	@staticmethod
+	def _getSignature(dir):
+		stat = os.stat(dir)
+
+		return [stat.st_mtime, stat.st_size, stat.st_nlink]
+
+	def getFrameNumbers(self, scanner, save=True):
+		"""Gets the frame numbers of all sequences found by the given scanner, listing
+		the scanner's directory only if there is no valid cache entry for it
+
+		Args:
+			scanner (sdm.files.fileclassification.SequenceScanner): The scanner for the
+				directory and patterns to look up
+			save (bool, optional): Whether to immediately persist the cache to disk if
+				its entry for the directory changed. True by default
+
+		Returns:
+			OrderedDict: Maps (prefix, padding, ext) tuples to the frame numbers found
+				for that sequence, as SequenceScanner.scanFrameNumbers does
+		"""
+		dir = scanner.getDir()
+		key = '\t'.join((os.path.abspath(dir), scanner.getPrefixPattern(), scanner.getExtPattern()))
+		signature = self._getSignature(dir)
+		entry = self.get(key)
+
+		if entry and entry['signature'] == signature:
+			logger.debug('Using cached sequence index for: {}'.format(dir))
+
+			return self._decode(entry['sequences'])
+
+		groups = scanner.listFrameNumbers()
+
+		if time.time() - signature[0] > self.RACY_SECONDS:
+			self.set(key, {'signature':signature, 'sequences':self._encode(groups)}, save=save)
+		elif entry:
+			self.remove(key, save=save)
+
+		return groups
+
+	@staticmethod
+	def _encode(groups):
+		sequences = []
+
+		for (prefix, padding, ext), numbers in groups.items():
+			runs = []
+
+			for start, end in iterFrameRuns(sorted(numbers)):
+				runs.append(start)
+				runs.append(end)
+
+			sequences.append([prefix, padding, ext, runs])
+
+		return sequences
+
+	@staticmethod
+	def _decode(sequences):
+		groups = OrderedDict()
+
+		for prefix, padding, ext, runs in sequences:
+			numbers = []
+
+			for i in range(0, len(runs), 2):
+				numbers.extend(range(runs[i], runs[i + 1] + 1))
+
+			groups[(prefix, padding, ext)] = numbers
+
+		return groups
+
+class ChecksumCache(LRUFileCache):
+	"""Caches content hashes of files, keyed by path. A cached hash is only reused
+	while the file's size and modification time are unchanged, so re-hashing a set
+	of files only reads the ones that changed since they were last hashed.
+	"""
+
+	def __init__(self, path=None, maxEntries=200000, maxBytes=32 * 1024 * 1024):
+		"""
+		Args:
+			path (str, optional): The file the cache is persisted to. By default,
+				checksums.json in the SDMTools cache directory
+			maxEntries (int, optional): The maximum number of files to keep hashes for
+			maxBytes (int, optional): The maximum (approximate) size of the cache file
+		"""
+		LRUFileCache.__init__(self, path or getCacheDir('checksums.json'), maxEntries=maxEntries, maxBytes=maxBytes)
+
+	def getChecksum(self, path, size, mtime):
+		"""Gets the cached hash of the given file
+
+		Args:
+			path (str): The path of the file
+			size (int): The current size of the file
+			mtime (float): The current modification time of the file
+
+		Returns:
+			str: The hex digest of the file, or None if it is not cached or the file has
+				changed since it was hashed
+		"""
+		entry = self.get(os.path.abspath(path))
+
+		if entry and entry[0] == size and entry[1] == mtime:
+			return entry[2]
+
+		return None
+
+	def setChecksum(self, path, size, mtime, checksum, save=True):
+		self.set(os.path.abspath(path), [size, mtime, checksum], save=save)
+
+class ConversionCache(LRUFileCache):
+	"""Caches the results of file conversions (i.e. textures converted to RAT) by the
+	content hash of the source and the settings it was converted with. Each result
+	is kept as a blob in the cache directory, so:
+
+	- an output that is unchanged since it was converted is reused as is, costing a stat
+	  of the source and of the output
+	- a source whose contents were already converted, even from another path, has the
+	  stored result linked to its output instead of being converted again
+
+	Outputs and blobs are hard-linked to each other where possible, and only copied
+	where they can't be (i.e. on different file systems). Since they then share their
+	contents, an output must be released before it is written to in place.
+
+	Source hashes are kept in a ChecksumCache, so sources are only re-hashed when they
+	change. The blobs are bounded by maxBlobBytes, evicting the least recently used.
+	"""
+
+	def __init__(self, path=None, blobDir=None, maxBlobBytes=4 * 1024 * 1024 * 1024, maxEntries=20000, checksums=None):
+		"""
+		Args:
+			path (str, optional): The file the cache is persisted to. By default,
+				conversions.json in the SDMTools cache directory
+			blobDir (str, optional): The directory converted outputs are stored in. By
+				default, the conversions directory in the SDMTools cache directory
+			maxBlobBytes (int, optional): The maximum total size of the stored outputs
+			maxEntries (int, optional): The maximum number of conversions to keep
+			checksums (ChecksumCache, optional): The cache to look up source hashes in. By
+				default, the shared checksums cache
+		"""
+		LRUFileCache.__init__(self, path or getCacheDir('conversions.json'), maxEntries=maxEntries)
+
+		self._blobDir = blobDir or getCacheDir('conversions')
+		self._maxBlobBytes = maxBlobBytes
+		self._blobBytes = 0
+		self._checksums = checksums or ChecksumCache()
+
+	def getBlobDir(self):
+		return self._blobDir
+
+	def _store(self, key, value):
+		LRUFileCache._store(self, key, value)
+
+		self._blobBytes += value['bytes']
+
+	def _discard(self, key):
+		if key in self._entries:
+			self._blobBytes -= self._entries[key]['bytes']
+
+		LRUFileCache._discard(self, key)
+
+	def _isOverBudget(self):
+		return LRUFileCache._isOverBudget(self) or self._blobBytes > self._maxBlobBytes
+
+	def _onEvict(self, key, value):
+		try:
+			os.remove(os.path.join(self._blobDir, value['blob']))
+		except OSError:
+			pass
+
+	def getKey(self, source, settings):
+		"""Gets the key identifying the conversion of the given source with the given settings
+
+		Args:
+			source (str): The path of the file to convert
+			settings (list): The JSON-serializable settings that affect the output, such as
+				the converter arguments and the output extension
+
+		Returns:
+			str: The key, or None if the source could not be read
+		"""
+		from sdm.files.verification import hashFile
+
+		stat = os.stat(source)
+		checksum = self._checksums.getChecksum(source, stat.st_size, stat.st_mtime)
+
+		if checksum is None:
+			checksum = hashFile(source)[1]
+
+			if checksum is None:
+				return None
+
+			self._checksums.setChecksum(source, stat.st_size, stat.st_mtime, checksum, save=False)
+
+		return self.getDerivedKey(checksum, settings)
+
+	def getDerivedKey(self, key, settings):
+		"""Gets the key identifying the conversion, with the given settings, of the output
+		of another conversion
+
+		Args:
+			key (str): The key of the conversion outputting the source
+			settings (list): The JSON-serializable settings that affect the output
+
+		Returns:
+			str: The key
+		"""
+		return key + '\t' + json.dumps(settings, separators=(',', ':'))
+
+	@staticmethod
+	def _getSignature(path):
+		stat = os.stat(path)
+
+		return [stat.st_size, stat.st_mtime]
+
+	def restore(self, key, output):
+		"""Makes sure the given output holds the result of the given conversion, if it is
+		cached: an output that is unchanged since it was produced is left as is, otherwise
+		the stored result is linked (or copied) to it
+
+		Args:
+			key (str): The key of the conversion, from getKey
+			output (str): The path the conversion outputs to
+
+		Returns:
+			bool: True if the output is now up to date, False if it has to be converted
+		"""
+		with self._lock:
+			entry = self.get(key)
+
+			if entry is None:
+				return False
+
+			output = os.path.abspath(output)
+			signature = entry['outputs'].get(output)
+
+			if signature is not None and os.path.exists(output) and self._getSignature(output) == signature:
+				return True
+
+			try:
+				linkFileAtomic(os.path.join(self._blobDir, entry['blob']), output)
+			except (IOError, OSError):
+				logger.warning('Could not restore cached conversion to: {}'.format(output), exc_info=True)
+				self.remove(key, save=False)
+				return False
+
+			entry['outputs'][output] = self._getSignature(output)
+			self.set(key, entry, save=False)
+
+			return True
+
+	def store(self, key, output):
+		"""Stores the output of a conversion that just finished
+
+		Args:
+			key (str): The key of the conversion, from getKey
+			output (str): The path of the output to store
+		"""
+		output = os.path.abspath(output)
+		blob = hashlib.sha1(key.encode('utf-8')).hexdigest() + os.path.splitext(output)[1]
+
+		try:
+			linkFileAtomic(output, os.path.join(self._blobDir, blob))
+		except (IOError, OSError):
+			logger.warning('Could not cache conversion output: {}'.format(output), exc_info=True)
+			return
+
+		with self._lock:
+			entry = self.get(key) or {'outputs':{}}
+			entry['blob'] = blob
+			entry['bytes'] = os.path.getsize(output)
+			entry['outputs'][output] = self._getSignature(output)
+
+			self.set(key, entry, save=False)
+
+	def release(self, output):
+		"""Unlinks the given output if it shares its contents with other files (i.e. a
+		stored result), so that a converter writing it in place can't alter them
+
+		Args:
+			output (str): The path a conversion is about to write to
+		"""
+		try:
+			if os.stat(output).st_nlink > 1:
+				os.remove(output)
+		except OSError: # Doesn't exist yet
+			pass
+
+	def save(self):
+		LRUFileCache.save(self)
+		self._checksums.save()
@@ -5,70 +5,886 @@ __version__ = 1.0.0
 __date__ = 11/27/17
 """
 
-import os, re
+import os, re, heapq, threading, logging
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
 
-class Sequence():
-	_frames = []
+try:
+	from queue import Queue, Empty
+except ImportError: # Python 2
+	from Queue import Queue, Empty
+
+from sdm.utils import listDirectory
+
+logger = logging.getLogger(__name__)
+
+FRAME_NAME_PATTERN = r'^(?P<prefix>{})[\.\-_](?P<framePadding>\d+)\.(?P<ext>{})$'
+DEFAULT_PREFIX_PATTERN = r'[\w\-\.]+'
+DEFAULT_EXT_PATTERN = r'[a-zA-Z]+'
+
+_compiledPatterns = {}
+
+def getFramePattern(prefix=DEFAULT_PREFIX_PATTERN, ext=DEFAULT_EXT_PATTERN):
+	"""Gets the compiled regex for matching frame file names with the given
+	prefix and extension patterns. Compiled patterns are kept for the lifetime
+	of the process, so each combination is only ever compiled once
+
+	Args:
+		prefix (str, optional): The prefix pattern that must be matched, by default
+			is a generic alphanumeric regex
+		ext (str, optional): The extension pattern to match, by default is any extension
+
+	Returns:
+		re.RegexObject: The compiled frame name pattern
+	"""
+	key = (prefix, ext)
+	regx = _compiledPatterns.get(key)
+
+	if regx is None:
+		regx = re.compile(FRAME_NAME_PATTERN.format(prefix, ext))
+		_compiledPatterns[key] = regx
+
+	return regx
+
+class SequenceScanner():
+	"""Discovers every frame sequence within a directory from a single listing of it.
+	Frames are grouped by their prefix, padding length, and extension, so one scan of
+	a render directory yields all of its AOVs at once.
+	"""
+
+	def __init__(self, dir, prefix=DEFAULT_PREFIX_PATTERN, ext=DEFAULT_EXT_PATTERN, cache=None):
+		"""
+		Args:
+			dir (str): The directory to scan
+			prefix (str, optional): The prefix pattern that must be matched, by default
+				is a generic alphanumeric regex
+			ext (str, optional): The extension pattern to match, by default is any extension
+			cache (sdm.files.cache.SequenceIndexCache, optional): An index cache to consult
+				before listing the directory. By default, the directory is always listed
+		"""
+		self._dir = dir
+		self._prefix = prefix
+		self._ext = ext
+		self._regx = getFramePattern(prefix, ext)
+		self._cache = cache
+
+	def getDir(self):
+		return self._dir
+
+	def getPrefixPattern(self):
+		return self._prefix
+
+	def getExtPattern(self):
+		return self._ext
+
+	def scanFrameNumbers(self, saveCache=True):
+		"""Groups the frame numbers of all matching file names in the directory by the
+		sequence they belong to. If this scanner has an index cache, the cached result
+		is used when the directory has not changed since it was last listed
+
+		Args:
+			saveCache (bool, optional): Whether to write the index cache to disk if this
+				scan updated it. Pass False when scanning many directories, and save
+				the cache once when done
+
+		Returns:
+			OrderedDict: Maps (prefix, padding, ext) tuples to the unsorted list of frame
+				numbers found for that sequence. Sequences are ordered by the first time one
+				of their frames was encountered in the directory listing
+		"""
+		if self._cache is not None:
+			return self._cache.getFrameNumbers(self, save=saveCache)
+
+		return self.listFrameNumbers()
+
+	def listFrameNumbers(self):
+		"""Lists the directory once, grouping the frame numbers of all matching
+		file names by the sequence they belong to
+
+		Returns:
+			OrderedDict: Maps (prefix, padding, ext) tuples to the unsorted list of frame
+				numbers found for that sequence. Sequences are ordered by the first time one
+				of their frames was encountered in the directory listing
+		"""
+		groups = OrderedDict()
+		match = self._regx.match
+
+		for name in listDirectory(self._dir):
+			parts = match(name)
+
+			if not parts:
+				continue
+
+			prefix, framePadding, ext = parts.groups()
+			key = (prefix, len(framePadding), ext)
+			numbers = groups.get(key)
+
+			if numbers is None:
+				numbers = groups[key] = []
+
+			numbers.append(int(framePadding))
+
+		return groups
+
+	def scan(self, range=(), saveCache=True):
+		"""Finds all the sequences in the directory
+
+		Args:
+			range (tuple, optional): A tuple representing the allowed start and end range of
+				the frames of each sequence. If empty, the full range found is returned
+			saveCache (bool, optional): Whether to write the index cache to disk if this
+				scan updated it. True by default
+
+		Returns:
+			list: The Sequence for each distinct prefix, padding and extension found
+		"""
+		sequences = []
+
+		for (prefix, padding, ext), numbers in self.scanFrameNumbers(saveCache=saveCache).items():
+			sequence = Sequence.fromFrameNumbers(self._dir, prefix, padding, ext, numbers, range=range)
+
+			if len(sequence):
+				sequences.append(sequence)
+
+		return sequences
+
+def scanDirectories(dirs, prefix=DEFAULT_PREFIX_PATTERN, ext=DEFAULT_EXT_PATTERN, range=(), workers=8, cache=None):
+	"""Scans many directories for sequences concurrently on a bounded pool of threads.
+	Directory listings over network file systems are dominated by latency rather than
+	CPU, so overlapping them gives a near linear speedup up to the number of workers.
+
+	Results are yielded as soon as each directory has been scanned, so they are not
+	necessarily in the order given. Directories that could not be listed are logged
+	and yielded with None in place of their sequences. Any other error raised while
+	scanning a directory is raised again from the generator, which stops the scan.
+
+	Args:
+		dirs (list): The directory paths to scan
+		prefix (str, optional): The prefix pattern that must be matched, by default
+			is a generic alphanumeric regex
+		ext (str, optional): The extension pattern to match, by default is any extension
+		range (tuple, optional): A tuple representing the allowed start and end range of
+			the frames of each sequence. If empty, the full range found is returned
+		workers (int, optional): The maximum number of directories to scan at once
+		cache (sdm.files.cache.SequenceIndexCache, optional): An index cache to consult
+			before listing each directory. It is written to disk once, when the scan
+			finishes or is stopped
+
+	Returns:
+		generator: A (dir, sequences) tuple per directory, where sequences is the list of
+			Sequence found in it, or None if it could not be scanned
+
+	Raises:
+		ValueError: If workers is less than 1
+		re.error: If the prefix or extension pattern is invalid
+	"""
+	if workers < 1:
+		raise ValueError('At least one worker is needed to scan directories, got {}'.format(workers))
+
+	getFramePattern(prefix, ext) # Invalid patterns fail here, rather than in every worker
+
+	return _scanDirectories(list(dirs), prefix, ext, range, workers, cache)
+
+def _scanDirectories(dirs, prefix, ext, range, workers, cache):
+	pending = Queue()
+	results = Queue()
+	stopped = threading.Event()
+
+	for dir in dirs:
+		pending.put(dir)
+
+	def work():
+		while not stopped.is_set():
+			try:
+				dir = pending.get_nowait()
+			except Empty: # Nothing left to scan
+				return
+
+			error = None
+
+			try:
+				sequences = SequenceScanner(dir, prefix=prefix, ext=ext, cache=cache).scan(range=range, saveCache=False)
+			except (IOError, OSError):
+				logger.warning('Could not scan directory: {}'.format(dir), exc_info=True)
+				sequences = None
+			except Exception as e: # Every directory must post a result, or the consumer waits forever
+				sequences = None
+				error = e
+
+			results.put((dir, sequences, error))
+
+	for i, _ in enumerate(dirs[:workers]):
+		thread = threading.Thread(target=work, name='SequenceScan-{}'.format(i))
+		thread.daemon = True
+
+		thread.start()
+
+	try:
+		for _ in dirs:
+			dir, sequences, error = results.get()
+
+			if error is not None:
+				raise error
+
+			yield dir, sequences
+	finally: # Consumer may stop early, don't keep scanning for nobody
+		stopped.set()
+
+		if cache is not None:
+			cache.save()
+
+def iterFrameRuns(frames):
+	"""Collapses sorted frame numbers into contiguous runs, without building
+	any intermediate lists. Duplicate frame numbers are ignored
+
+	i.e. [1, 2, 3, 5, 7, 8] --> (1, 3), (5, 5), (7, 8)
+
+	Args:
+		frames (iterable): The sorted frame numbers to collapse
+
+	Returns:
+		generator: An inclusive (start, end) tuple for each run
+	"""
+	start = None
+	last = None
+
+	for f in frames:
+		if start is None:
+			start = last = f
+		elif f == last or f == last + 1:
+			last = f
+		else:
+			yield (start, last)
+
+			start = last = f
+
+	if start is not None:
+		yield (start, last)
+
+class GapIndex():
+	"""A sorted, run-length representation of the frame numbers present in a
+	sequence. Frames are stored as parallel lists of run starts and ends, which
+	allows membership checks in O(log n) and gap queries in time linear to the
+	number of runs rather than the number of frames.
+	"""
+
+	def __init__(self, frames):
+		"""
+		Args:
+			frames (iterable): The sorted frame numbers that are present
+		"""
+		self._starts = []
+		self._ends = []
+
+		for start, end in iterFrameRuns(frames):
+			self._starts.append(start)
+			self._ends.append(end)
+
+	def contains(self, number):
+		"""Determines if the given frame number is present
+
+		Args:
+			number (int): The frame number to look for
+
+		Returns:
+			bool: True if the frame is present, otherwise False
+		"""
+		i = bisect_right(self._starts, number) - 1
+
+		return i >= 0 and number <= self._ends[i]
+
+	__contains__ = contains
+
+	def getRange(self):
+		"""Gets the first and last present frame
+
+		Returns:
+			tuple: The (start, end) frame numbers, or an empty tuple if no
+				frames are present
+		"""
+		if not self._starts:
+			return ()
+
+		return (self._starts[0], self._ends[-1])
+
+	def getRunCount(self):
+		return len(self._starts)
+
+	def getFrameCount(self):
+		return sum(end - start + 1 for start, end in self.iterRuns())
+
+	def iterRuns(self):
+		"""Iterates over the runs of present frames
+
+		Returns:
+			generator: An inclusive (start, end) tuple for each run
+		"""
+		for i, start in enumerate(self._starts):
+			yield (start, self._ends[i])
+
+	def iterMissingRanges(self):
+		"""Iterates over the gaps between the runs of present frames
+
+		Returns:
+			generator: An inclusive (start, end) tuple for each gap
+		"""
+		for i, start in enumerate(self._starts):
+			if i > 0:
+				yield (self._ends[i - 1] + 1, start - 1)
+
+	def iterMissingFrames(self):
+		"""Iterates over every missing frame number, in ascending order
+
+		Returns:
+			generator: Each missing frame number
+		"""
+		for start, end in self.iterMissingRanges():
+			f = start
+
+			while f <= end:
+				yield f
+
+				f += 1
+
+def _gcd(a, b):
+	while b:
+		a, b = b, a % b
+
+	return a
+
+def _modInverse(a, m):
+	"""Computes the inverse of a modulo m (a and m must be coprime) with the
+	extended Euclidean algorithm
+	"""
+	x0, x1 = 1, 0
+	b = m
+
+	while b:
+		q = a // b
+		a, b = b, a - q * b
+		x0, x1 = x1, x0 - q * x1
+
+	return x0 % m
+
+class FrameSet(object):
+	"""An ordered set of frame numbers that is kept symbolically as (start, end, step)
+	ranges, i.e. the frame string '1-10000000:2' is stored as a single range rather
+	than five million integers.
+
+	Iteration is lazy and in ascending order, and length, membership, union, intersection
+	and difference are all computed from the ranges without expanding them.
+	"""
+	BLOCK_PATTERN = re.compile(r'(?P<start>\-?\d+)(\-(?P<end>\-?\d+))?(:(?P<inc>\d+))?')
+
+	def __init__(self, ranges=()):
+		"""
+		Args:
+			ranges (iterable, optional): The (start, end, step) tuples, with an inclusive
+				end, that make up the set. Ranges may overlap
+		"""
+		self._ranges = FrameSet._normalize(ranges)
+		self._starts = [r[0] for r in self._ranges]
+		self._disjoint = all(self._ranges[i - 1][1] < self._ranges[i][0] for i in range(1, len(self._ranges)))
+
+	@classmethod
+	def fromString(cls, frameString):
+		"""Given a string representing a sequence of discrete frames and
+		ranges of frames, builds the set of those frames.
+
+		i.e. the string '1-3, 5, 9, 10-20:2' will produce the frames 1, 2, 3,
+		5, 9, 10, 12, 14, 16, 18, 20
+
+		Args:
+		    frameString (str): The string representing the sequence of discrete
+		    	and ranges of frames
+
+		Returns:
+		    FrameSet: The set of frames described by the frame string
+
+		Raises:
+		    ValueError: When one of the sequences contains a match, but does not properly match for
+		    	the start of the range. Should never occur.
+		"""
+		ranges = []
+
+		for block in frameString.split(','):
+			block = block.strip()
+			match = cls.BLOCK_PATTERN.match(block)
+
+			if match:
+				start = match.group('start')
+				end = match.group('end')
+				end = end if end else start
+				inc = match.group('inc')
+				inc = inc if inc else 1
+
+				if not start: # not even a single frame number present
+					raise ValueError('Error in frame string. Invalid block: {} (expected at least 1 frame number)'.format(block))
+
+				assert int(end) >= int(start), 'End frame in range cannot be smaller than start frame (Block: {})'.format(block)
+
+				ranges.append((int(start), int(end), int(inc)))
+
+		return cls(ranges)
+
+	@classmethod
+	def fromFrames(cls, frames):
+		"""Builds the set of the given frame numbers, collapsing them into
+		contiguous ranges
+
+		Args:
+			frames (iterable): The frame numbers, in any order
+
+		Returns:
+			FrameSet: The set of the given frames
+		"""
+		return cls((start, end, 1) for start, end in iterFrameRuns(sorted(frames)))
+
+	@staticmethod
+	def _clamp(start, end, step):
+		"""Makes end the last frame actually reached from start by step,
+		returning None if the range is empty
+		"""
+		if step < 1:
+			raise ValueError('Frame step must be a positive integer, got: {}'.format(step))
+
+		if end < start:
+			return None
+
+		end = start + (end - start) // step * step
+
+		return (start, end, step if start != end else 1)
+
+	@staticmethod
+	def _normalize(ranges):
+		"""Sorts the given ranges and merges or trims overlapping ones where possible
+		so that, in the common cases, no two ranges share a frame. Ranges with different
+		steps that interleave are left overlapping and deduplicated when iterated
+		"""
+		heap = []
+
+		for start, end, step in ranges:
+			r = FrameSet._clamp(start, end, step)
+
+			if r:
+				heap.append((r[0], r[2], r[1]))
+
+		heapq.heapify(heap)
+
+		out = []
+
+		while heap:
+			start, step, end = heapq.heappop(heap)
+
+			if not out:
+				out.append([start, end, step])
+				continue
+
+			last = out[-1]
+			lStart, lEnd, lStep = last
+
+			if start > lEnd: # No overlap, but may directly continue the last range
+				if step == lStep and start == lEnd + step:
+					last[1] = end
+				else:
+					out.append([start, end, step])
+			elif step == lStep and (start - lStart) % step == 0: # Same progression, merge
+				last[1] = max(lEnd, end)
+			elif step % lStep == 0 and (start - lStart) % lStep == 0 and end <= lEnd: # Already contained
+				continue
+			elif step == 1: # Contiguous range covers the last one from start onward, trim it
+				newEnd = lStart + (start - 1 - lStart) // lStep * lStep
+				last[1] = newEnd
+				last[2] = lStep if newEnd != lStart else 1
+				rest = FrameSet._clamp(lStart + ((end - lStart) // lStep + 1) * lStep, lEnd, lStep)
+
+				if rest:
+					heapq.heappush(heap, (rest[0], rest[2], rest[1]))
+
+				out.append([start, end, step])
+			elif lStep == 1: # Skip past the part already covered by the last range
+				rest = FrameSet._clamp(start + ((lEnd - start) // step + 1) * step, end, step)
+
+				if rest:
+					heapq.heappush(heap, (rest[0], rest[2], rest[1]))
+			else:
+				out.append([start, end, step])
+
+		return [tuple(r) for r in out]
+
+	@staticmethod
+	def _iterRange(start, end, step):
+		f = start
+
+		while f <= end:
+			yield f
+
+			f += step
+
+	@staticmethod
+	def _iterMerged(ranges):
+		last = None
+
+		for f in heapq.merge(*[FrameSet._iterRange(*r) for r in ranges]):
+			if f != last:
+				yield f
+
+				last = f
+
+	@staticmethod
+	def _countRange(start, end, step):
+		return (end - start) // step + 1
+
+	@staticmethod
+	def _intersectRanges(a, b):
+		"""Intersects two (start, end, step) ranges, which results in another
+		range (stepping by the LCM of both steps) or None if they share no frames
+		"""
+		aStart, aEnd, aStep = a
+		bStart, bEnd, bStep = b
+		lo = max(aStart, bStart)
+		hi = min(aEnd, bEnd)
+
+		if lo > hi:
+			return None
+
+		g = _gcd(aStep, bStep)
+		diff = bStart - aStart
+
+		if diff % g:
+			return None
+
+		lcm = aStep // g * bStep
+		k = (diff // g) * _modInverse(aStep // g, bStep // g) % (bStep // g)
+		first = aStart + aStep * k
+		first -= (first - lo) // lcm * lcm # Smallest shared frame at or after lo
+
+		if first < lo:
+			first += lcm
+
+		return FrameSet._clamp(first, hi, lcm)
+
+	@staticmethod
+	def _subtractRange(a, b):
+		"""Removes the frames of range b from range a, returning the list
+		of ranges that remain
+		"""
+		common = FrameSet._intersectRanges(a, b)
+
+		if not common:
+			return [a]
+
+		aStart, aEnd, aStep = a
+		cStart, cEnd, cStep = common
+		pieces = [FrameSet._clamp(aStart, cStart - aStep, aStep), FrameSet._clamp(cEnd + aStep, aEnd, aStep)]
+
+		if cStart != cEnd: # Frames of a that fall between the removed ones
+			for offset in range(aStep, cStep, aStep):
+				pieces.append(FrameSet._clamp(cStart + offset, cEnd, cStep))
+
+		return [p for p in pieces if p]
+
+	def getRanges(self):
+		"""Gets the normalized ranges of this set
+
+		Returns:
+			list: The (start, end, step) tuples, with an inclusive end, sorted by start
+		"""
+		return list(self._ranges)
+
+	def getRange(self):
+		"""Gets the first and last frame of this set
+
+		Returns:
+			tuple: The (start, end) frame numbers, or an empty tuple if the set is empty
+		"""
+		if not self._ranges:
+			return ()
+
+		return (self._ranges[0][0], max(r[1] for r in self._ranges))
+
+	def isEmpty(self):
+		return not self._ranges
+
+	def __nonzero__(self):
+		return bool(self._ranges)
+
+	__bool__ = __nonzero__
+
+	def __iter__(self):
+		if self._disjoint:
+			for start, end, step in self._ranges:
+				for f in FrameSet._iterRange(start, end, step):
+					yield f
+
+			return
+
+		for f in FrameSet._iterMerged(self._ranges):
+			yield f
+
+	def __len__(self):
+		if self._disjoint:
+			return sum(FrameSet._countRange(*r) for r in self._ranges)
+
+		# Only ranges that actually overlap need to be walked to deduplicate them
+		count = 0
+		cluster = []
+		clusterEnd = None
+
+		for r in self._ranges + [None]:
+			if r is not None and cluster and r[0] <= clusterEnd:
+				cluster.append(r)
+				clusterEnd = max(clusterEnd, r[1])
+				continue
+
+			if len(cluster) == 1:
+				count += FrameSet._countRange(*cluster[0])
+			elif cluster:
+				count += sum(1 for _ in FrameSet._iterMerged(cluster))
+
+			if r is not None:
+				cluster = [r]
+				clusterEnd = r[1]
+
+		return count
+
+	def __contains__(self, number):
+		if self._disjoint:
+			i = bisect_right(self._starts, number) - 1
+
+			if i < 0:
+				return False
+
+			start, end, step = self._ranges[i]
+
+			return number <= end and (number - start) % step == 0
+
+		for start, end, step in self._ranges:
+			if start > number:
+				break
+
+			if number <= end and (number - start) % step == 0:
+				return True
+
+		return False
+
+	def union(self, other):
+		return FrameSet(self._ranges + other.getRanges())
+
+	def intersection(self, other):
+		ranges = []
+
+		for a in self._ranges:
+			for b in other.getRanges():
+				if b[0] > a[1]:
+					break
+
+				common = FrameSet._intersectRanges(a, b)
+
+				if common:
+					ranges.append(common)
+
+		return FrameSet(ranges)
+
+	def difference(self, other):
+		ranges = []
+		otherRanges = other.getRanges()
+
+		for a in self._ranges:
+			pieces = [a]
+
+			for b in otherRanges:
+				if b[0] > a[1]:
+					break
+
+				if b[1] < a[0]:
+					continue
+
+				pieces = [p for piece in pieces for p in FrameSet._subtractRange(piece, b)]
+
+			ranges.extend(pieces)
+
+		return FrameSet(ranges)
+
+	__or__ = union
+	__and__ = intersection
+	__sub__ = difference
+
+	def chunks(self, size):
+		"""Splits this set into consecutive sets of at most size frames each,
+		without expanding the ranges
+
+		i.e. '1-10, 20-30:5' in chunks of 4 gives '1-4', '5-8', '9, 10, 20-25:5'
+		and '30'
+
+		Args:
+			size (int): The maximum number of frames per chunk
+
+		Returns:
+			generator: The FrameSet for each chunk, in ascending order
+		"""
+		if size < 1:
+			raise ValueError('Chunk size must be a positive integer, got: {}'.format(size))
+
+		if not self._disjoint:
+			chunk = []
+
+			for f in self:
+				chunk.append(f)
+
+				if len(chunk) == size:
+					yield FrameSet.fromFrames(chunk)
+
+					chunk = []
+
+			if chunk:
+				yield FrameSet.fromFrames(chunk)
+
+			return
+
+		chunk = []
+		remaining = size
+
+		for start, end, step in self._ranges:
+			while start <= end:
+				count = min(remaining, FrameSet._countRange(start, end, step))
+				last = start + (count - 1) * step
+
+				chunk.append((start, last, step))
+				remaining -= count
+				start = last + step
+
+				if not remaining:
+					yield FrameSet(chunk)
+
+					chunk = []
+					remaining = size
+
+		if chunk:
+			yield FrameSet(chunk)
+
+	def __str__(self):
+		"""Formats this set as a frame string, which can be parsed back with fromString.
+		Contiguous ranges are formatted as prettyPrintFrameList does, and stepped ones
+		as 'start-end:step'
+		"""
+		parts = []
+
+		for start, end, step in self._ranges:
+			if step == 1:
+				parts.append(Sequence.prettyPrintRuns([(start, end)]))
+			else:
+				parts.append('{}-{}:{}'.format(start, end, step))
+
+		return ', '.join(parts)
+
+	def __repr__(self):
+		return 'FrameSet({!r})'.format(str(self))
+
+class Sequence(object):
+	"""A sequence of frames on disk sharing a prefix, padding and extension.
+
+	Frame numbers are stored in a compact array, with the prefix, padding and
+	extension held once for the whole sequence. Frame objects are only created
+	when the sequence is iterated or indexed.
+	"""
 	_dir = ''
+	_prefix = ''
+	_padding = 0
+	_ext = ''
 	_range = ()
 	_index = 0
+	_gapIndex = None
 
-	FRAME_NAME_PATTERN = r'^(?P<prefix>{})[\.\-_](?P<framePadding>\d+)\.(?P<ext>{})$'
+	FRAME_NAME_PATTERN = FRAME_NAME_PATTERN
 	STANDARD_FRAME_FORMAT = '#'
 	HOUDINI_FRAME_FORMAT = '$F'
 
-	def __init__(self, dir, range=(), prefix=r'[\w\-\.]+', ext=r'[a-zA-Z]+'):
+	def __init__(self, dir, range=(), prefix=DEFAULT_PREFIX_PATTERN, ext=DEFAULT_EXT_PATTERN, cache=None):
 		self._dir = dir
-		self._frames = self._getFrameListFromDir(dir, prefix, ext, range)
+		self._numbers = array('l')
 
-		if self._frames:
-			self._range = (self._frames[0].getNumber(), self._frames[-1].getNumber())
+		self._loadFromDir(dir, prefix, ext, range, cache=cache)
 
-	def _getFrameListFromDir(self, dir, prefix, ext, range):
-		"""Given a directory to look in, retrieves the first found sequence that fits
-		the given specifications for prefix and extension. If the range specified
-		is not an empty tuple, the frame list returned is limited to that range
+	@classmethod
+	def fromFrameNumbers(cls, dir, prefix, padding, ext, frameNumbers, range=()):
+		"""Builds a sequence from frame numbers that have already been discovered
+		(i.e. by a SequenceScanner), without listing the directory again
 
 		Args:
-			dir (str): The directory path to look for a sequence in
-			prefix (str): A pattern to match the prefix of the file name against
-			ext (str): A pattern to match the extension of the file against
-			range (tuple): A tuple representing the allowed start and end range of
-				the returned frame lisr. If empty, the full range found is returned
+			dir (str): The directory the sequence lives in
+			prefix (str): The file name prefix shared by all frames
+			padding (int): The number of digits each frame number is padded to
+			ext (str): The extension shared by all frames
+			frameNumbers (list): The frame numbers of the sequence, in any order
+			range (tuple, optional): A tuple representing the allowed start and end range of
+				the frames. If empty, all the given frames are kept
 
 		Returns:
-			list: The frame list for the sequence found, empty if no sequence was found
+			Sequence: The constructed sequence
 		"""
-		frameList = []
-		foundArbitrary = False
-		padding = 0
+		sequence = cls.__new__(cls)
+		sequence._dir = dir
 
-		for f in os.listdir(dir):
-			parts = self._decompose(f, prefix=prefix, ext=ext)
+		sequence._setFrameNumbers(prefix, padding, ext, frameNumbers, range)
 
-			if parts:
-				frame = Frame(*parts)
+		return sequence
 
-				if not foundArbitrary:
-					prefix = parts[0].replace('.', '\.').replace('-', '\-')
-					ext = parts[2]
-					padding = frame.getPadding()
+	def _setFrameNumbers(self, prefix, padding, ext, frameNumbers, range=()):
+		if range:
+			frameNumbers = [n for n in frameNumbers if range[0] <= n <= range[1]]
 
-					foundArbitrary = True
-				else:
-					if len(parts[1]) != padding: # Must continue to match padding length
-						continue
+		self._prefix = prefix
+		self._padding = padding
+		self._ext = ext
+		self._numbers = array('l', sorted(frameNumbers))
+		self._range = ()
+		self._gapIndex = None
 
-				# Is the found frame within the range, if we have specified a range to look for?
-				if range:
-					if frame.getNumber() < range[0] or frame.getNumber() > range[1]: # Nope, out of range
-						continue
+		if self._numbers:
+			self._range = (self._numbers[0], self._numbers[-1])
 
-				frameList.append(frame)
+	def addFrameNumbers(self, frameNumbers):
+		"""Adds newly discovered frames to this sequence. Frames that are already
+		present are ignored
 
-		frameList.sort(key=lambda f: f.getNumber())
+		Args:
+			frameNumbers (iterable): The frame numbers to add, in any order
+		"""
+		new = sorted(set(frameNumbers))
 
-		return frameList
+		if not new:
+			return
+
+		if not self._numbers or new[0] > self._numbers[-1]: # Frames usually land in order
+			self._numbers.extend(new)
+		else:
+			self._numbers = array('l', sorted(set(self._numbers).union(new)))
+
+		self._range = (self._numbers[0], self._numbers[-1])
+		self._gapIndex = None
+
+	def _loadFromDir(self, dir, prefix, ext, range, cache=None):
+		"""Given a directory to look in, loads the first found sequence that fits
+		the given specifications for prefix and extension. If the range specified
+		is not an empty tuple, the frames loaded are limited to that range
+
+		Args:
+			dir (str): The directory path to look for a sequence in
+			prefix (str): A pattern to match the prefix of the file name against
+			ext (str): A pattern to match the extension of the file against
+			range (tuple): A tuple representing the allowed start and end range of
+				the loaded frames. If empty, the full range found is loaded
+			cache (sdm.files.cache.SequenceIndexCache, optional): The index cache to
+				look the directory up in before listing it
+		"""
+		groups = SequenceScanner(dir, prefix=prefix, ext=ext, cache=cache).scanFrameNumbers()
+
+		for (prefix, padding, ext), numbers in groups.items():
+			self._setFrameNumbers(prefix, padding, ext, numbers, range)
+
+			break
 
 	def _decompose(self, file, prefix, ext):
 		"""Decomposes the given file name into its 3 parts: prefix, frame
@@ -92,10 +908,7 @@ class Sequence():
 				and extension. Returns None if any of these 3 parts was not matched in the file
 				given
 		"""
-
-		pattern = self.FRAME_NAME_PATTERN.format(prefix, ext)
-		regx = re.compile(pattern)
-		match = regx.match(file)
+		match = getFramePattern(prefix, ext).match(file)
 
 		if match:
 			return match.groups()
@@ -103,10 +916,10 @@ class Sequence():
 		return None
 
 	def getFrames(self):
-		return self._frames
+		return list(self)
 
 	def getFramesAsNumberList(self):
-		return [f.getNumber() for f in self._frames]
+		return self._numbers.tolist()
 
 	def getDir(self):
 		return self._dir
@@ -118,13 +931,67 @@ class Sequence():
 		return self._range[1] - self._range[0] + 1
 
 	def getPadding(self):
-		return self._frames[0].getPadding()
+		return self._padding
 
 	def getPrefix(self):
-		return self._frames[0].getPrefix()
+		return self._prefix
 
 	def getExt(self):
-		return self._frames[0].getExt()
+		return self._ext
+
+	def getGapIndex(self):
+		"""Gets the run-length index of the frames present in this sequence. The index
+		is built on first use and kept until the frames of the sequence change
+
+		Returns:
+			GapIndex: The index of the present frames
+		"""
+		if self._gapIndex is None:
+			self._gapIndex = GapIndex(self._numbers)
+
+		return self._gapIndex
+
+	def getFrameSet(self):
+		"""Gets the frames present in this sequence as a FrameSet
+
+		Returns:
+			FrameSet: The set of the frame numbers in this sequence
+		"""
+		return FrameSet((start, end, 1) for start, end in self.getGapIndex().iterRuns())
+
+	def getFrame(self, number):
+		"""Gets the Frame for the given frame number
+
+		Args:
+			number (int): The frame number to get
+
+		Returns:
+			Frame: The frame, or None if it is not present in this sequence
+		"""
+		if not self.hasFrame(number):
+			return None
+
+		return self._makeFrame(number)
+
+	def hasFrame(self, number):
+		"""Determines if the given frame number is present in this sequence, in
+		O(log n) of the number of contiguous frame runs
+
+		Args:
+			number (int): The frame number to check
+
+		Returns:
+			bool: True if the frame exists in this sequence, otherwise False
+		"""
+		return self.getGapIndex().contains(number)
+
+	def getMissingRanges(self):
+		"""Gets the ranges of frames that are missing from this sequence
+
+		Returns:
+			list: A list of (start, end) tuples, inclusive, of each gap in the sequence
+		"""
+		return list(self.getGapIndex().iterMissingRanges())
 
 	def getMissingFrames(self, format=False):
 		"""Gets the list of frame numbers that are missing from this sequence
@@ -137,17 +1004,24 @@ class Sequence():
 				list of the missing frames. By default still returns the list, when True
 				returns a string with the pretty-printed list
 		"""
-		current = self.getFramesAsNumberList()
-		missing = []
-
-		for i in range(*self._range):
-			if i not in current:
-				missing.append(i)
+		gapIndex = self.getGapIndex()
 
 		if format:
-			return Sequence.prettyPrintFrameList(missing)
+			return Sequence.prettyPrintRuns(gapIndex.iterMissingRanges())
+
+		return list(gapIndex.iterMissingFrames())
+
+	def verify(self, **kwargs):
+		"""Verifies the integrity of the frames in this sequence, flagging empty,
+		truncated and unreadable frames. See sdm.files.verification.verifySequence
+		for the available options
 
-		return missing
+		Returns:
+			sdm.files.verification.VerificationReport: The issues found with the frames
+		"""
+		from sdm.files.verification import verifySequence
+
+		return verifySequence(self, **kwargs)
 
 	def getFormatted(self, format='#', includeDir=False):
 		"""Constructs the string format of the file name that represents the
@@ -185,27 +1059,33 @@ class Sequence():
 
 		return fileName
 
-	def __iter__(self):
-		return self
+	def _makeFrame(self, number):
+		return Frame(self._prefix, str(number).zfill(self._padding), self._ext)
 
-	def next(self):
-		if self._index == len(self._frames):
-			raise StopIteration
+	def __len__(self):
+		return len(self._numbers)
 
-		frame = self._frames[self._index]
-		self._index += 1
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self._makeFrame(n) for n in self._numbers[index]]
 
-		return frame
+		return self._makeFrame(self._numbers[index])
 
-	def __next__(self):
-		if self._index == len(self._frames):
+	def __iter__(self):
+		for n in self._numbers:
+			yield self._makeFrame(n)
+
+	def next(self):
+		if self._index == len(self._numbers):
 			raise StopIteration
 
-		frame = self._frames[self._index]
+		frame = self._makeFrame(self._numbers[self._index])
 		self._index += 1
 
 		return frame
 
+	__next__ = next
+
 	@staticmethod
 	def prettyPrintFrameList(frames):
 		"""Given a list of frames (represented as their
@@ -213,47 +1093,42 @@ class Sequence():
 		of discrete frames and frame ranges.
 
 		i.e. a list [1, 2, 3, 4, 5, 9, 10, 13, 15] would be formatted
-		as: '1-5, 9-10, 13, 15'
+		as: '1-5, 9, 10, 13, 15'
 
 		Args:
-		    frames (list): The frame list to format
+		    frames (list): The frame list to format. Any sorted iterable
+		    	of frame numbers is accepted, and is consumed lazily
 
 		Returns:
 		    str: The formmated frame list
 		"""
-		parts = []
-		currRangeStart = None
-		last = None
+		return Sequence.prettyPrintRuns(iterFrameRuns(frames))
 
-		for f in frames:
-			if not currRangeStart: # First frame of streak
-				currRangeStart = f
-				last = f
+	@staticmethod
+	def prettyPrintRuns(runs):
+		"""Given contiguous runs of frames, builds the same string
+		as prettyPrintFrameList would for the frames they contain,
+		without expanding the runs.
 
-				continue
+		i.e. the runs [(1, 5), (9, 10), (13, 13), (15, 15)] would be
+		formatted as: '1-5, 9, 10, 13, 15'
 
-			if f != last + 1: # End streak
-				# Finalize streak
-				if currRangeStart == last: # no streak
-					parts.append(str(last))
-				elif last - currRangeStart == 1: # don't use range format for 1 length streaks
-					parts.append(str(currRangeStart))
-					parts.append(str(last))
-				else:
-					parts.append('{}-{}'.format(currRangeStart, last))
+		Args:
+		    runs (iterable): The (start, end) tuples, inclusive, to format
 
-				currRangeStart = f # Reset streak and last
-				last = f
-			else:
-				last = f
+		Returns:
+		    str: The formatted frame list
+		"""
+		parts = []
 
-		if currRangeStart == last:
-			parts.append(str(last))
-		elif last - currRangeStart == 1:
-			parts.append(str(currRangeStart))
-			parts.append(str(last))
-		else:
-			parts.append('{}-{}'.format(currRangeStart, last))
+		for start, end in runs:
+			if start == end:
+				parts.append(str(start))
+			elif end - start == 1: # don't use range format for 1 length streaks
+				parts.append(str(start))
+				parts.append(str(end))
+			else:
+				parts.append('{}-{}'.format(start, end))
 
 		return ', '.join(parts)
 
@@ -265,6 +1140,9 @@ class Sequence():
 		i.e. the string '1-3, 5, 9, 10-20:2' will produce [1, 2, 3, 5, 9,
 		10, 12, 14, 16, 18, 20]
 
+		Use FrameSet.fromString directly to work with the frames without
+		expanding them into a list.
+
 		Args:
 		    frameString (str): The string representing the sequence of discrete
 		    	and ranges of frames
@@ -276,42 +1154,10 @@ class Sequence():
 		    ValueError: When one of the sequences contains a match, but does not properly match for
 		    	the start of the range. Should never occur.
 		"""
-		blocks = frameString.split(',')
-		blockRegex = re.compile(r'(?P<start>\-?\d+)(\-(?P<end>\-?\d+))?(:(?P<inc>\d+))?')
-		frameList = []
-
-		for block in blocks:
-			block = block.strip()
-			match = blockRegex.match(block)
-
-			if match:
-				start = match.group('start')
-				end = match.group('end')
-				end = end if end else start
-				inc = match.group('inc')
-				inc = inc if inc else 1
+		return list(FrameSet.fromString(frameString))
 
-				if not start: # not even a single frame number present
-					raise ValueError('Error in frame string. Invalid block: {} (expected at least 1 frame number)'.format(block))
-					return None
-
-				if end:
-					assert int(end) >= int(start), 'End frame in range cannot be smaller than start frame (Block: {})'.format(block)
-
-				for i in range(int(start), int(end) + 1, int(inc)):
-					frameList.append(i)
-
-		frameList = list(set(frameList))
-
-		frameList.sort()
-
-		return frameList
-
-class Frame():
-	_prefix = ''
-	_padding = 0
-	_number = 0
-	_ext = ''
+class Frame(object):
+	__slots__ = ('_prefix', '_padding', '_number', '_ext')
 
 	def __init__(self, prefix, framePadding, ext):
 		self._prefix = prefix
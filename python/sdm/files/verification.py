@@ -0,0 +1,255 @@
+"""Integrity verification of the frames of a sequence, catching truncated, empty or unreadable
+frames from crashed renders that still look complete by file name.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, re, mmap, hashlib, logging
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+
+from sdm.utils import scandir
+from sdm.files.fileclassification import Sequence, FrameSet, getFramePattern
+
+logger = logging.getLogger(__name__)
+
+class FrameIssue():
+	EMPTY = 'empty'
+	SMALL = 'smaller than neighbors'
+	LARGE = 'larger than neighbors'
+	UNREADABLE = 'unreadable'
+	MISSING = 'missing on disk'
+
+def hashFile(path, chunkSize=8 * 1024 * 1024):
+	"""Computes the SHA-1 of the given file, reading it through a memory map
+
+	Args:
+		path (str): The path of the file to hash
+		chunkSize (int, optional): The number of bytes hashed at a time
+
+	Returns:
+		tuple: The path, and the hex digest of its contents or None if it could not
+			be read
+	"""
+	sha = hashlib.sha1()
+
+	try:
+		with open(path, 'rb') as f:
+			size = os.fstat(f.fileno()).st_size
+
+			if size: # Empty files can't be memory-mapped
+				mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+				try:
+					for offset in range(0, size, chunkSize):
+						sha.update(mapped[offset:offset + chunkSize])
+				finally:
+					mapped.close()
+	except (IOError, OSError, ValueError):
+		logger.warning('Could not hash: {}'.format(path), exc_info=True)
+		return (path, None)
+
+	return (path, sha.hexdigest())
+
+def _iterDirectoryStats(dir):
+	"""Lists the directory, yielding each entry's name, path and a callable returning
+	its stat. With scandir, the stat comes from the directory listing where the
+	platform provides it (i.e. on Windows) instead of a separate call per file
+	"""
+	if scandir is None:
+		for name in os.listdir(dir):
+			path = os.path.join(dir, name)
+
+			yield name, path, lambda path=path: os.stat(path)
+
+		return
+
+	for entry in scandir(dir):
+		yield entry.name, entry.path, entry.stat
+
+def _rollingMedians(values, window):
+	"""Computes, for each value, the median of up to window values on either
+	side of it (excluding the value itself)
+	"""
+	medians = []
+
+	for i in range(len(values)):
+		neighbors = sorted(values[max(0, i - window):i] + values[i + 1:i + 1 + window])
+
+		if not neighbors:
+			medians.append(None)
+			continue
+
+		mid = len(neighbors) // 2
+		medians.append(neighbors[mid] if len(neighbors) % 2 else (neighbors[mid - 1] + neighbors[mid]) / 2.0)
+
+	return medians
+
+class VerificationReport():
+	"""The result of verifying a sequence: the issue found with each bad frame, and
+	the content hash of each frame if hashing was requested
+	"""
+
+	def __init__(self, sequence, issues, sizes, checksums):
+		self._sequence = sequence
+		self._issues = issues
+		self._sizes = sizes
+		self._checksums = checksums
+
+	def getSequence(self):
+		return self._sequence
+
+	def getIssues(self):
+		"""Gets the issue found with each bad frame
+
+		Returns:
+			dict: Maps frame numbers to their FrameIssue
+		"""
+		return self._issues
+
+	def getSizes(self):
+		return self._sizes
+
+	def getChecksums(self):
+		"""Gets the content hash of each frame, if hashing was requested
+
+		Returns:
+			dict: Maps frame numbers to the hex digest of their contents
+		"""
+		return self._checksums
+
+	def isValid(self):
+		return not self._issues
+
+	def getBadFrames(self, format=False):
+		"""Gets the frames that failed verification
+
+		Args:
+			format (bool, optional): When True, returns the pretty-printed frame list
+				instead, ready to be used as a frame string to re-render
+
+		Returns:
+			list: The sorted bad frame numbers
+		"""
+		bad = sorted(self._issues)
+
+		if format:
+			return Sequence.prettyPrintFrameList(bad)
+
+		return bad
+
+	def getRerenderFrames(self):
+		"""Gets every frame that needs to be rendered again to complete the sequence:
+		the bad frames, plus those missing from the sequence's range
+
+		Returns:
+			FrameSet: The frames to re-render. str() of it gives the frame string
+		"""
+		return FrameSet.fromFrames(self._issues) | FrameSet.fromFrames(self._sequence.getGapIndex().iterMissingFrames())
+
+def verifySequence(sequence, window=5, lowRatio=0.5, highRatio=2.0, hashContents=False, processes=None, useThreads=False, cache=None):
+	"""Verifies the frames of the given sequence. All frames are stat'ed in a single pass
+	over the directory, and each frame's size is compared against the median size of
+	its neighbors to catch truncated or corrupt frames. Optionally, frame contents are
+	hashed in parallel, which also catches frames that can't be read.
+
+	Args:
+		sequence (Sequence): The sequence to verify
+		window (int, optional): The number of neighboring frames on each side that a
+			frame's size is compared against
+		lowRatio (float, optional): Frames smaller than this fraction of the median of their
+			neighbors are flagged
+		highRatio (float, optional): Frames larger than this multiple of the median of their
+			neighbors are flagged
+		hashContents (bool, optional): Whether to also hash the contents of every frame.
+			False by default
+		processes (int, optional): The number of workers to hash with. By default, the
+			number of CPUs
+		useThreads (bool, optional): Hash on threads instead of processes. hashlib releases
+			the GIL while hashing, so this still runs in parallel, and avoids spawning
+			processes from embedded interpreters (such as inside a Houdini session)
+		cache (sdm.files.cache.ChecksumCache, optional): Hashes are looked up in and stored
+			to this cache by (path, size, mtime), so re-verifying only hashes frames that
+			changed
+
+	Returns:
+		VerificationReport: The issues found with the frames
+	"""
+	dir = sequence.getDir()
+	regx = getFramePattern(re.escape(sequence.getPrefix()), re.escape(sequence.getExt()))
+	padding = sequence.getPadding()
+	stats = {}
+
+	for name, path, stat in _iterDirectoryStats(dir):
+		match = regx.match(name)
+
+		if match and len(match.group('framePadding')) == padding:
+			number = int(match.group('framePadding'))
+
+			if sequence.hasFrame(number):
+				try:
+					stats[number] = (path, stat())
+				except OSError: # Removed since it was listed, or a dangling link
+					logger.debug('Could not stat: {}, reporting it as missing'.format(path), exc_info=True)
+
+	issues = {}
+	numbers = sequence.getFramesAsNumberList()
+
+	for number in numbers:
+		if number not in stats:
+			issues[number] = FrameIssue.MISSING
+
+	numbers = [n for n in numbers if n in stats]
+	sizes = dict((n, stats[n][1].st_size) for n in numbers)
+	sizeList = [sizes[n] for n in numbers]
+
+	for number, size, median in zip(numbers, sizeList, _rollingMedians(sizeList, window)):
+		if size == 0:
+			issues[number] = FrameIssue.EMPTY
+		elif median and size < median * lowRatio:
+			issues[number] = FrameIssue.SMALL
+		elif median and size > median * highRatio:
+			issues[number] = FrameIssue.LARGE
+
+	checksums = {}
+
+	if hashContents:
+		toHash = {}
+
+		for number in numbers:
+			path, stat = stats[number]
+			checksum = cache.getChecksum(path, stat.st_size, stat.st_mtime) if cache else None
+
+			if checksum:
+				checksums[number] = checksum
+			else:
+				toHash[path] = number
+
+		logger.info('Hashing {} frame(s), {} cached'.format(len(toHash), len(checksums)))
+
+		if toHash:
+			pool = (ThreadPool if useThreads else Pool)(processes or cpu_count())
+
+			try:
+				for path, checksum in pool.imap_unordered(hashFile, list(toHash)):
+					number = toHash[path]
+
+					if checksum is None:
+						issues[number] = FrameIssue.UNREADABLE
+						continue
+
+					checksums[number] = checksum
+
+					if cache:
+						stat = stats[number][1]
+						cache.setChecksum(path, stat.st_size, stat.st_mtime, checksum, save=False)
+			finally:
+				pool.close()
+				pool.join()
+
+			if cache:
+				cache.save()
+
+	return VerificationReport(sequence, issues, sizes, checksums)
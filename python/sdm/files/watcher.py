@@ -0,0 +1,338 @@
+"""Incremental tracking of sequences while their frames are being written to disk, i.e. by a
+ROP that is currently caching or rendering.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, re, sys, time, errno, struct, logging
+import ctypes, ctypes.util
+
+from sdm.utils import listDirectory
+from sdm.files.fileclassification import Sequence, getFramePattern
+
+logger = logging.getLogger(__name__)
+
+class _Inotify(object):
+	"""Minimal ctypes binding to the Linux inotify API, used to receive new directory
+	entries from the kernel instead of listing the directory
+	"""
+	IN_CLOSE_WRITE = 0x00000008
+	IN_MOVED_TO = 0x00000080
+	IN_Q_OVERFLOW = 0x00004000
+	IN_IGNORED = 0x00008000
+	IN_NONBLOCK = 0o4000
+	IN_CLOEXEC = 0o2000000
+	EVENT_HEADER = struct.Struct('iIII')
+
+	_libc = None
+	_fd = None
+
+	@classmethod
+	def isAvailable(cls):
+		if not sys.platform.startswith('linux'):
+			return False
+
+		if cls._libc is None:
+			try:
+				libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+				libc.inotify_init1
+				libc.inotify_add_watch
+			except (OSError, AttributeError):
+				cls._libc = False
+			else:
+				cls._libc = libc
+
+		return bool(cls._libc)
+
+	def __init__(self, dir):
+		libc = _Inotify._libc
+		self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+
+		if self._fd < 0:
+			self._fd = None
+
+			raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+		path = dir.encode(sys.getfilesystemencoding() or 'utf-8') if not isinstance(dir, bytes) else dir
+
+		if libc.inotify_add_watch(self._fd, path, self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+			err = ctypes.get_errno()
+			self.close()
+
+			raise OSError(err, 'inotify_add_watch failed for: {}'.format(dir))
+
+	def read(self):
+		"""Drains all pending events without blocking
+
+		Returns:
+			tuple: The list of file names written or moved into the directory, and
+				whether the event queue overflowed (meaning events were lost)
+		"""
+		names = []
+		overflowed = False
+
+		while True:
+			try:
+				buf = os.read(self._fd, 64 * 1024)
+			except OSError as e:
+				if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+					break
+
+				raise
+
+			offset = 0
+
+			while offset < len(buf):
+				wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(buf, offset)
+				offset += self.EVENT_HEADER.size
+				name = buf[offset:offset + length].rstrip(b'\0')
+				offset += length
+
+				if mask & self.IN_Q_OVERFLOW or mask & self.IN_IGNORED:
+					overflowed = True
+				elif name:
+					names.append(name.decode(sys.getfilesystemencoding() or 'utf-8'))
+
+		return names, overflowed
+
+	def close(self):
+		if self._fd is not None:
+			os.close(self._fd)
+			self._fd = None
+
+	def __del__(self): # Watchers that were never closed must not leak their descriptor
+		self.close()
+
+class SequenceWatcher(object):
+	"""Keeps a Sequence up to date as its frames land on disk, applying only the
+	directory entries that are new since the last poll rather than rebuilding the
+	sequence from scratch.
+
+	On Linux, new entries are received through inotify, and a frame is only reported
+	once the file has been closed after writing. Note that inotify only sees changes
+	made through the local kernel, so directories written to by other machines (i.e.
+	farm blades writing over NFS) should be watched with useInotify=False. Otherwise
+	the directory is re-listed, but only when its stat signature has changed, and
+	only names that have not been seen before are matched against the sequence.
+
+	Frames found by listing the directory (always the case for frames written before the
+	watch was established) could still be being written. They are only reported once their
+	size and mtime are unchanged since the previous poll, or they were last modified more
+	than RACY_SECONDS ago, or (with inotify) once they are closed after writing.
+
+	The inotify watch is released by close(), when used as a context manager, or at the
+	latest when the watcher is garbage collected.
+	"""
+	RACY_SECONDS = 2.0
+
+	def __init__(self, sequence, expected=None, onFrameArrived=None, onRangeComplete=None, useInotify=True):
+		"""
+		Args:
+			sequence (Sequence): The sequence to keep up to date. It must have a prefix,
+				padding and extension to match new frames against, i.e. it was either found
+				on disk or built with Sequence.fromFrameNumbers
+			expected (FrameSet, optional): The frames that make up the complete range. If
+				not specified, onRangeComplete is never called
+			onFrameArrived (callable, optional): Called with each new Frame as it is found
+			onRangeComplete (callable, optional): Called once with the sequence when every
+				expected frame is present
+			useInotify (bool, optional): Whether to use inotify when it is available. True
+				by default
+		"""
+		self._sequence = sequence
+		self._expected = expected
+		self._onFrameArrived = onFrameArrived
+		self._onRangeComplete = onRangeComplete
+		self._regx = getFramePattern(re.escape(sequence.getPrefix()), re.escape(sequence.getExt()))
+		self._seen = set()
+		self._pending = {}
+		self._signature = None
+		self._remaining = None
+		self._completed = False
+		self._inotify = None
+
+		if expected is not None:
+			self._remaining = len(expected - sequence.getFrameSet())
+
+		if useInotify and _Inotify.isAvailable():
+			try:
+				self._inotify = _Inotify(sequence.getDir())
+			except OSError:
+				logger.warning('Could not watch {} with inotify, falling back to listing'.format(sequence.getDir()), exc_info=True)
+
+		# Frames written before the watch was established still need to be picked up once
+		self._apply(self._filterStable(self._rescan()))
+
+	@classmethod
+	def forFrames(cls, dir, prefix, padding, ext, expected=None, **kwargs):
+		"""Builds a watcher for a sequence that may not have any frames on disk yet
+
+		Args:
+			dir (str): The directory the frames are written to
+			prefix (str): The file name prefix of the frames
+			padding (int): The number of digits frame numbers are padded to
+			ext (str): The extension of the frames
+			expected (FrameSet, optional): The frames that make up the complete range
+			**kwargs: Passed on to the SequenceWatcher constructor
+
+		Returns:
+			SequenceWatcher: The watcher for the (initially empty) sequence
+		"""
+		return cls(Sequence.fromFrameNumbers(dir, prefix, padding, ext, []), expected=expected, **kwargs)
+
+	def getSequence(self):
+		return self._sequence
+
+	def isComplete(self):
+		return self._completed
+
+	def _getSignature(self):
+		stat = os.stat(self._sequence.getDir())
+
+		return (stat.st_mtime, stat.st_size, stat.st_nlink)
+
+	def _rescan(self):
+		"""Lists the directory, returning only the names that were not seen before
+		"""
+		signature = self._getSignature()
+
+		# A signature within the racy window could still change without its mtime changing
+		if signature == self._signature and time.time() - signature[0] > self.RACY_SECONDS:
+			return []
+
+		self._signature = signature
+
+		return [name for name in listDirectory(self._sequence.getDir()) if name not in self._seen]
+
+	def _filterStable(self, names):
+		"""Keeps the listed names whose file is done being written. The frames that might
+		not be are remembered and checked again on the next poll
+		"""
+		stable = []
+		now = time.time()
+
+		for name in names:
+			if name in self._seen:
+				continue
+
+			if not self._regx.match(name): # Not a frame of the sequence, no need to stat it
+				stable.append(name)
+				continue
+
+			try:
+				stat = os.stat(os.path.join(self._sequence.getDir(), name))
+			except OSError: # Removed since it was listed
+				self._pending.pop(name, None)
+				continue
+
+			state = (stat.st_size, stat.st_mtime)
+
+			if self._pending.get(name) == state or now - stat.st_mtime > self.RACY_SECONDS:
+				self._pending.pop(name, None)
+				stable.append(name)
+			else:
+				self._pending[name] = state
+
+		return stable
+
+	def poll(self):
+		"""Picks up the frames that have arrived since the last poll, updating the
+		sequence and invoking the callbacks
+
+		Returns:
+			list: The frame numbers that arrived, in ascending order
+		"""
+		closed = []
+		listed = []
+
+		if self._inotify is not None:
+			closed, overflowed = self._inotify.read()
+
+			if overflowed: # Events were lost, fall back to a diff of the listing
+				listed = self._rescan()
+		else:
+			listed = self._rescan()
+
+		for name in closed: # Done being written, no need to wait for its size to settle
+			self._pending.pop(name, None)
+
+		# Frames that were still being written are checked again even if the directory didn't change
+		listed = set(listed).union(self._pending).difference(closed)
+
+		return self._apply(closed + self._filterStable(sorted(listed)))
+
+	def _apply(self, names):
+		padding = self._sequence.getPadding()
+		numbers = []
+
+		for name in names:
+			if name in self._seen:
+				continue
+
+			self._seen.add(name)
+			match = self._regx.match(name)
+
+			if match and len(match.group('framePadding')) == padding:
+				numbers.append(int(match.group('framePadding')))
+
+		if not numbers:
+			return []
+
+		numbers = [n for n in sorted(set(numbers)) if not self._sequence.hasFrame(n)]
+
+		self._sequence.addFrameNumbers(numbers)
+
+		for n in numbers:
+			if self._remaining is not None and n in self._expected:
+				self._remaining -= 1
+
+			if self._onFrameArrived:
+				self._onFrameArrived(self._sequence.getFrame(n))
+
+		if self._remaining == 0 and not self._completed:
+			self._completed = True
+
+			if self._onRangeComplete:
+				self._onRangeComplete(self._sequence)
+
+		return numbers
+
+	def wait(self, interval=1.0, timeout=None):
+		"""Polls until every expected frame is present
+
+		Args:
+			interval (float, optional): The number of seconds between polls
+			timeout (float, optional): The maximum number of seconds to wait. By default,
+				waits indefinitely
+
+		Returns:
+			bool: True if the range completed, False if the timeout was reached first
+		"""
+		assert self._expected is not None, 'Can only wait for a watcher with expected frames'
+
+		start = time.time()
+
+		while not self._completed:
+			self.poll()
+
+			if self._completed or (timeout is not None and time.time() - start >= timeout):
+				break
+
+			time.sleep(interval)
+
+		return self._completed
+
+	def close(self):
+		"""Releases the inotify watch, if any
+		"""
+		if self._inotify is not None:
+			self._inotify.close()
+			self._inotify = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
@@ -1,27 +1,73 @@
-import hou
 import os, json
-import logging, logging.config
+import logging, threading
 
 # Installation directory for Houdini SDM Tools
 folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'houdini')
 logDir = os.path.join(folder, 'logs')
 
-# Setup logging
-if not os.path.exists(logDir):
-	os.makedirs(logDir)
+logger = logging.getLogger(__name__)
 
-logConfigPath = os.path.join(folder, 'logging.json')
+def configureLogging():
+	"""Sets up logging from logging.json (or to the console if it is missing), creating
+	the log directory. Called when SDMTools first logs something, see DeferredLoggingHandler
+	"""
+	import hou
+	import logging.config
 
-if os.path.exists(logConfigPath):
-	with open(logConfigPath) as logConfig:
-		config = json.load(logConfig)
-		config['handlers']['file_handler']['filename'] = os.path.join(logDir, 'sdm_tools.log')
+	if not os.path.exists(logDir):
+		os.makedirs(logDir)
 
-		logging.config.dictConfig(config)
-else:
-	logging.basicConfig(level=logging.DEBUG)
+	logConfigPath = os.path.join(folder, 'logging.json')
 
-logger = logging.getLogger(__name__)
+	if os.path.exists(logConfigPath):
+		with open(logConfigPath) as logConfig:
+			config = json.load(logConfig)
+			config['handlers']['file_handler']['filename'] = os.path.join(logDir, 'sdm_tools.log')
+
+			logging.config.dictConfig(config)
+	else:
+		logging.basicConfig(level=logging.DEBUG)
+
+	logger.info('Houdini version: {}'.format(hou.applicationVersionString()))
+	logger.info('Init SDMTool Houdini library in folder: {}'.format(folder))
+
+class DeferredLoggingHandler(logging.Handler):
+	"""Configures logging when the first record of an SDMTools logger is emitted, rather
+	than when the package is imported, so that loading SDMTools at startup doesn't read the
+	logging config or open log files. Once logging is configured the handler removes itself,
+	and the record carries on to the newly configured handlers.
+
+	Logging is configured once, even if several threads emit their first records at the
+	same time. If configuring fails (i.e. the log directory can't be created, or the config
+	is malformed), logging falls back to the console and the error is reported through
+	handleError, rather than raised into the code that was logging
+	"""
+	_lock = threading.RLock()
+
+	def __init__(self, target):
+		logging.Handler.__init__(self)
+
+		self._target = target
+		self._configured = False
+
+	def emit(self, record):
+		with DeferredLoggingHandler._lock:
+			if self._configured:
+				return
+
+			self._configured = True
+			self._target.removeHandler(self)
+			self._target.setLevel(logging.NOTSET)
+
+			try:
+				configureLogging()
+			except Exception:
+				logging.basicConfig(level=logging.DEBUG)
+				self.handleError(record)
+
+def _installDeferredLogging():
+	target = logging.getLogger('sdm')
+	target.setLevel(logging.DEBUG)
+	target.addHandler(DeferredLoggingHandler(target))
 
-logger.info('Houdini version: {}'.format(hou.applicationVersionString()))
-logger.info('Init SDMTool Houdini library in folder: {}'.format(folder))
\ No newline at end of file
+_installDeferredLogging()
@@ -12,6 +12,11 @@ import os, logging
 
 logger = logging.getLogger(__name__)
 
+class FlipbookMode():
+	FRAME_MAJOR = 'frame'
+	CAMERA_RANGES = 'camera'
+	BACKGROUND = 'background'
+
 def getCameras():
 	"""Gets all cameras in the scene
 
@@ -59,6 +64,26 @@ def getCurrentViewport(viewportType):
 
 	return viewport[0]
 
+def getViewportFullName(sceneViewer, viewport):
+	"""Gets the name of the given viewport, as expected by the viewwrite HScript command
+	"""
+	return '{}.{}.world.{}'.format(hou.ui.curDesktop().name(), sceneViewer.name(), viewport.name())
+
+def getCameraOutput(camera, output):
+	"""Gets the output path for the given camera's flipbook, which is the given output
+	with the camera name prefixed to the file name
+
+	Args:
+		camera (hou.Node): The camera being flipbooked
+		output (str): The file path chosen for the flipbooks
+
+	Returns:
+		str: The file path of the camera's flipbook
+	"""
+	dir, name = os.path.split(output)
+
+	return os.path.join(dir, '{}_{}'.format(camera.name(), name))
+
 def flipbook(camera, output=None, frameRange=None):
 	"""Outputs a flipbook animation from the given camera
 
@@ -97,7 +122,7 @@ def flipbook(camera, output=None, frameRange=None):
 		hou.ui.displayMessage('Could not find the "Persp" viewport', title='Flipbook Error', severity=hou.severityType.Error)
 		return
 
-	viewportFullName = '{}.{}.world.{}'.format(hou.ui.curDesktop().name(), sceneViewer.name(), viewport.name())
+	viewportFullName = getViewportFullName(sceneViewer, viewport)
 
 	logger.info('Preparing to flipbook for viewport: {}'.format(viewportFullName))
 
@@ -110,4 +135,77 @@ def flipbook(camera, output=None, frameRange=None):
 		command = "viewwrite -M -f {} {} -i {} {}".format(frameStart, frameEnd, frameInc, viewportFullName)
 
 	logger.debug('Executing HScript: {}'.format(command))
-	hou.hscript(command)
\ No newline at end of file
+	hou.hscript(command)
+
+def flipbookCameras(cameras, output, frameRange, mode=FlipbookMode.CAMERA_RANGES, processes=None):
+	"""Outputs flipbooks from several cameras, each to the given output path with the camera
+	name prefixed to the file name. The flipbooks are scheduled according to the given mode:
+
+	- FlipbookMode.FRAME_MAJOR: each frame is set (and cooked) once, and captured from every camera
+	  before moving on to the next frame. Best when the scene is expensive to cook
+	- FlipbookMode.CAMERA_RANGES: the whole frame range is written from each camera in turn, with a
+	  single viewwrite per camera. Best when cooking is cheap (i.e. cached geometry), as the per
+	  frame setup is only paid once per camera
+	- FlipbookMode.BACKGROUND: each camera is flipbooked through an OpenGL ROP in its own background
+	  hython session, a few running at once. These sessions load the hip file from disk, so the
+	  user is asked to save unsaved changes first, and nothing is flipbooked if they don't
+
+	Args:
+		cameras (list): The camera nodes to flipbook from
+		output (str): The file path to output the flipbooks to, including $F
+		frameRange (tuple): The start frame, end frame and frame increment of the flipbooks
+		mode (str, optional): The FlipbookMode to schedule the flipbooks with
+		processes (int, optional): The maximum number of background sessions to run at once,
+			for FlipbookMode.BACKGROUND. By default, see sdm.houdini.headless.getBackgroundSessionCount
+
+	Returns:
+		list: The (hou.Node, str) tuple of each camera and its output. For FlipbookMode.BACKGROUND,
+			the sdm.houdini.headless.HeadlessJob of each camera instead
+	"""
+	frameStart, frameEnd, frameInc = [int(f) for f in frameRange]
+	cameraOutputs = [(camera, getCameraOutput(camera, output)) for camera in cameras]
+
+	logger.info('Flipbooking {} camera(s) for frame range: {}-{} with increment: {}, mode: {}'.format(len(cameras), frameStart, frameEnd, frameInc, mode))
+
+	if mode == FlipbookMode.BACKGROUND:
+		from sdm.houdini.headless import HeadlessJob, UnsavedHipFileError, getSavedHipFile, runHeadlessJobs
+
+		try:
+			hip = getSavedHipFile()
+		except UnsavedHipFileError as e:
+			hou.ui.displayMessage(str(e), title='Flipbook Error', severity=hou.severityType.Error)
+			return []
+
+		jobs = [HeadlessJob.flipbook(hip, camera.path(), cameraOutput, (frameStart, frameEnd, frameInc)) for camera, cameraOutput in cameraOutputs]
+
+		with hou.InterruptableOperation('Flipbooking {} camera(s) in the background...'.format(len(jobs)), open_interrupt_dialog=True) as operation:
+			return runHeadlessJobs(jobs, workers=processes, operation=operation)
+
+	sceneViewer = getSceneViewer()
+
+	if not sceneViewer:
+		hou.ui.displayMessage('Could not find Scene Viewer pane tab, please create it and try again', title='Flipbook Error', severity=hou.severityType.Error)
+		return []
+
+	viewport = getCurrentViewport(hou.geometryViewportType.Perspective)
+
+	if not viewport:
+		hou.ui.displayMessage('Could not find the "Persp" viewport', title='Flipbook Error', severity=hou.severityType.Error)
+		return []
+
+	viewportFullName = getViewportFullName(sceneViewer, viewport)
+
+	if mode == FlipbookMode.FRAME_MAJOR:
+		for f in range(frameStart, frameEnd + 1, frameInc):
+			hou.setFrame(f)
+
+			for camera, cameraOutput in cameraOutputs:
+				viewport.setCamera(camera)
+				hou.hscript("viewwrite -f {0} {0} {1} '{2}'".format(f, viewportFullName, cameraOutput))
+	else:
+		for camera, cameraOutput in cameraOutputs:
+			hou.setFrame(frameStart)
+			viewport.setCamera(camera)
+			hou.hscript("viewwrite -f {} {} -i {} {} '{}'".format(frameStart, frameEnd, frameInc, viewportFullName, cameraOutput))
+
+	return cameraOutputs
@@ -1,9 +1,8 @@
 import os, glob
 import logging
 import hou
-import urllib, urllib2, json, zipfile, StringIO, uuid, shutil, base64
+import base64
 from datetime import datetime
-import smtplib
 
 from PySide2.QtCore import *
 from PySide2.QtGui import *
@@ -11,10 +10,15 @@ from PySide2.QtWidgets import *
 from PySide2.QtUiTools import QUiLoader
 
 import sdm.houdini
-from sdm.houdini.fileutils import SettingsFile, getLargerVersions, writeFileWithStructure, changeBaseDir, mergeDict, ValidationType
-from sdm.utils import splitByCamelCase
+from sdm.houdini.fileutils import SettingsFile, ValidationType
+from sdm.utils import splitByCamelCase, getCacheDir, LazyModule
 from sdm.houdini.shelves import addShelf
 
+# Only needed when checking for updates or testing the notification email
+zipfile = LazyModule('zipfile')
+installer = LazyModule('sdm.houdini.installer')
+smtplib = LazyModule('smtplib')
+
 logger = logging.getLogger(__name__)
 
 class PreferencesDialog(QDialog):
@@ -169,29 +173,20 @@ class CheckForUpdatesDialog(QDialog):
 				self.ui.TBL_versions.setItem(r, c, item)
 
 def checkForUpdates(silent=False):
-	settings = SettingsFile()
-
-	currVer = settings.get('version', 'v1.0.0')
-	autoCheckUpdates = settings.get('autoCheckUpdates', False)
+	"""Checks for new versions in the background, prompting to install one if there are any.
+	See sdm.houdini.updates.checkForUpdatesInBackground
 
-	releasesUrl = 'http://api.github.com/repos/sashaouellet/SDMTools/releases'
-	allVersions = []
+	Args:
+		silent (bool, optional): Whether to not tell the user when there are no new versions
+			or when the check failed
+	"""
+	from sdm.houdini.updates import checkForUpdatesInBackground
 
-	try:
-		logger.info('Retrieving all releases')
-		response = urllib.urlopen(releasesUrl)
-		data = json.loads(response.read())
+	checkForUpdatesInBackground(promptForUpdates, silent=silent)
 
-		for release in data:
-			allVersions.append(release)
-	except urllib2.URLError, e:
-		hou.ui.displayMessage('Error when retrieving new versions: {}'.format(e), title='SDMTools Updates', severity=hou.severityType.Error)
-		logger.warning('Error in retrieval', exc_info=True)
-		return
-
-	newVersions = getLargerVersions(currVer, allVersions)
-
-	logger.debug('Newer versions found: {}'.format(newVersions))
+def promptForUpdates(newVersions, allVersions):
+	settings = SettingsFile()
+	autoCheckUpdates = settings.get('autoCheckUpdates', False)
 
 	if len(newVersions) > 0: # Prompt user for new versions
 		dialog = CheckForUpdatesDialog(newVersions, autoCheckUpdates)
@@ -221,66 +216,43 @@ def checkForUpdates(silent=False):
 			if version:
 				logger.info('Installing {}'.format(selectedTag))
 
-				targetDir =  os.path.join(os.path.split(os.path.dirname(sdm.houdini.folder))[0], 'temp_{}'.format(uuid.uuid4())) # temp SDMTools base directory - to rename after deleting old one
-				oldSettings = '{}'
-
-				for dirpath, dirs, files in os.walk(os.path.dirname(sdm.houdini.folder)):
-					for f in files:
-						if f == 'settings.json':
-							oldSettings = json.load(open(os.path.join(dirpath, f)))
+				installDir = os.path.dirname(sdm.houdini.folder)
+				settingsPath = os.path.relpath(os.path.join(sdm.houdini.folder, 'settings.json'), installDir)
+				transforms = {settingsPath: installer.mergeSettingsTransform(version['tag_name'], autoCheckUpdates)}
+				archivePath = getCacheDir('updates', '{}.zip'.format(version['tag_name'])) # Kept until installed, so interrupted downloads resume
 
 				try:
-					logger.info('Obtaining zipball from {}'.format(version['zipball_url']))
-					response = urllib2.urlopen(version['zipball_url'])
-					s = StringIO.StringIO()
-
-					s.write(response.read())
-
-					with zipfile.ZipFile(s) as zip:
-						sourceBase = os.path.split(zip.namelist()[0])[0]
-
-						for file in zip.namelist():
-							fileName = os.path.split(file)[1]
+					if not os.path.isdir(os.path.dirname(archivePath)):
+						os.makedirs(os.path.dirname(archivePath))
 
-							logger.debug('Installing {}'.format(fileName))
+					with hou.InterruptableOperation('Installing {}'.format(version['tag_name']), long_operation_name='Installing SDMTools', open_interrupt_dialog=True) as operation:
+						if not os.path.exists(archivePath):
+							logger.info('Obtaining zipball from {}'.format(version['zipball_url']))
+							installer.downloadFile(version['zipball_url'], archivePath, onProgress=lambda done, total: operation.updateProgress(done / float(total)) if total else None)
 
-							if fileName != 'settings.json': # Don't want to override this
-								writeFileWithStructure(zip.read(file), file, baseDir=targetDir)
-							else:
-								settingsData = json.loads(zip.read(file))
-								overwriteSettings = settingsData.get('forceOverwrite', False)
+						installer.installRelease(archivePath, installDir, transforms=transforms, onProgress=lambda done, total: operation.updateProgress(done / float(total)))
 
-								if overwriteSettings:
-									logger.debug('Forced overwrite of settings.json')
-									writeFileWithStructure(zip.read(file), file, baseDir=targetDir)
-								else: # Line by line merge
-									logger.debug('Merging new settings with existing')
-									targetSettings = open(changeBaseDir(file, targetDir), 'w+')
-									mergedJson = mergeDict(json.load(zip.open(file)), oldSettings)
-									mergedJson['version'] = version['tag_name']
-									mergedJson['autoCheckUpdates'] = autoCheckUpdates
-
-									json.dump(mergedJson, targetSettings, sort_keys=True, indent=4, separators=(',', ': '))
-
-					oldFolder = os.path.dirname(sdm.houdini.folder)
-					shutil.rmtree(oldFolder) # Delete old folder
-					os.rename(targetDir, oldFolder)
+					os.remove(archivePath)
 
 					hou.ui.displayMessage('Successfully installed {}!'.format(version['tag_name']), title='SDMTools updates')
 					logger.info('Finished installation')
 
-				except urllib2.URLError, e:
-					hou.ui.displayMessage('Error when downloading new version: {}'.format(e), title='SDMTools Updates', severity=hou.severityType.Error)
-					logger.warning('Error retrieving zipball', exc_info=True)
+				except hou.OperationInterrupted:
+					logger.info('Installation interrupted')
+					return
+				except (IOError, OSError), e:
+					hou.ui.displayMessage('Error when installing new version: {}'.format(e), title='SDMTools Updates', severity=hou.severityType.Error)
+					logger.warning('Error installing zipball', exc_info=True)
+					return
+				except zipfile.BadZipfile, e:
+					os.remove(archivePath) # Corrupt, download it again next time
+					hou.ui.displayMessage('Error when installing new version: {}'.format(e), title='SDMTools Updates', severity=hou.severityType.Error)
+					logger.warning('Invalid zipball', exc_info=True)
 					return
 			else:
 				hou.ui.displayMessage('Error loading version from selection. Please try again.', title='SDMTools Updates', severity=hou.severityType.Error)
 				logger.warning('Could not get version based on selected tag: {}'.format(selectedTag))
 				return
-	else:
-		logger.debug('No new updates')
-		if not silent:
-			hou.ui.displayMessage('No updates available', title='SDMTools Updates')
 
 def showPreferences():
 	settings = SettingsFile()
@@ -0,0 +1,696 @@
+"""Execution of ROPs outside of the artist's session, split into chunks of frames that are
+cached by background hython sessions.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, re, json, math, time, hashlib, threading, traceback, logging
+from collections import deque
+
+import hou
+
+from sdm.utils import getCacheDir, writeFileAtomic
+from sdm.files.fileclassification import FrameSet
+from sdm.files.watcher import SequenceWatcher
+from sdm.houdini.headless import HeadlessJob, getBackgroundSessionCount, getSavedHipFile
+from sdm.houdini.node import getRopNode
+
+logger = logging.getLogger(__name__)
+
+ROP_OUTPUT_PARMS = ['sopoutput', 'dopoutput', 'lopoutput', 'picture', 'vm_picture', 'filename', 'file']
+OUTPUT_FRAME_PATTERN = re.compile(r'^(?P<prefix>.+)[\.\-_](?P<framePadding>\d+)\.(?P<ext>[^\d].*)$')
+
+def getRopFrameSet(rop):
+	"""Gets the frames the given ROP outputs, from its frame range parameters
+
+	Args:
+		rop (hou.RopNode): The ROP to get the frames of
+
+	Returns:
+		FrameSet: The frames of the ROP's range, or just the current frame if the ROP
+			only renders that
+	"""
+	trange = rop.parm('trange')
+
+	if trange is not None and trange.eval() == 0:
+		frame = int(hou.frame())
+
+		return FrameSet([(frame, frame, 1)])
+
+	start, end, inc = rop.parmTuple('f').eval()
+
+	return FrameSet([(int(start), int(end), max(1, int(inc)))])
+
+def getRopOutputParm(rop):
+	"""Gets the parameter holding the file path the given ROP outputs to
+
+	Args:
+		rop (hou.RopNode): The ROP to get the output parameter of
+
+	Returns:
+		hou.Parm: The output parameter, or None if the ROP has none of the known ones
+	"""
+	for name in ROP_OUTPUT_PARMS:
+		parm = rop.parm(name)
+
+		if parm is not None:
+			return parm
+
+	return None
+
+def getRopOutputSequence(rop, frame):
+	"""Gets the sequence the given ROP outputs, by evaluating its output path at the
+	given frame
+
+	Args:
+		rop (hou.RopNode): The ROP to get the output sequence of
+		frame (int): A frame the ROP outputs
+
+	Returns:
+		tuple: The directory, prefix, padding and extension of the output frames, or
+			None if the output path is not a sequence
+	"""
+	parm = getRopOutputParm(rop)
+
+	if parm is None:
+		return None
+
+	path = parm.evalAtFrame(frame)
+	match = OUTPUT_FRAME_PATTERN.match(os.path.basename(path))
+
+	if not match or int(match.group('framePadding')) != frame:
+		return None
+
+	return (os.path.dirname(path), match.group('prefix'), len(match.group('framePadding')), match.group('ext'))
+
+def getRopOutputSizes(rop, frames):
+	"""Gets the size of the file the given ROP output for each of the given frames
+
+	Args:
+		rop (hou.RopNode): The ROP to get the output sizes of
+		frames (FrameSet): The frames to get the output sizes of
+
+	Returns:
+		dict: Maps each frame whose output file exists to its size in bytes
+	"""
+	parm = getRopOutputParm(rop)
+	sizes = {}
+
+	if parm is None:
+		return sizes
+
+	for frame in frames:
+		try:
+			sizes[frame] = os.path.getsize(parm.evalAtFrame(frame))
+		except (IOError, OSError):
+			continue
+
+	return sizes
+
+class BackgroundCache(object):
+	"""Caches a ROP in background hython sessions, one chunk of frames per session, so
+	the artist's session stays usable while the cache runs.
+
+	The ROP's output frames are watched as they land on disk, and each chunk is reported
+	through onChunkComplete as soon as its session has finished and all of its frames are
+	present, i.e. to start flipbooking the cached frames while later chunks are still
+	running. The sessions are driven by poll(), which runInEventLoop() calls from Houdini's
+	event loop.
+	"""
+	OUTPUT_GRACE_SECONDS = 10.0
+
+	def __init__(self, rop, frames=None, chunkSize=10, workers=None, onChunkComplete=None, onComplete=None, hip=None, hython=None):
+		"""
+		Args:
+			rop (hou.RopNode): The ROP to cache, see sdm.houdini.node.getRopNode
+			frames (FrameSet, optional): The frames to cache. By default, the ROP's frame range
+			chunkSize (int, optional): The number of frames cached by each session
+			workers (int, optional): The maximum number of sessions to run at once. By default,
+				see sdm.houdini.headless.getBackgroundSessionCount
+			onChunkComplete (callable, optional): Called with the FrameSet of each chunk once
+				it is cached. Errors it raises are logged, and don't stop the cache
+			onComplete (callable, optional): Called with this BackgroundCache once every chunk
+				has finished (or failed)
+			hip (str, optional): The hip file to load. By default, the current hip file, see
+				sdm.houdini.headless.getSavedHipFile
+			hython (str, optional): The executable to run the sessions with. By default, hython
+				from $HFS/bin
+
+		Raises:
+			sdm.houdini.headless.UnsavedHipFileError: If no hip file is given and the scene is
+				not saved
+		"""
+		self._rop = rop
+		self._frames = frames if frames is not None else getRopFrameSet(rop)
+		self._workers = max(1, workers or getBackgroundSessionCount())
+		self._onChunkComplete = onChunkComplete
+		self._onComplete = onComplete
+		self._watcher = None
+		self._eventLoopInterval = None
+		self._lastPoll = 0
+
+		hip = hip or getSavedHipFile()
+		chunks = list(self._frames.chunks(chunkSize))
+		self._jobs = [(chunk, HeadlessJob.render(hip, rop.path(), chunk.getRanges(), hython=hython)) for chunk in chunks]
+		self._pending = list(reversed(self._jobs))
+		self._running = []
+		self._finished = []
+		self._exitTimes = {}
+		self._completed = False
+
+		if self._frames:
+			output = getRopOutputSequence(rop, next(iter(self._frames)))
+
+			if output is not None:
+				dir, prefix, padding, ext = output
+
+				if not os.path.exists(dir):
+					os.makedirs(dir)
+
+				self._watcher = SequenceWatcher.forFrames(dir, prefix, padding, ext, expected=self._frames)
+
+		logger.info('Caching {} in the background: {} frame(s) in {} chunk(s)'.format(rop.path(), len(self._frames), len(chunks)))
+
+	def getRop(self):
+		return self._rop
+
+	def getFrames(self):
+		return self._frames
+
+	def getJobs(self):
+		"""Gets the session of each chunk
+
+		Returns:
+			list: A (FrameSet, sdm.houdini.headless.HeadlessJob) tuple for each chunk
+		"""
+		return self._jobs
+
+	def getFailedChunks(self):
+		return [(chunk, job) for chunk, job in self._jobs if job.getStatus() == HeadlessJob.FAILED]
+
+	def isComplete(self):
+		return self._completed
+
+	def getProgress(self):
+		return len(self._finished) / float(len(self._jobs) or 1)
+
+	def poll(self):
+		"""Starts sessions for pending chunks as others finish, and reports the chunks
+		that are now cached
+
+		Returns:
+			bool: True once every chunk has finished
+		"""
+		if self._completed:
+			return True
+
+		while self._pending and len(self._running) < self._workers:
+			chunk, job = self._pending.pop()
+			job.start()
+			self._running.append((chunk, job))
+
+		if self._watcher is not None:
+			self._watcher.poll()
+
+		stillRunning = []
+		cached = []
+
+		for chunk, job in self._running:
+			if not job.poll():
+				stillRunning.append((chunk, job))
+			elif not job.succeeded():
+				logger.warning('Chunk {} of {} failed: {}'.format(chunk, self._rop.path(), job.getError()))
+				self._finished.append((chunk, job))
+			elif self._isOnDisk(chunk, job):
+				self._finished.append((chunk, job))
+				cached.append(chunk)
+			else: # Session is done, but its last frames aren't visible yet
+				stillRunning.append((chunk, job))
+
+		# Updated before the callbacks run, so an error in one can't report a chunk twice
+		self._running = stillRunning
+
+		if self._onChunkComplete:
+			for chunk in cached:
+				try:
+					self._onChunkComplete(chunk)
+				except Exception:
+					logger.exception('Error in chunk callback of {} for chunk {}'.format(self._rop.path(), chunk))
+
+		if not self._pending and not self._running:
+			self._complete()
+
+		return self._completed
+
+	def _isOnDisk(self, chunk, job):
+		if self._watcher is None:
+			return True
+
+		sequence = self._watcher.getSequence()
+
+		if all(sequence.hasFrame(f) for f in chunk):
+			return True
+
+		# Don't wait forever on frames the ROP may never write, i.e. if its output isn't per frame
+		exitTime = self._exitTimes.setdefault(id(job), time.time())
+
+		if time.time() - exitTime > self.OUTPUT_GRACE_SECONDS:
+			logger.warning('Chunk {} of {} finished without writing all of its frames'.format(chunk, self._rop.path()))
+			return True
+
+		return False
+
+	def _complete(self):
+		self._completed = True
+		self.stopEventLoop()
+
+		if self._watcher is not None:
+			self._watcher.close()
+
+		failed = self.getFailedChunks()
+
+		logger.info('Background cache of {} finished, {} chunk(s) failed'.format(self._rop.path(), len(failed)))
+
+		if self._onComplete:
+			try:
+				self._onComplete(self)
+			except Exception:
+				logger.exception('Error in completion callback of {}'.format(self._rop.path()))
+
+	def wait(self, interval=0.5):
+		"""Blocks until every chunk has finished
+
+		Args:
+			interval (float, optional): The number of seconds between polls
+		"""
+		while not self.poll():
+			time.sleep(interval)
+
+	def cancel(self):
+		"""Kills the running sessions and drops the pending chunks
+		"""
+		if self._completed:
+			return
+
+		for chunk, job in self._jobs:
+			job.cancel()
+
+		self._pending = []
+		self._running = []
+		self._complete()
+
+	def runInEventLoop(self, interval=0.5):
+		"""Polls from Houdini's event loop (at most every interval seconds) until every
+		chunk has finished, so the callbacks run on the main thread without blocking it
+
+		Args:
+			interval (float, optional): The minimum number of seconds between polls
+		"""
+		self._eventLoopInterval = interval
+		self.poll()
+
+		if not self._completed:
+			hou.ui.addEventLoopCallback(self._onEventLoop)
+
+	def stopEventLoop(self):
+		if self._eventLoopInterval is None:
+			return
+
+		self._eventLoopInterval = None
+
+		try:
+			hou.ui.removeEventLoopCallback(self._onEventLoop)
+		except hou.OperationFailed:
+			pass
+
+	def _onEventLoop(self):
+		if self._eventLoopInterval is None or time.time() - self._lastPoll < self._eventLoopInterval:
+			return
+
+		self._lastPoll = time.time()
+		self.poll()
+
+class ChunkManifest(object):
+	"""Records which frames of a chunked execution are done, persisted to a JSON file after
+	every chunk, so an interrupted execution can resume with only the missing frames.
+	A manifest written for another ROP or frame range is ignored
+	"""
+
+	def __init__(self, path, rop, frames):
+		"""
+		Args:
+			path (str): The file the manifest is persisted to
+			rop (str): The path of the ROP being executed
+			frames (FrameSet): All of the frames being executed
+		"""
+		self._path = path
+		self._rop = rop
+		self._frames = frames
+		self._completed = FrameSet()
+		self._failed = {}
+		self._lock = threading.Lock()
+
+		self._load()
+
+	def _load(self):
+		if not os.path.exists(self._path):
+			return
+
+		try:
+			with open(self._path) as f:
+				data = json.load(f)
+		except (IOError, OSError, ValueError):
+			logger.warning('Could not load manifest: {}, starting over'.format(self._path), exc_info=True)
+			return
+
+		if data.get('rop') != self._rop or data.get('frames') != str(self._frames):
+			logger.info('Manifest {} is for another execution, starting over'.format(self._path))
+			return
+
+		self._completed = FrameSet.fromString(data.get('completed', ''))
+
+		logger.info('Resuming {} from manifest, {} frame(s) already done'.format(self._rop, len(self._completed)))
+
+	def getPath(self):
+		return self._path
+
+	def getCompleted(self):
+		return self._completed
+
+	def getRemaining(self):
+		return self._frames - self._completed
+
+	def getFailed(self):
+		"""Gets the chunks that failed on their last attempt
+
+		Returns:
+			dict: Maps the frame string of each failed chunk to its error
+		"""
+		return self._failed
+
+	def isComplete(self):
+		return not self.getRemaining()
+
+	def markCompleted(self, chunk):
+		with self._lock:
+			self._completed = self._completed | chunk
+			self._failed.pop(str(chunk), None)
+			self._save()
+
+	def markFailed(self, chunk, error):
+		with self._lock:
+			self._failed[str(chunk)] = error
+			self._save()
+
+	def _save(self):
+		data = {'rop':self._rop, 'frames':str(self._frames), 'completed':str(self._completed), 'failed':self._failed}
+
+		try:
+			writeFileAtomic(self._path, json.dumps(data, indent=4))
+		except (IOError, OSError):
+			logger.warning('Could not write manifest: {}'.format(self._path), exc_info=True)
+
+def getDefaultManifestPath(rop):
+	"""Gets where the manifest of the given ROP's chunked executions is kept by default,
+	which is unique to the current hip file and the ROP
+
+	Args:
+		rop (hou.RopNode): The ROP being executed
+
+	Returns:
+		str: The manifest path, in the SDMTools cache directory
+	"""
+	key = hashlib.sha1('{}:{}'.format(hou.hipFile.path(), rop.path()).encode('utf-8')).hexdigest()
+
+	return getCacheDir('manifests', '{}_{}.json'.format(rop.name(), key[:12]))
+
+class HeadlessRopExecutor(object):
+	"""Executes chunks of a ROP in background hython sessions, one session per chunk, for
+	use with ChunkedExecutor. The sessions that are running are tracked, so that cancelling
+	kills them rather than waiting for their chunks to finish
+	"""
+
+	def __init__(self, rop, hip=None, hython=None):
+		"""
+		Args:
+			rop (str): The path of the ROP to execute
+			hip (str, optional): The hip file to load. By default, the current hip file, see
+				sdm.houdini.headless.getSavedHipFile
+			hython (str, optional): The executable to run the sessions with. By default, hython
+				from $HFS/bin
+		"""
+		self._rop = rop
+		self._hip = hip or getSavedHipFile()
+		self._hython = hython
+		self._lock = threading.Lock()
+		self._running = set()
+		self._cancelled = False
+
+	def __call__(self, chunk):
+		job = HeadlessJob.render(self._hip, self._rop, chunk.getRanges(), hython=self._hython)
+
+		with self._lock: # Started under the lock, so cancel() can't miss it
+			if self._cancelled:
+				raise RuntimeError('Execution was cancelled')
+
+			job.start()
+			self._running.add(job)
+
+		try:
+			if not job.wait():
+				raise RuntimeError(job.getError() or 'Execution was cancelled')
+		finally:
+			with self._lock:
+				self._running.discard(job)
+
+	def cancel(self):
+		"""Kills the running sessions, and fails any chunk executed from then on
+		"""
+		with self._lock:
+			self._cancelled = True
+			jobs = list(self._running)
+
+		for job in jobs:
+			job.cancel()
+
+class ChunkedExecutor(object):
+	"""Executes frames in chunks on a number of local workers, with work stealing: the chunks
+	are split into one contiguous block per worker, and a worker that runs out of chunks takes
+	the last chunk from the worker with the most left, so slow frames don't leave the other
+	workers idle. Failed chunks are retried, and progress can be recorded to a ChunkManifest
+	so an interrupted execution only runs the missing frames when started again.
+
+	Chunks are run by the given execute callable, from the worker threads. This is i.e. a
+	HeadlessRopExecutor, or any callable taking a FrameSet, such as a fake ROP for testing.
+	If the callable has a cancel method, it is called when the execution is cancelled to
+	stop the chunks that are executing.
+	"""
+
+	def __init__(self, execute, frames, chunkSize=10, workers=None, retries=2, manifest=None, onChunkComplete=None):
+		"""
+		Args:
+			execute (callable): Called with the FrameSet of each chunk to execute it. Raising
+				an exception or returning False fails the chunk
+			frames (FrameSet): The frames to execute
+			chunkSize (int, optional): The number of frames per chunk
+			workers (int, optional): The number of chunks to execute at once. By default, see
+				sdm.houdini.headless.getBackgroundSessionCount
+			retries (int, optional): The number of times a failed chunk is tried again
+			manifest (ChunkManifest, optional): Records progress, and holds the frames that
+				are already done when resuming
+			onChunkComplete (callable, optional): Called with the FrameSet of each completed
+				chunk, from the worker thread that executed it
+		"""
+		self._execute = execute
+		self._frames = frames
+		self._chunkSize = chunkSize
+		self._workers = max(1, workers or getBackgroundSessionCount())
+		self._retries = retries
+		self._manifest = manifest
+		self._onChunkComplete = onChunkComplete
+		self._lock = threading.Lock()
+		self._queues = []
+		self._completed = []
+		self._failed = []
+		self._steals = 0
+		self._cancelled = False
+
+	def getCompleted(self):
+		return self._completed
+
+	def getFailed(self):
+		"""Gets the chunks that failed on every attempt
+
+		Returns:
+			list: A (FrameSet, str) tuple of each failed chunk and its last error
+		"""
+		return self._failed
+
+	def getStealCount(self):
+		return self._steals
+
+	def cancel(self):
+		"""Stops handing out chunks, and stops the chunks that are executing if the execute
+		callable can be cancelled. Those chunks are not recorded as failed
+		"""
+		self._cancelled = True
+		cancel = getattr(self._execute, 'cancel', None)
+
+		if cancel is not None:
+			cancel()
+
+	def run(self, operation=None):
+		"""Executes every frame that is not done yet, blocking until all chunks have completed
+		or failed. If the calling thread is interrupted (i.e. by the user interrupting the
+		given operation), the execution is cancelled before the exception is raised
+
+		Args:
+			operation (hou.InterruptableOperation, optional): The operation to report progress to
+
+		Returns:
+			bool: True if every frame was executed successfully
+		"""
+		frames = self._manifest.getRemaining() if self._manifest else self._frames
+		chunks = list(frames.chunks(self._chunkSize))
+		workers = min(self._workers, len(chunks))
+
+		if not chunks:
+			return True
+
+		perWorker = int(math.ceil(len(chunks) / float(workers)))
+		self._queues = [deque((chunk, 0) for chunk in chunks[i:i + perWorker]) for i in range(0, len(chunks), perWorker)]
+		threads = [threading.Thread(target=self._work, args=(index,)) for index in range(len(self._queues))]
+
+		logger.info('Executing {} frame(s) in {} chunk(s) on {} worker(s)'.format(len(frames), len(chunks), len(threads)))
+
+		for thread in threads:
+			thread.daemon = True
+			thread.start()
+
+		try:
+			for thread in threads:
+				while thread.is_alive():
+					thread.join(0.1) # Joining with a timeout keeps the main thread interruptable
+
+					if operation is not None:
+						operation.updateProgress((len(self._completed) + len(self._failed)) / float(len(chunks)))
+		except BaseException:
+			self.cancel()
+			raise
+
+		logger.info('Executed {} chunk(s), {} failed, {} stolen'.format(len(self._completed), len(self._failed), self._steals))
+
+		return not self._failed and not self._cancelled
+
+	def _next(self, index):
+		with self._lock:
+			if self._cancelled:
+				return None
+
+			queue = self._queues[index]
+
+			if queue:
+				return queue.popleft()
+
+			victim = max(self._queues, key=len)
+
+			if not victim:
+				return None
+
+			self._steals += 1
+
+			return victim.pop()
+
+	def _work(self, index):
+		while True:
+			item = self._next(index)
+
+			if item is None:
+				return
+
+			chunk, attempt = item
+
+			try:
+				succeeded = self._execute(chunk) is not False
+				error = None if succeeded else 'Execution returned False'
+			except Exception:
+				succeeded = False
+				error = traceback.format_exc()
+
+			if not succeeded and self._cancelled: # Stopped by cancel(), rather than failed
+				return
+
+			if succeeded:
+				with self._lock:
+					self._completed.append(chunk)
+
+				if self._manifest is not None:
+					self._manifest.markCompleted(chunk)
+
+				if self._onChunkComplete:
+					try: # A failing callback mustn't stop this worker, or fail the chunk
+						self._onChunkComplete(chunk)
+					except Exception:
+						logger.exception('Error in chunk callback for chunk {}'.format(chunk))
+
+				continue
+
+			if attempt < self._retries:
+				logger.warning('Chunk {} failed (attempt {} of {}), retrying'.format(chunk, attempt + 1, self._retries + 1))
+
+				with self._lock:
+					self._queues[index].append((chunk, attempt + 1))
+
+				continue
+
+			logger.error('Chunk {} failed: {}'.format(chunk, error))
+
+			with self._lock:
+				self._failed.append((chunk, error))
+
+			if self._manifest is not None:
+				self._manifest.markFailed(chunk, error)
+
+def executeRopChunked(node, frameString=None, chunkSize=10, workers=None, retries=2, manifestPath=None, execute=None):
+	"""Executes the ROP of the given node in chunks of frames on local workers, resuming from
+	its manifest if a previous execution of the same frames was interrupted.
+
+	This blocks until every chunk has finished, so when called from the UI thread, Houdini
+	is unresponsive meanwhile: progress is shown in an interruptable operation, and
+	interrupting it kills the running sessions. To keep the session usable instead, see
+	BackgroundCache, which is driven from the event loop
+
+	Args:
+		node (hou.Node): The ROP, or a node containing it, see sdm.houdini.node.getRopNode
+		frameString (str, optional): The frames to execute, i.e. '1-100, 120-140:2'. By
+			default, the ROP's frame range
+		chunkSize (int, optional): The number of frames per chunk
+		workers (int, optional): The number of chunks to execute at once. By default, see
+			sdm.houdini.headless.getBackgroundSessionCount
+		retries (int, optional): The number of times a failed chunk is tried again
+		manifestPath (str, optional): The file to record progress to. By default, see
+			getDefaultManifestPath
+		execute (callable, optional): Executes each chunk. By default, a HeadlessRopExecutor
+
+	Returns:
+		ChunkedExecutor: The finished executor, holding the completed and failed chunks
+
+	Raises:
+		ValueError: If no ROP could be found from the given node
+		hou.OperationInterrupted: If the user interrupted the execution
+	"""
+	rop = getRopNode(node)
+
+	if rop is None:
+		raise ValueError('No ROP found for node: {}'.format(node.path() if node else node))
+
+	frames = FrameSet.fromString(frameString) if frameString else getRopFrameSet(rop)
+	manifest = ChunkManifest(manifestPath or getDefaultManifestPath(rop), rop.path(), frames)
+	executor = ChunkedExecutor(execute or HeadlessRopExecutor(rop.path()), frames, chunkSize=chunkSize, workers=workers, retries=retries, manifest=manifest)
+
+	with hou.InterruptableOperation('Executing {} in chunks...'.format(rop.path()), open_interrupt_dialog=True) as operation:
+		executor.run(operation=operation)
+
+	return executor
@@ -9,43 +9,195 @@ __date__ = 11/27/17
 import sdm.houdini
 import hou
 
-import os, json, re, logging
+import os, json, re, copy, time, logging, threading
+
+from sdm.utils import writeFileAtomic, FileLock
 
 logger = logging.getLogger(__name__)
 
 class ValidationType():
 	EMAIL = 1
 
+SETTINGS_LAYER_VARIABLES = [
+	('studio', 'SDMTOOLS_STUDIO_SETTINGS'),
+	('show', 'SDMTOOLS_SHOW_SETTINGS'),
+	('user', 'SDMTOOLS_USER_SETTINGS')
+]
+
+def getSettingsLayers():
+	"""Gets the settings files SDMTools reads from, in order of priority: the settings.json
+	of the install, then the studio, show and user files given by the SDMTOOLS_*_SETTINGS
+	environment variables (a directory means its settings.json). Each layer overrides the
+	ones before it
+
+	Returns:
+		list: The (name, path) tuple of each layer, lowest priority first
+	"""
+	layers = [('install', os.path.join(sdm.houdini.folder, 'settings.json'))]
+
+	for name, variable in SETTINGS_LAYER_VARIABLES:
+		path = os.environ.get(variable)
+
+		if not path:
+			continue
+
+		if os.path.isdir(path):
+			path = os.path.join(path, 'settings.json')
+
+		layers.append((name, path))
+
+	return layers
+
 class SettingsFile():
-	_settings = dict({
+	"""A handle on the settings of SDMTools, merged from each of the settings layers (see
+	getSettingsLayers) on top of the defaults.
+
+	The layers are parsed and deep-merged once per process into a flat lookup table shared
+	by every handle, in which nested settings are also available by their dotted path (i.e.
+	'notification.smtp.port'), and which records the layer each setting comes from. Reads
+	check the layers' modification times at most every REVALIDATE_SECONDS, rebuilding the
+	table (and notifying subscribers) only when one has changed, so frequent reads are a
+	single dictionary lookup. Lists and dictionaries are returned as copies, so modifying
+	them doesn't change the table shared with other handles.
+
+	Changes made with set() are only seen by this handle until write() saves them to the
+	highest priority layer that is writable. Nested settings set by their dotted path are
+	saved nested, and read back the same way (including through their parents) before then.
+	Saving is guarded by a lock file and re-reads that layer first, so that concurrent
+	sessions saving different settings don't lose each other's changes, and replaces the
+	file atomically, so it is never seen half written.
+	"""
+	REVALIDATE_SECONDS = 2.0
+
+	_defaults = dict({
 			'version':'v1.0.0',
 			'disabledTools':['savePrefsToStuhome', 'calculateMocapLocomotion'],
-			'autoCheckUpdates':False
+			'autoCheckUpdates':False,
+			'backgroundSessions':2
 		})
 
-	def __init__(self):
-		logger.info('Loading settings file')
-		self._settingsJsonPath = os.path.join(sdm.houdini.folder, 'settings.json')
-		settingsFile = ''
+	_shared = {}
+	_subscribers = []
+	_lock = threading.Lock()
 
-		if not os.path.exists(self._settingsJsonPath):
-			logger.debug('settings.json doesn\'t exist, creating')
-			settingsFile = open(self._settingsJsonPath, 'w+')
-		else:
-			logger.debug('Found settings.json')
-			settingsFile = open(self._settingsJsonPath, 'r+')
+	def __init__(self, path=None):
+		"""
+		Args:
+			path (str, optional): A single settings file to use instead of the layers
+		"""
+		self._layers = tuple([('file', path)] if path else getSettingsLayers())
+		self._changes = {}
+		self._flatChanges = {}
+
+		with SettingsFile._lock:
+			if self._layers not in SettingsFile._shared:
+				logger.info('Loading settings from {} layer(s)'.format(len(self._layers)))
+				SettingsFile._shared[self._layers] = self._build()
+
+	@classmethod
+	def subscribe(cls, callback):
+		"""Registers a function to call when the settings change, either from being saved
+		by this session or from being reloaded after another session saved them
+
+		Args:
+			callback (callable): Called with the set of the names of the changed settings
+		"""
+		if callback not in cls._subscribers:
+			cls._subscribers.append(callback)
+
+	@classmethod
+	def unsubscribe(cls, callback):
+		if callback in cls._subscribers:
+			cls._subscribers.remove(callback)
+
+	def getLayers(self):
+		return list(self._layers)
+
+	def _getSignatures(self):
+		signatures = []
+
+		for name, path in self._layers:
+			try:
+				stat = os.stat(path)
+				signatures.append((stat.st_mtime, stat.st_size, stat.st_ino))
+			except OSError:
+				signatures.append(None)
+
+		return signatures
+
+	def _readLayer(self, path):
+		if not os.path.exists(path):
+			return {}
 
 		try:
-			logger.info('Loading JSON from file')
-			self._settings = json.loads(settingsFile.read())
-			logger.info('Loaded: {}'.format(self._settings))
-		except ValueError: # Empty, or bad JSON - use defaults
-			logger.warning('JSON was empty or malformed, defaulting to: {}'.format(self._settings))
-			pass
+			with open(path, 'r') as f:
+				settings = json.load(f)
+		except ValueError: # Empty, or bad JSON - ignore the layer
+			logger.warning('JSON was empty or malformed, ignoring: {}'.format(path))
+			return {}
+		except (IOError, OSError):
+			logger.warning('Could not read {}, ignoring'.format(path), exc_info=True)
+			return {}
+
+		return settings if isinstance(settings, dict) else {}
+
+	def _build(self):
+		"""Reads and merges the layers
+
+		Returns:
+			dict: The flat lookup 'table', the 'sources' layer of each setting in it, the
+				'signatures' of the layer files and when they were last 'checked'
+		"""
+		signatures = self._getSignatures()
+		layers = [('defaults', SettingsFile._defaults)] + [(name, self._readLayer(path)) for name, path in self._layers]
+		table = flattenDict(deepMergeDict(*[settings for name, settings in layers]))
+		sources = {}
+
+		for name, settings in layers:
+			for key in flattenDict(settings):
+				sources[key] = name
+
+		return {'table':table, 'sources':sources, 'signatures':signatures, 'checked':time.time()}
+
+	def _getShared(self):
+		"""Gets the shared lookup table, rebuilding it if a layer has changed since it was
+		built (checked at most every REVALIDATE_SECONDS)
+		"""
+		shared = SettingsFile._shared[self._layers]
+
+		if time.time() - shared['checked'] < SettingsFile.REVALIDATE_SECONDS:
+			return shared
+
+		with SettingsFile._lock:
+			shared['checked'] = time.time()
+
+			if self._getSignatures() == shared['signatures']:
+				return shared
+
+			logger.info('Settings changed, reloading')
+
+			updated = self._build()
+			SettingsFile._shared[self._layers] = updated
+
+		self._notify(shared['table'], updated['table'])
+
+		return updated
+
+	def _notify(self, old, new):
+		changed = set(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+		if not changed:
+			return
+
+		for callback in list(SettingsFile._subscribers):
+			try:
+				callback(changed)
+			except Exception:
+				logger.exception('Error in settings subscriber')
 
 	def set(self, setting, value, overwrite=True, validation=None):
 		"""Given a setting to change and the new value, updates
-		the settings dictionary
+		the settings dictionary. The change is saved by write()
 
 		Args:
 		    setting (str): The setting to change
@@ -57,10 +209,13 @@ class SettingsFile():
 		    validation (ValidationType, optional): The type of validation to
 		    	perform on the input. A ValueError is raised if value does not
 		    	pass this validation. By default, no validation occurs
+
+		Nested settings can be given by their dotted path (i.e. 'notification.smtp.port'),
+		and are saved nested. A dictionary value is merged into the existing setting
 		"""
 		# Setting exists, but we aren't overwriting
-		logger.info('Setting {} to: {} (overwrite={}, validation={})'.format(setting, value, overwrite, validation))
-		if self._settings.get(setting) and not overwrite:
+		logger.info('Setting {} (overwrite={}, validation={})'.format(setting, overwrite, validation))
+		if self.get(setting) and not overwrite:
 			logger.debug('Setting exists but overwrite is False - not updating')
 			return
 
@@ -71,14 +226,25 @@ class SettingsFile():
 				raise ValueError('Invalid email, could not update settings')
 				return
 
-		self._settings[setting] = value
+		changes = self._changes
+		keys = setting.split('.')
+
+		for key in keys[:-1]:
+			if not isinstance(changes.get(key), dict):
+				changes[key] = {}
+
+			changes = changes[key]
+
+		changes[keys[-1]] = copy.deepcopy(value)
+		self._flatChanges = flattenDict(self._changes)
 		logger.info('Value set')
 
 	def get(self, setting, default=None):
 		"""Given a setting, retrieves its value
 
 		Args:
-			setting (str): The setting to get the value of
+			setting (str): The setting to get the value of, nested settings
+				can be given by their dotted path
 			default (any, optional): In the case that the given
 				setting does not exist, this will be returned
 				instead. By default, None will be returned in
@@ -88,21 +254,88 @@ class SettingsFile():
 			any: The value of the setting, or the value of 'default'
 				if the setting does not exist
 		"""
-		val = self._settings.get(setting, default)
+		table = self._getShared()['table']
+
+		if self._flatChanges:
+			parts = setting.split('.')
+
+			for i in range(1, len(parts)):
+				parent = '.'.join(parts[:i])
+
+				# A parent changed to something other than a dictionary no longer has this setting
+				if parent in self._flatChanges and not isinstance(self._flatChanges[parent], dict):
+					return default
+
+			if setting in self._flatChanges:
+				value = self._flatChanges[setting]
+
+				if isinstance(value, dict) and isinstance(table.get(setting), dict):
+					return deepMergeDict(copy.deepcopy(table[setting]), copy.deepcopy(value))
 
-		logger.debug('Got: {} for setting: {} (default={})'.format(val, setting, default))
+				return copy.deepcopy(value)
 
-		return val
+		value = table.get(setting, default)
+
+		return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+	def getSource(self, setting):
+		"""Gets the layer the given setting's value comes from
+
+		Args:
+			setting (str): The setting, or dotted path of a nested setting
+
+		Returns:
+			str: The name of the layer, 'defaults' for built in values, or None if
+				the setting does not exist
+		"""
+		return self._getShared()['sources'].get(setting)
+
+	def getWritableLayer(self):
+		"""Gets the highest priority layer that can be written to
+
+		Returns:
+			tuple: The (name, path) of the layer, or None if none are writable
+		"""
+		for name, path in reversed(self._layers):
+			if os.path.exists(path):
+				writable = os.access(path, os.W_OK)
+			else:
+				writable = os.access(os.path.dirname(os.path.abspath(path)), os.W_OK)
+
+			if writable:
+				return (name, path)
+
+		return None
 
 	def write(self):
-		"""Writes the settings file out to the proper path of settings.json
+		"""Saves the settings changed with set() to the highest priority writable layer, on
+		top of its current content
+
+		Raises:
+			IOError: If no layer is writable
 		"""
-		logger.info('Writing to {}'.format(self._settingsJsonPath))
-		settingsFile = open(self._settingsJsonPath, 'r+')
+		layer = self.getWritableLayer()
+
+		if layer is None:
+			raise IOError('No writable settings file in: {}'.format(', '.join(path for name, path in self._layers)))
+
+		name, path = layer
+
+		logger.info('Writing to {} ({} layer)'.format(path, name))
+
+		with FileLock(path + '.lock'):
+			settings = deepMergeDict(self._readLayer(path), self._changes)
 
-		settingsFile.seek(0)
-		json.dump(self._settings, settingsFile, sort_keys=True, indent=4, separators=(',', ': '))
-		settingsFile.truncate()
+			writeFileAtomic(path, json.dumps(settings, sort_keys=True, indent=4, separators=(',', ': ')))
+
+			with SettingsFile._lock:
+				old = SettingsFile._shared[self._layers]['table']
+				updated = self._build()
+				SettingsFile._shared[self._layers] = updated
+
+		self._changes = {}
+		self._flatChanges = {}
+		self._notify(old, updated['table'])
 
 def getLargerVersions(compareTo, otherVersions):
 	"""For all the given versions, returns a list of all those that are larger
@@ -221,6 +454,52 @@ def mergeDict(source, target):
 
 	return merged
 
+def deepMergeDict(*sources):
+	"""Merges any number of dictionaries into a new one, recursively merging
+	the dictionaries they hold under the same key. For any other value, the
+	one from the later dictionary is kept (lists are replaced, not appended)
+
+	Args:
+		*sources (dict): The dictionaries to merge, in increasing priority
+
+	Returns:
+		dict: The merged dictionary
+	"""
+	merged = {}
+
+	for source in sources:
+		for key, val in source.items():
+			if isinstance(val, dict) and isinstance(merged.get(key), dict):
+				merged[key] = deepMergeDict(merged[key], val)
+			else:
+				merged[key] = val
+
+	return merged
+
+def flattenDict(source, prefix=''):
+	"""Flattens nested dictionaries into a single one, where nested values are
+	also available by the dotted path of their keys
+
+	{'a':{'b':1}} --> {'a':{'b':1}, 'a.b':1}
+
+	Args:
+		source (dict): The dictionary to flatten
+		prefix (str, optional): The path to prefix the keys with
+
+	Returns:
+		dict: The flattened dictionary
+	"""
+	flat = {}
+
+	for key, val in source.items():
+		path = prefix + key
+		flat[path] = val
+
+		if isinstance(val, dict):
+			flat.update(flattenDict(val, prefix=path + '.'))
+
+	return flat
+
 def isDescendant(file, root=None):
 	"""Determines if the given file is a hierarchical descendant
 	of the given root directory
@@ -261,16 +540,13 @@ def getAllFileReferences():
 	references. As a result, this function compiles the full list of all referencing
 	parameters, as opposed to hou.fileReferences() which only returns 1 of potentially
 	many parameters that references a file.
-	"""
-	refs = []
 
-	for node in hou.node('/').allSubChildren():
-		for parm in node.globParms('*'):
-			template = parm.parmTemplate()
-			if isinstance(template, hou.StringParmTemplate) and template.stringType() == hou.stringParmType.FileReference:
-				val = parm.evalAsString()
+	The scene is traversed on every call. See sdm.houdini.references.getLiveReferenceIndex
+	for an index that is kept up to date instead, with the references grouped by file.
 
-				if val and os.path.isfile(val) and isDescendant(val):
-					refs.append((parm, val))
+	Returns:
+		list: A (hou.Parm, str) tuple for each parameter referencing an existing file under $HIP
+	"""
+	from sdm.houdini.references import FileReferenceIndex
 
-	return refs
+	return list(FileReferenceIndex().build().iterReferences())
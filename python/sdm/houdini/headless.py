@@ -0,0 +1,333 @@
+"""Running of Houdini work in background (headless) hython sessions, so that long operations
+such as flipbooks and caches don't lock up the artist's session.
+
+This module is also the script those sessions run: it is launched as
+`hython headless.py <command> <hip file> <options>`, loads the hip file and runs the command.
+As such, it has to be runnable on its own, without the rest of the package being initialized.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, sys, json, time, tempfile, threading, subprocess, traceback, logging
+
+import hou
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKGROUND_SESSIONS = 2
+
+class UnsavedHipFileError(Exception):
+	"""Raised when background sessions are started from a scene that is not saved to disk
+	"""
+	pass
+
+def getHythonPath():
+	return os.path.join(hou.getenv('HFS'), 'bin', 'hython')
+
+def getScriptPath():
+	return os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+def getBackgroundSessionCount():
+	"""Gets the number of background sessions to run at once by default. Each session loads
+	the whole scene, so this is kept small: the backgroundSessions setting, or 2
+
+	Returns:
+		int: The number of sessions, at least 1
+	"""
+	from sdm.houdini.fileutils import SettingsFile # Not needed by the sessions themselves
+
+	try:
+		return max(1, int(SettingsFile().get('backgroundSessions', DEFAULT_BACKGROUND_SESSIONS)))
+	except (TypeError, ValueError):
+		logger.warning('Invalid backgroundSessions setting, using {}'.format(DEFAULT_BACKGROUND_SESSIONS))
+		return DEFAULT_BACKGROUND_SESSIONS
+
+def getSavedHipFile(prompt=True):
+	"""Gets the path of the current hip file, which is what headless sessions load. Those
+	sessions don't see unsaved changes, so if there are any the user is asked to save the
+	scene first
+
+	Args:
+		prompt (bool, optional): Whether to ask the user to save unsaved changes. When False,
+			or when there is no UI to ask with, unsaved changes are refused instead
+
+	Returns:
+		str: The path of the current hip file
+
+	Raises:
+		UnsavedHipFileError: If the scene has never been saved, or has unsaved changes that
+			the user chose not to save
+	"""
+	path = hou.hipFile.path()
+
+	if hou.hipFile.isNewFile() or not os.path.isfile(path):
+		raise UnsavedHipFileError('Background sessions load the hip file from disk, save the scene first')
+
+	if hou.hipFile.hasUnsavedChanges():
+		if not prompt or not hou.isUIAvailable():
+			raise UnsavedHipFileError('Hip file has unsaved changes, background sessions would not see them: {}'.format(path))
+
+		if hou.ui.displayMessage('Background sessions use the saved hip file, save the scene first?', buttons=('Save', 'Cancel'), close_choice=1, title='Unsaved Changes') == 1:
+			raise UnsavedHipFileError('Hip file has unsaved changes, background sessions would not see them: {}'.format(path))
+
+		hou.hipFile.save()
+
+	return path
+
+class HeadlessJob():
+	"""A command run in its own background hython session, and its result once finished.
+	A job can be cancelled from another thread than the one polling it
+	"""
+	PENDING = 'pending'
+	RUNNING = 'running'
+	SUCCEEDED = 'succeeded'
+	FAILED = 'failed'
+	CANCELLED = 'cancelled'
+
+	def __init__(self, command, hip, options, hython=None):
+		"""
+		Args:
+			command (str): The command to run, one of the COMMANDS of this module
+			hip (str): The hip file to load before running the command
+			options (dict): The JSON-serializable options of the command
+			hython (str, optional): The executable to run the command with. By default,
+				hython from $HFS/bin
+		"""
+		self._command = command
+		self._hip = hip
+		self._options = options
+		self._args = [hython or getHythonPath(), getScriptPath(), command, hip, json.dumps(options)]
+		self._status = HeadlessJob.PENDING
+		self._returnCode = None
+		self._error = ''
+		self._process = None
+		self._stderr = None
+		self._lock = threading.Lock()
+
+	@classmethod
+	def flipbook(cls, hip, camera, output, frameRange, **kwargs):
+		"""Builds a job flipbooking the given camera through an OpenGL ROP. Note that the
+		OpenGL ROP needs access to a graphics context, even when run from hython
+
+		Args:
+			hip (str): The hip file to load
+			camera (str): The path of the camera node to flipbook from
+			output (str): The file path to output the flipbook sequence to, i.e. using $F
+			frameRange (tuple): The start frame, end frame and frame increment
+			**kwargs: Passed on to the HeadlessJob constructor
+
+		Returns:
+			HeadlessJob: The flipbook job
+		"""
+		return cls('flipbook', hip, {'camera':camera, 'output':output, 'frameRange':list(frameRange)}, **kwargs)
+
+	@classmethod
+	def render(cls, hip, rop, ranges, **kwargs):
+		"""Builds a job rendering (or caching) the given ROP
+
+		Args:
+			hip (str): The hip file to load
+			rop (str): The path of the ROP node to render
+			ranges (list): The (start, end, increment) tuples of the frames to render, i.e.
+				from sdm.files.fileclassification.FrameSet.getRanges
+			**kwargs: Passed on to the HeadlessJob constructor
+
+		Returns:
+			HeadlessJob: The render job
+		"""
+		return cls('render', hip, {'rop':rop, 'ranges':[list(r) for r in ranges]}, **kwargs)
+
+	def getCommand(self):
+		return self._command
+
+	def getOptions(self):
+		return self._options
+
+	def getArgs(self):
+		return self._args
+
+	def getStatus(self):
+		return self._status
+
+	def getReturnCode(self):
+		return self._returnCode
+
+	def getError(self):
+		return self._error
+
+	def succeeded(self):
+		return self._status == HeadlessJob.SUCCEEDED
+
+	def start(self):
+		"""Launches the background session, without waiting for it
+		"""
+		env = dict(os.environ)
+		packageRoot = os.path.dirname(os.path.dirname(os.path.dirname(getScriptPath())))
+		env['PYTHONPATH'] = os.pathsep.join(p for p in (packageRoot, env.get('PYTHONPATH')) if p)
+		self._stderr = tempfile.TemporaryFile()
+
+		try:
+			with open(os.devnull, 'wb') as devnull:
+				self._process = subprocess.Popen(self._args, stdout=devnull, stderr=self._stderr, env=env)
+		except (IOError, OSError) as e:
+			self._finish(None, 'Could not run {}: {}'.format(self._args[0], e))
+			return
+
+		self._status = HeadlessJob.RUNNING
+
+	def poll(self):
+		"""Checks if the background session has exited, collecting its result if it has
+
+		Returns:
+			bool: True if the job is no longer running
+		"""
+		with self._lock:
+			if self._status != HeadlessJob.RUNNING:
+				return True
+
+			returnCode = self._process.poll()
+
+			if returnCode is None:
+				return False
+
+			self._stderr.seek(0)
+			self._finish(returnCode, self._stderr.read().decode('utf-8', 'replace').strip())
+
+		return True
+
+	def wait(self, pollInterval=0.1):
+		while not self.poll():
+			time.sleep(pollInterval)
+
+		return self.succeeded()
+
+	def cancel(self):
+		with self._lock:
+			if self._status == HeadlessJob.RUNNING:
+				try:
+					self._process.kill()
+					self._process.wait()
+				except OSError:
+					pass
+
+			if self._status in (HeadlessJob.PENDING, HeadlessJob.RUNNING):
+				self._status = HeadlessJob.CANCELLED
+				self._closeStderr()
+
+	def _finish(self, returnCode, error):
+		self._returnCode = returnCode
+		self._process = None
+		self._closeStderr()
+
+		if returnCode == 0:
+			self._status = HeadlessJob.SUCCEEDED
+		else:
+			self._status = HeadlessJob.FAILED
+			self._error = error or 'Exited with code {}'.format(returnCode)
+
+	def _closeStderr(self):
+		if self._stderr is not None:
+			self._stderr.close()
+			self._stderr = None
+
+def runHeadlessJobs(jobs, workers=None, operation=None, pollInterval=0.1):
+	"""Runs the given jobs, up to the given number of background sessions at once
+
+	Args:
+		jobs (list): The HeadlessJob to run
+		workers (int, optional): The maximum number of sessions to run at once. By default,
+			see getBackgroundSessionCount
+		operation (hou.InterruptableOperation, optional): The operation to report progress to,
+			on every poll. If the user interrupts it, running sessions are killed and the
+			remaining ones are cancelled before hou.OperationInterrupted is raised
+		pollInterval (float, optional): The number of seconds between checks of the running
+			sessions
+
+	Returns:
+		list: The given jobs, holding their results
+	"""
+	workers = max(1, workers or getBackgroundSessionCount())
+	pending = list(reversed(jobs))
+	running = []
+	done = 0
+
+	try:
+		while pending or running:
+			while pending and len(running) < workers:
+				job = pending.pop()
+				job.start()
+				running.append(job)
+
+			stillRunning = [job for job in running if not job.poll()]
+			finished = len(running) - len(stillRunning)
+			running = stillRunning
+			done += finished
+
+			if operation is not None: # Also where interrupts are raised, so must be called while waiting too
+				operation.updateProgress(done / float(len(jobs)))
+
+			if running and not finished: # Nothing finished, so no slot to fill yet
+				time.sleep(pollInterval)
+	except BaseException:
+		for job in jobs:
+			job.cancel()
+
+		raise
+
+	for job in jobs:
+		if not job.succeeded():
+			logger.warning('Background {} failed: {}'.format(job.getCommand(), job.getError()))
+
+	return jobs
+
+def _flipbook(options):
+	start, end, inc = options['frameRange']
+	output = options['output']
+	outputDir = os.path.dirname(hou.expandString(output))
+
+	if outputDir and not os.path.exists(outputDir):
+		os.makedirs(outputDir)
+
+	rop = hou.node('/out').createNode('opengl', 'sdm_headless_flipbook')
+	rop.parm('camera').set(options['camera'])
+	rop.parm('picture').set(output)
+	rop.render(frame_range=(start, end, inc))
+
+def _render(options):
+	rop = hou.node(options['rop'])
+
+	if rop is None:
+		raise ValueError('ROP not found: {}'.format(options['rop']))
+
+	for start, end, inc in options['ranges']:
+		rop.render(frame_range=(start, end, inc))
+
+COMMANDS = {
+	'flipbook': _flipbook,
+	'render': _render
+}
+
+def main(argv):
+	"""Entry point of the background sessions
+
+	Args:
+		argv (list): The command, hip file and JSON options to run with
+
+	Returns:
+		int: The exit code of the session
+	"""
+	command, hip, options = argv[0], argv[1], json.loads(argv[2])
+
+	try:
+		hou.hipFile.load(hip, suppress_save_prompt=True, ignore_load_warnings=True)
+		COMMANDS[command](options)
+	except Exception:
+		sys.stderr.write(traceback.format_exc())
+		return 1
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
@@ -8,8 +8,15 @@ __date__ = 11/27/17
 import hou
 
 import os
+import time
+import struct
 import imghdr
+import logging
+import tempfile
 import subprocess
+from multiprocessing import cpu_count
+
+logger = logging.getLogger(__name__)
 
 class ImageType():
 	EXR = '.exr'
@@ -21,25 +28,242 @@ class ImageType():
 
 ALTERNATE_IMAGE_EXTS = [ImageType.RAT, ImageType.HDR]
 
-def convertImage(file, maxDim, scale, ext):
-	"""Converts the given absolute file path to the given extension, using the icp command from $HFS/bin
+class ImageInfo():
+	"""The properties of an image read from its header. Channels and bit depth
+	are None when the format does not expose them without loading the image
+	"""
+
+	def __init__(self, format, width, height, channels=None, bitDepth=None):
+		self._format = format
+		self._width = width
+		self._height = height
+		self._channels = channels
+		self._bitDepth = bitDepth
+
+	def getFormat(self):
+		return self._format
+
+	def getWidth(self):
+		return self._width
+
+	def getHeight(self):
+		return self._height
+
+	def getResolution(self):
+		return (self._width, self._height)
+
+	def getChannels(self):
+		return self._channels
+
+	def getBitDepth(self):
+		return self._bitDepth
+
+	def __repr__(self):
+		return 'ImageInfo({}, {}x{}, channels={}, bitDepth={})'.format(self._format, self._width, self._height, self._channels, self._bitDepth)
+
+PNG_CHANNELS = {0:1, 2:3, 3:3, 4:2, 6:4}
+EXR_PIXEL_BITS = {0:32, 1:16, 2:32}
+TIFF_TYPES = {3:'H', 4:'I'}
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - set([0xC4, 0xC8, 0xCC])
+
+def _probePNG(f, header):
+	if header[12:16] != b'IHDR':
+		return None
+
+	width, height, bitDepth, colorType = struct.unpack('>IIBB', header[16:26])
+
+	return ImageInfo(ImageType.PNG, width, height, PNG_CHANNELS.get(colorType), bitDepth)
+
+def _probeJPEG(f, header):
+	offset = 2
+
+	while True:
+		f.seek(offset)
+		marker = f.read(4)
+
+		if len(marker) < 4 or bytearray(marker)[0] != 0xFF:
+			return None
+
+		code = bytearray(marker)[1]
+		length = struct.unpack('>H', marker[2:4])[0]
+
+		if code in JPEG_SOF_MARKERS:
+			bitDepth, height, width, channels = struct.unpack('>BHHB', f.read(6))
+
+			return ImageInfo(ImageType.JPG, width, height, channels, bitDepth)
+
+		offset += 2 + length # Skip over the segment, i.e. EXIF data
+
+def _probeTIFF(f, header):
+	order = '<' if header[:2] == b'II' else '>'
+	offset = struct.unpack(order + 'I', header[4:8])[0]
+	f.seek(offset)
+	count = struct.unpack(order + 'H', f.read(2))[0]
+	entries = f.read(count * 12)
+	tags = {}
+
+	for i in range(count):
+		tag, type, valueCount = struct.unpack(order + 'HHI', entries[i * 12:i * 12 + 8])
+
+		if type in TIFF_TYPES and tag in (256, 257, 258, 277):
+			value = entries[i * 12 + 8:i * 12 + 12]
+
+			if type == 3 and valueCount > 2: # Values don't fit in the entry, use the first at the given offset
+				f.seek(struct.unpack(order + 'I', value)[0])
+				value = f.read(2)
+
+			tags[tag] = struct.unpack(order + TIFF_TYPES[type], value[:struct.calcsize(TIFF_TYPES[type])])[0]
+
+	if 256 not in tags or 257 not in tags:
+		return None
+
+	return ImageInfo(ImageType.TIFF, tags[256], tags[257], tags.get(277, 1), tags.get(258, 1))
+
+def _probeEXR(f, header):
+	f.seek(8)
+	data = f.read(64 * 1024)
+	offset = 0
+	width = height = channels = bitDepth = None
+
+	while offset < len(data) and data[offset:offset + 1] != b'\0':
+		nameEnd = data.index(b'\0', offset)
+		typeEnd = data.index(b'\0', nameEnd + 1)
+		name = data[offset:nameEnd]
+		size = struct.unpack('<i', data[typeEnd + 1:typeEnd + 5])[0]
+		value = data[typeEnd + 5:typeEnd + 5 + size]
+		offset = typeEnd + 5 + size
+
+		if name == b'dataWindow':
+			xMin, yMin, xMax, yMax = struct.unpack('<iiii', value)
+			width, height = xMax - xMin + 1, yMax - yMin + 1
+		elif name == b'channels':
+			channels = 0
+			bitDepth = 0
+			pos = 0
+
+			while value[pos:pos + 1] not in (b'\0', b''):
+				pos = value.index(b'\0', pos) + 1
+				pixelType = struct.unpack('<i', value[pos:pos + 4])[0]
+				pos += 16 # pixel type, pLinear, reserved, x and y sampling
+				channels += 1
+				bitDepth = max(bitDepth, EXR_PIXEL_BITS.get(pixelType, 0))
+
+		if width is not None and channels is not None:
+			break
+
+	if width is None:
+		return None
+
+	return ImageInfo(ImageType.EXR, width, height, channels, bitDepth)
+
+def _probeHDR(f, header):
+	f.seek(0)
+
+	for i in range(128):
+		line = f.readline(1024).strip()
+
+		if line[:2] in (b'-Y', b'+Y'):
+			parts = line.split()
+
+			return ImageInfo(ImageType.HDR, int(parts[3]), int(parts[1]), 3, 32)
+
+	return None
+
+def _probeRAT(f, header):
+	# RAT is a proprietary format, so Houdini has to read its header for us
+	width, height = hou.imageResolution(f.name)
+
+	return ImageInfo(ImageType.RAT, width, height)
+
+IMAGE_SIGNATURES = [
+	(b'\x89PNG\r\n\x1a\n', _probePNG),
+	(b'\xff\xd8', _probeJPEG),
+	(b'II*\0', _probeTIFF),
+	(b'MM\0*', _probeTIFF),
+	(b'\x76\x2f\x31\x01', _probeEXR),
+	(b'#?RADIANCE', _probeHDR),
+	(b'#?RGBE', _probeHDR)
+]
+
+_probeCache = {}
+
+def probeImage(file):
+	"""Reads the format, resolution, channel count and bit depth of the given image from its
+	header alone, without loading any pixels. PNG, JPEG, TIFF, EXR and HDR headers are parsed
+	directly; RAT resolution is queried from Houdini. Results are cached by path and
+	modification time, so probing an unchanged file again costs a single stat
 
 	Args:
-	    file (str): The absolute file path of the image to convert. The converted image will
-	    	have the same path/filename, but with the given extension instead
-	    maxDim (float): The maximimum dimension of either side of the outputted image. If the
-	    	image (after scaling) still does not meet this dimension, it will be further scaled
-	    	down
-	    scale (float): The initial scale factor to apply to the outputted image. The final calculated
-	    	scale gets passed to icp with the -s flag
-	    ext (sdm.houdini.image.ImageType): The image type to convert to
+		file (str): The absolute path of the image to probe
 
 	Returns:
-        str: The path to the outputted file
+		ImageInfo: The properties of the image, or None if it is not a recognized
+			image (or could not be read)
+	"""
+	try:
+		mtime = os.path.getmtime(file)
+	except OSError:
+		return None
+
+	cached = _probeCache.get(file)
+
+	if cached is not None and cached[0] == mtime:
+		return cached[1]
+
+	info = None
+
+	try:
+		with open(file, 'rb') as f:
+			header = f.read(32)
+
+			for signature, probe in IMAGE_SIGNATURES:
+				if header.startswith(signature):
+					info = probe(f, header)
+					break
+			else:
+				if os.path.splitext(file)[1].lower() == ImageType.RAT:
+					info = _probeRAT(f, header)
+	except (IOError, OSError, ValueError, IndexError, struct.error, hou.OperationFailed):
+		logger.debug('Could not probe image: {}'.format(file), exc_info=True)
+		info = None
+
+	_probeCache[file] = (mtime, info)
+
+	return info
+
+def getImageResolution(file):
+	"""Gets the resolution of the given image, from its header if possible
+
+	Args:
+		file (str): The absolute path of the image
+
+	Returns:
+		tuple: The width and height of the image
+	"""
+	info = probeImage(file)
+
+	if info is not None:
+		return info.getResolution()
+
+	return hou.imageResolution(file)
+
+def getDefaultConverter():
+	return os.path.join(hou.getenv('HFS'), 'bin', 'icp')
+
+def getOutputScale(resolution, maxDim, scale):
+	"""Calculates the scale factor to convert an image of the given resolution by, so
+	that once the initial scale is applied, neither side is larger than maxDim
+
+	Args:
+		resolution (tuple): The width and height of the image
+		maxDim (float): The maximimum dimension of either side of the outputted image, or -1
+			for no maximum
+		scale (float): The initial scale factor (in percent) to apply to the image
+
+	Returns:
+		float: The final scale factor, as a fraction
 	"""
-	args = [os.path.join(hou.getenv('HFS'), 'bin', 'icp')]
 	scale /= 100.0
-	resolution = hou.imageResolution(file)
 	width = float(resolution[0]) * scale
 	height = float(resolution[1]) * scale
 
@@ -52,20 +276,452 @@ def convertImage(file, maxDim, scale, ext):
 	if resizeFactor < 1.0: # only want to scale down
 		scale *= resizeFactor
 
+	return scale
+
+def _buildConversionArgs(converter, scale, file, newPath):
+	args = [converter or getDefaultConverter()]
+
 	args.append('-u') # uncompressed, if supported
 
 	args.append('-s')
 	args.append(str(float(scale * 100)))
 
-	newPath = os.path.splitext(file)[0] + ext
-
 	args.append(file)
 	args.append(newPath)
 
+	return args
+
+def getConversionArgs(file, maxDim, scale, ext, converter=None):
+	"""Builds the icp command that converts the given absolute file path to the given extension
+
+	Args:
+	    file (str): The absolute file path of the image to convert. The converted image will
+	    	have the same path/filename, but with the given extension instead
+	    maxDim (float): The maximimum dimension of either side of the outputted image. If the
+	    	image (after scaling) still does not meet this dimension, it will be further scaled
+	    	down
+	    scale (float): The initial scale factor to apply to the outputted image. The final calculated
+	    	scale gets passed to icp with the -s flag
+	    ext (sdm.houdini.image.ImageType): The image type to convert to
+	    converter (str, optional): The converter executable to use instead of icp from $HFS/bin.
+	    	It must accept the same arguments as icp
+
+	Returns:
+		tuple: The command arguments, and the path to the file it outputs
+	"""
+	newPath = os.path.splitext(file)[0] + ext
+	scale = getOutputScale(getImageResolution(file), maxDim, scale)
+
+	return _buildConversionArgs(converter, scale, file, newPath), newPath
+
+DEFAULT_TIERS = [('', -1), ('2k', 2048), ('1k', 1024), ('256', 256)]
+
+def getTierPath(file, tier, ext):
+	"""Gets the path of the given resolution tier of the given image, i.e. /tex/wood_2k.rat
+	for the '2k' tier of /tex/wood.png. The unnamed tier is the regular converted path
+
+	Args:
+		file (str): The absolute file path of the source image
+		tier (str): The name of the tier
+		ext (sdm.houdini.image.ImageType): The image type of the tier
+
+	Returns:
+		str: The path of the tier
+	"""
+	base = os.path.splitext(file)[0]
+
+	if not tier:
+		return base + ext
+
+	return '{}_{}{}'.format(base, tier, ext)
+
+def getTierJobs(file, maxDim, scale, ext, tiers=DEFAULT_TIERS, converter=None):
+	"""Plans the conversion of the given image into several resolution tiers. The first tier
+	is converted from the source with the given settings, and each following tier is then
+	downscaled from the tier before it, so the full resolution source is only read once
+
+	Args:
+		file (str): The absolute file path of the image to convert
+		maxDim (float): The maximimum dimension of the first tier, see convertImage
+		scale (float): The initial scale factor to apply to the first tier, see convertImage
+		ext (sdm.houdini.image.ImageType): The image type to convert to
+		tiers (list, optional): A (name, maxDim) tuple for each tier, from largest to smallest.
+			The maximum dimension of the first tier is ignored in favor of the given maxDim.
+			Tiers that are already under their maximum are written at the same resolution,
+			so every tier always exists. By default, the full, 2k, 1k and 256 tiers
+		converter (str, optional): The converter executable to use instead of icp
+
+	Returns:
+		list: The ConversionJob of each tier, in order. Each job depends on the one before it
+	"""
+	resolution = getImageResolution(file)
+	tierScale = getOutputScale(resolution, maxDim, scale)
+	output = getTierPath(file, tiers[0][0], ext)
+	jobs = [ConversionJob(file, output, _buildConversionArgs(converter, tierScale, file, output), tier=tiers[0][0])]
+	width = resolution[0] * tierScale
+	height = resolution[1] * tierScale
+
+	for tier, tierMaxDim in tiers[1:]:
+		parent = jobs[-1]
+		tierScale = min(1.0, float(tierMaxDim) / max(width, height))
+		output = getTierPath(file, tier, ext)
+		width *= tierScale
+		height *= tierScale
+
+		jobs.append(ConversionJob(parent.getOutput(), output, _buildConversionArgs(converter, tierScale, parent.getOutput(), output), parent=parent, tier=tier))
+
+	return jobs
+
+def convertImage(file, maxDim, scale, ext, converter=None):
+	"""Converts the given absolute file path to the given extension, using the icp command from $HFS/bin
+
+	Args:
+	    file (str): The absolute file path of the image to convert. The converted image will
+	    	have the same path/filename, but with the given extension instead
+	    maxDim (float): The maximimum dimension of either side of the outputted image. If the
+	    	image (after scaling) still does not meet this dimension, it will be further scaled
+	    	down
+	    scale (float): The initial scale factor to apply to the outputted image. The final calculated
+	    	scale gets passed to icp with the -s flag
+	    ext (sdm.houdini.image.ImageType): The image type to convert to
+	    converter (str, optional): The converter executable to use instead of icp
+
+	Returns:
+        str: The path to the outputted file
+	"""
+	args, newPath = getConversionArgs(file, maxDim, scale, ext, converter=converter)
+
 	subprocess.call(args)
 
 	return newPath
 
+class ConversionJob():
+	"""A single image conversion run by convertImages, and its result once finished
+	"""
+	PENDING = 'pending'
+	RUNNING = 'running'
+	SUCCEEDED = 'succeeded'
+	FAILED = 'failed'
+	CANCELLED = 'cancelled'
+
+	def __init__(self, source, output, args, parent=None, tier=None):
+		"""
+		Args:
+			source (str): The path of the image to convert
+			output (str): The path the converter writes to
+			args (list): The converter command
+			parent (ConversionJob, optional): The job that outputs the source of this one. This
+				job only runs once the parent succeeded
+			tier (str, optional): The name of the resolution tier this job outputs, if any
+		"""
+		self._source = source
+		self._output = output
+		self._args = args
+		self._parent = parent
+		self._tier = tier
+		self._dependents = []
+		self._status = ConversionJob.PENDING
+		self._returnCode = None
+		self._error = ''
+		self._process = None
+		self._stderr = None
+		self._cacheKey = None
+		self._cached = False
+
+		if parent is not None:
+			parent._dependents.append(self)
+
+	def getSource(self):
+		return self._source
+
+	def getOrigin(self):
+		"""Gets the original source image of this job's chain of tiers
+
+		Returns:
+			str: The source of the first job in the chain
+		"""
+		job = self
+
+		while job._parent is not None:
+			job = job._parent
+
+		return job._source
+
+	def getParent(self):
+		return self._parent
+
+	def getDependents(self):
+		return self._dependents
+
+	def getTier(self):
+		return self._tier
+
+	def getOutput(self):
+		return self._output
+
+	def getArgs(self):
+		return self._args
+
+	def getStatus(self):
+		return self._status
+
+	def getReturnCode(self):
+		return self._returnCode
+
+	def getError(self):
+		"""Gets why the conversion failed
+
+		Returns:
+			str: The error output of the converter, or the reason it could not be run
+		"""
+		return self._error
+
+	def succeeded(self):
+		return self._status == ConversionJob.SUCCEEDED
+
+	def wasCached(self):
+		"""Determines if the output was taken from a ConversionCache rather than converted
+		"""
+		return self._cached
+
+	def getCacheKey(self):
+		return self._cacheKey
+
+	def setCacheKey(self, key):
+		self._cacheKey = key
+
+	def setCached(self):
+		self._status = ConversionJob.SUCCEEDED
+		self._cached = True
+
+	def start(self):
+		"""Launches the converter process, without waiting for it. Its error output is
+		captured to a temporary file, so a chatty converter can never block on a full pipe
+		"""
+		self._stderr = tempfile.TemporaryFile()
+
+		try:
+			with open(os.devnull, 'wb') as devnull:
+				self._process = subprocess.Popen(self._args, stdout=devnull, stderr=self._stderr)
+		except (IOError, OSError) as e:
+			self._finish(None, 'Could not run {}: {}'.format(self._args[0], e))
+			return
+
+		self._status = ConversionJob.RUNNING
+
+	def poll(self):
+		"""Checks if the converter process has exited, collecting its result if it has
+
+		Returns:
+			bool: True if the job is no longer running
+		"""
+		if self._status != ConversionJob.RUNNING:
+			return True
+
+		returnCode = self._process.poll()
+
+		if returnCode is None:
+			return False
+
+		self._stderr.seek(0)
+		self._finish(returnCode, self._stderr.read().decode('utf-8', 'replace').strip())
+
+		return True
+
+	def fail(self, error):
+		self._status = ConversionJob.FAILED
+		self._error = error
+
+	def cancel(self):
+		if self._status == ConversionJob.RUNNING:
+			try:
+				self._process.kill()
+				self._process.wait()
+			except OSError:
+				pass
+
+		if self._status in (ConversionJob.PENDING, ConversionJob.RUNNING):
+			self._status = ConversionJob.CANCELLED
+			self._closeStderr()
+
+	def _finish(self, returnCode, error):
+		self._returnCode = returnCode
+		self._process = None
+		self._closeStderr()
+
+		if returnCode == 0 and os.path.exists(self._output):
+			self._status = ConversionJob.SUCCEEDED
+		else:
+			self._status = ConversionJob.FAILED
+			self._error = error or 'Converter exited with code {} without writing: {}'.format(returnCode, self._output)
+
+	def _closeStderr(self):
+		if self._stderr is not None:
+			self._stderr.close()
+			self._stderr = None
+
+def getConversionSettings(job):
+	"""Gets everything about the given job that affects its output, other than the source
+	contents: the converter arguments (without the executable and paths) and the output type
+	"""
+	return job.getArgs()[1:-2] + [os.path.splitext(job.getOutput())[1]]
+
+def _restoreFromCache(job, cache):
+	"""Looks the given job up in the cache, restoring its output if it was converted before.
+	Jobs downscaling another job's output are keyed off of that job's key, as their source
+	doesn't exist yet when the conversions are planned
+
+	Returns:
+		bool: True if the output was restored
+	"""
+	settings = getConversionSettings(job)
+
+	if job.getParent() is None:
+		try:
+			job.setCacheKey(cache.getKey(job.getSource(), settings))
+		except (IOError, OSError):
+			return False # Left for the converter to report
+	elif job.getParent().getCacheKey():
+		job.setCacheKey(cache.getDerivedKey(job.getParent().getCacheKey(), settings))
+
+	if job.getCacheKey() and cache.restore(job.getCacheKey(), job.getOutput()):
+		job.setCached()
+		return True
+
+	return False
+
+def runConversionJobs(jobs, workers=None, operation=None, cache=None, pollInterval=0.05):
+	"""Runs the given conversions, up to the given number of converter processes at once.
+	A job depending on another (i.e. a resolution tier downscaled from the tier before it)
+	starts once that job succeeded, and fails without running if it didn't
+
+	Args:
+		jobs (list): Every ConversionJob to run, including dependent ones
+		workers (int, optional): The maximum number of conversions to run at once. By default,
+			the number of CPUs
+		operation (hou.InterruptableOperation, optional): The operation to report progress to,
+			on every poll. If the user interrupts it, running conversions are killed and the
+			remaining ones are cancelled before hou.OperationInterrupted is raised
+		cache (sdm.files.cache.ConversionCache, optional): The cache to reuse earlier
+			conversions from. Files whose contents were already converted with the same
+			settings are not converted again, and new conversions are added to it
+		pollInterval (float, optional): The number of seconds between checks of the running
+			conversions
+
+	Returns:
+		list: The given jobs, holding their results
+	"""
+	workers = max(1, workers or cpu_count())
+	ready = [job for job in reversed(jobs) if job.getParent() is None]
+	running = []
+	done = 0
+	cached = 0
+
+	try:
+		while ready or running:
+			finished = []
+
+			while ready and len(running) < workers:
+				job = ready.pop()
+
+				if cache is not None and _restoreFromCache(job, cache):
+					finished.append(job)
+					cached += 1
+					continue
+
+				if cache is not None:
+					cache.release(job.getOutput())
+
+				job.start()
+				running.append(job)
+
+			stillRunning = []
+
+			for job in running:
+				if job.poll():
+					finished.append(job)
+				else:
+					stillRunning.append(job)
+
+			running = stillRunning
+
+			for job in finished:
+				done += 1
+
+				if job.succeeded():
+					if cache is not None and job.getCacheKey() and not job.wasCached():
+						cache.store(job.getCacheKey(), job.getOutput())
+
+					ready.extend(reversed(job.getDependents())) # Continue the chain while its source is fresh
+					continue
+
+				logger.warning('Could not convert {}: {}'.format(job.getSource(), job.getError()))
+
+				dependents = list(job.getDependents())
+
+				while dependents:
+					dependent = dependents.pop()
+					dependent.fail('Could not convert {}'.format(job.getSource()))
+					dependents.extend(dependent.getDependents())
+					done += 1
+
+			if operation is not None: # Also where interrupts are raised, so must be called while waiting too
+				operation.updateProgress(done / float(len(jobs)))
+
+			if running and not finished: # Nothing finished, so no slot to fill yet
+				time.sleep(pollInterval)
+	except BaseException:
+		for job in jobs:
+			job.cancel()
+
+		raise
+	finally:
+		if cache is not None:
+			cache.save()
+
+	logger.info('Converted {} of {} image(s), {} from cache'.format(len([j for j in jobs if j.succeeded()]), len(jobs), cached))
+
+	return jobs
+
+def convertImages(files, maxDim, scale, ext, workers=None, operation=None, converter=None, cache=None, tiers=None, pollInterval=0.05):
+	"""Converts many images at once, running up to the given number of converter processes
+	concurrently. The conversion arguments are all built up front, reading each image's
+	resolution from its header (see probeImage; only RAT resolution is queried through hou),
+	so only the converter processes run in parallel.
+
+	Args:
+		files (list): The absolute file paths of the images to convert
+		maxDim (float): The maximimum dimension of either side of the outputted images, see
+			convertImage
+		scale (float): The initial scale factor to apply to the outputted images, see convertImage
+		ext (sdm.houdini.image.ImageType): The image type to convert to
+		workers (int, optional): The maximum number of conversions to run at once. By default,
+			the number of CPUs
+		operation (hou.InterruptableOperation, optional): The operation to report progress to,
+			see runConversionJobs
+		converter (str, optional): The converter executable to use instead of icp
+		cache (sdm.files.cache.ConversionCache, optional): The cache to reuse earlier
+			conversions from, see runConversionJobs
+		tiers (list, optional): Also outputs these resolution tiers of each image, see
+			getTierJobs. DEFAULT_TIERS gives the full, 2k, 1k and 256 tiers
+		pollInterval (float, optional): The number of seconds between checks of the running
+			conversions
+
+	Returns:
+		list: A ConversionJob for each file (and each of its tiers), in the same order,
+			holding its result
+	"""
+	jobs = []
+
+	for file in files:
+		if tiers:
+			jobs.extend(getTierJobs(file, maxDim, scale, ext, tiers=tiers, converter=converter))
+		else:
+			args, newPath = getConversionArgs(file, maxDim, scale, ext, converter=converter)
+			jobs.append(ConversionJob(file, newPath, args))
+
+	return runConversionJobs(jobs, workers=workers, operation=operation, cache=cache, pollInterval=pollInterval)
+
 def isImage(file):
     """Determines if the given absolute file path points to an image filetype
 
@@ -75,7 +731,7 @@ def isImage(file):
     Returns:
         bool: True if the file is an image, otherwise False
     """
-    if imghdr.what(file) is not None:
+    if probeImage(file) is not None or imghdr.what(file) is not None:
         return True
 
     path, ext = os.path.splitext(file)
@@ -0,0 +1,326 @@
+"""Downloading and installing releases of SDMTools.
+
+Release archives are streamed to disk (resuming interrupted downloads where the server
+allows it), then extracted member by member into a staging copy of the install, which is
+swapped in place of the current install once complete. Files that are unchanged from the
+installed copy are linked rather than extracted again, so updates only write what changed.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, json, time, uuid, shutil, zlib, zipfile, logging
+
+try:
+	from urllib.request import Request, urlopen
+	from urllib.error import HTTPError
+except ImportError: # Python 2
+	from urllib2 import Request, urlopen, HTTPError
+
+from sdm.utils import writeFileAtomic, replaceFile
+from sdm.houdini.fileutils import mergeDict
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+def downloadFile(url, path, chunkSize=CHUNK_SIZE, timeout=30, retries=3, onProgress=None):
+	"""Streams the given URL to a file. The data is written to path.part first, which is
+	resumed with a Range request if the download is interrupted (now, or by a previous
+	attempt), as long as the server still has the same file (checked with If-Range)
+
+	Args:
+		url (str): The URL to download
+		path (str): The file to download to
+		chunkSize (int, optional): The number of bytes to read at once
+		timeout (float, optional): The number of seconds to wait on the server
+		retries (int, optional): The number of times to resume after a failed read
+		onProgress (callable, optional): Called with the number of bytes downloaded so far
+			and the total size (None if unknown) after each chunk
+
+	Returns:
+		str: The path of the downloaded file
+
+	Raises:
+		IOError: If the download failed, after retrying
+	"""
+	partPath = path + '.part'
+	metaPath = partPath + '.json'
+
+	for attempt in range(retries + 1):
+		try:
+			_download(url, partPath, metaPath, chunkSize, timeout, onProgress)
+			break
+		except IOError:
+			if attempt == retries:
+				raise
+
+			logger.warning('Download interrupted, resuming', exc_info=True)
+			time.sleep(min(2 ** attempt, 10))
+
+	replaceFile(partPath, path)
+
+	if os.path.exists(metaPath):
+		os.remove(metaPath)
+
+	return path
+
+def _download(url, partPath, metaPath, chunkSize, timeout, onProgress):
+	offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+	headers = {'User-Agent':'SDMTools'}
+	validator = None
+
+	if offset:
+		try:
+			with open(metaPath, 'r') as f:
+				validator = json.load(f).get('validator')
+		except (IOError, OSError, ValueError):
+			pass
+
+		if validator: # Without one, there's no telling if the partial file is still valid
+			headers['Range'] = 'bytes={}-'.format(offset)
+			headers['If-Range'] = validator
+		else:
+			offset = 0
+
+	try:
+		response = urlopen(Request(url, headers=headers), timeout=timeout)
+	except HTTPError as e:
+		if e.code != 416: # Requested range not satisfiable, the file changed size
+			raise
+
+		offset = 0
+		response = urlopen(Request(url, headers={'User-Agent':'SDMTools'}), timeout=timeout)
+
+	try:
+		info = response.info()
+
+		if response.getcode() != 206: # Not resumed, start over
+			offset = 0
+
+		validator = info.get('ETag') or info.get('Last-Modified')
+		writeFileAtomic(metaPath, json.dumps({'url':url, 'validator':validator}))
+
+		length = info.get('Content-Length')
+		total = offset + int(length) if length is not None else None
+		done = offset
+
+		if offset:
+			logger.info('Resuming download at {} bytes'.format(offset))
+
+		with open(partPath, 'ab' if offset else 'wb') as f:
+			while True:
+				chunk = response.read(chunkSize)
+
+				if not chunk:
+					break
+
+				f.write(chunk)
+				done += len(chunk)
+
+				if onProgress is not None:
+					onProgress(done, total)
+
+		if total is not None and done < total:
+			raise IOError('Download ended after {} of {} bytes'.format(done, total))
+	finally:
+		response.close()
+
+def getFileCrc(path, chunkSize=CHUNK_SIZE):
+	"""Computes the CRC-32 of a file, as stored for each member of a ZIP archive
+
+	Args:
+		path (str): The file
+		chunkSize (int, optional): The number of bytes to read at once
+
+	Returns:
+		int: The unsigned CRC-32
+	"""
+	crc = 0
+
+	with open(path, 'rb') as f:
+		while True:
+			chunk = f.read(chunkSize)
+
+			if not chunk:
+				break
+
+			crc = zlib.crc32(chunk, crc)
+
+	return crc & 0xffffffff
+
+def _isUnchanged(member, installedPath):
+	try:
+		if os.path.getsize(installedPath) != member.file_size:
+			return False
+
+		return getFileCrc(installedPath) == member.CRC
+	except (IOError, OSError):
+		return False
+
+def _linkOrCopy(source, target):
+	try:
+		os.link(source, target)
+	except (AttributeError, OSError): # No hard links on this platform or file system
+		shutil.copy2(source, target)
+
+def getMemberPath(member):
+	"""Gets the path of a member of a release archive relative to the install, dropping the
+	top directory GitHub wraps the repository in (i.e. 'sashaouellet-SDMTools-1a2b3c/')
+
+	Args:
+		member (zipfile.ZipInfo): The member
+
+	Returns:
+		str: The relative path using os.sep, or None for the top directory itself
+	"""
+	parts = member.filename.split('/', 1)
+
+	if len(parts) < 2 or not parts[1]:
+		return None
+
+	return os.path.normpath(parts[1])
+
+def extractRelease(archivePath, installDir, stagingDir, transforms=None, chunkSize=CHUNK_SIZE, onProgress=None):
+	"""Extracts a release archive into the staging directory, linking the files of the
+	current install that are unchanged (same size and CRC-32) instead of extracting them
+
+	Args:
+		archivePath (str): The ZIP archive of the release
+		installDir (str): The current install
+		stagingDir (str): The directory to extract the release to
+		transforms (dict, optional): Maps relative paths to a function called with the
+			file's content in the release and the path of the installed copy, returning
+			the content to install instead, i.e. to merge settings
+		chunkSize (int, optional): The number of bytes to decompress at once
+		onProgress (callable, optional): Called with the number of members handled so far
+			and the total
+
+	Returns:
+		tuple: The number of files extracted, and the number that were unchanged
+	"""
+	transforms = transforms or {}
+	extracted = unchanged = 0
+
+	with zipfile.ZipFile(archivePath) as archive:
+		members = archive.infolist()
+
+		for i, member in enumerate(members):
+			relPath = getMemberPath(member)
+
+			if relPath is None or relPath.startswith('..') or os.path.isabs(relPath):
+				continue
+
+			target = os.path.join(stagingDir, relPath)
+			installed = os.path.join(installDir, relPath)
+
+			if member.filename.endswith('/'):
+				if not os.path.isdir(target):
+					os.makedirs(target)
+
+				continue
+
+			targetDir = os.path.dirname(target)
+
+			if not os.path.isdir(targetDir):
+				os.makedirs(targetDir)
+
+			if relPath in transforms:
+				content = transforms[relPath](archive.read(member), installed)
+
+				with open(target, 'wb') as f:
+					f.write(content)
+
+				extracted += 1
+			elif _isUnchanged(member, installed):
+				_linkOrCopy(installed, target)
+				unchanged += 1
+			else:
+				logger.debug('Installing {}'.format(relPath))
+
+				with archive.open(member) as source, open(target, 'wb') as f:
+					shutil.copyfileobj(source, f, chunkSize)
+
+				extracted += 1
+
+			if onProgress is not None:
+				onProgress(i + 1, len(members))
+
+	return extracted, unchanged
+
+def swapDirectories(stagingDir, installDir):
+	"""Moves the staging directory into place of the install directory. The old install is
+	renamed aside first, and restored if the staging directory can't be moved in
+
+	Args:
+		stagingDir (str): The new install
+		installDir (str): The current install, to replace
+	"""
+	backupDir = '{}.old_{}'.format(installDir, uuid.uuid4().hex[:8])
+
+	os.rename(installDir, backupDir)
+
+	try:
+		os.rename(stagingDir, installDir)
+	except OSError:
+		os.rename(backupDir, installDir)
+		raise
+
+	shutil.rmtree(backupDir, ignore_errors=True)
+
+def mergeSettingsTransform(version, autoCheckUpdates):
+	"""Builds the transform (see extractRelease) keeping the installed settings, unless the
+	release's settings.json sets forceOverwrite
+
+	Args:
+		version (str): The tag of the release being installed
+		autoCheckUpdates (bool): Whether to check for updates automatically
+
+	Returns:
+		callable: The transform of settings.json
+	"""
+	def transform(content, installedPath):
+		settingsData = json.loads(content.decode('utf-8'))
+
+		if settingsData.get('forceOverwrite', False):
+			logger.debug('Forced overwrite of settings.json')
+			return content
+
+		logger.debug('Merging new settings with existing')
+
+		try:
+			with open(installedPath, 'r') as f:
+				oldSettings = json.load(f)
+		except (IOError, OSError, ValueError):
+			oldSettings = {}
+
+		mergedJson = mergeDict(settingsData, oldSettings)
+		mergedJson['version'] = version
+		mergedJson['autoCheckUpdates'] = autoCheckUpdates
+
+		return json.dumps(mergedJson, sort_keys=True, indent=4, separators=(',', ': ')).encode('utf-8')
+
+	return transform
+
+def installRelease(archivePath, installDir, transforms=None, onProgress=None):
+	"""Installs a release archive in place of the given install, see extractRelease and
+	swapDirectories. The current install is left untouched if anything fails before the swap
+
+	Args:
+		archivePath (str): The ZIP archive of the release
+		installDir (str): The root of the current install, holding the houdini and python folders
+		transforms (dict, optional): See extractRelease
+		onProgress (callable, optional): See extractRelease
+	"""
+	installDir = os.path.abspath(installDir)
+	stagingDir = os.path.join(os.path.dirname(installDir), 'temp_{}'.format(uuid.uuid4()))
+
+	try:
+		extracted, unchanged = extractRelease(archivePath, installDir, stagingDir, transforms=transforms, onProgress=onProgress)
+		swapDirectories(stagingDir, installDir)
+	except:
+		shutil.rmtree(stagingDir, ignore_errors=True)
+		raise
+
+	logger.info('Installed {} changed and {} unchanged file(s)'.format(extracted, unchanged))
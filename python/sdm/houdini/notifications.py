@@ -5,51 +5,768 @@ __version__ = 1.0.0
 __date__ = 12/10/17
 """
 
-import logging
+import os, json, time, shlex, atexit, socket, logging, threading, subprocess
 import smtplib, base64
+from abc import ABCMeta, abstractmethod
 from email.mime.text import MIMEText
 
+try:
+	from queue import Queue, Empty
+except ImportError: # Python 2
+	from Queue import Queue, Empty
+
+try:
+	from urllib.request import Request, urlopen
+	from urllib.error import HTTPError
+except ImportError: # Python 2
+	from urllib2 import Request, urlopen, HTTPError
+
 from sdm.houdini.fileutils import SettingsFile
-from sdm.utils import splitByCamelCase
+from sdm.utils import splitByCamelCase, getCacheDir, getPeakMemory, formatBytes
 
 logger = logging.getLogger(__name__)
 
 class NotificationType():
 	ROP_COMPLETE = 1
+	ROP_FAILED = 2
+	BACKGROUND_CACHE_COMPLETE = 3
+	CONVERSION_COMPLETE = 4
 
-def notifyUser(msg, data={}):
-	"""Given a message type and optional data, notifies
-	the user via the email saved in the settings file
+	NAMES = {
+		ROP_COMPLETE: 'ropComplete',
+		ROP_FAILED: 'ropFailed',
+		BACKGROUND_CACHE_COMPLETE: 'backgroundCacheComplete',
+		CONVERSION_COMPLETE: 'conversionComplete'
+	}
 
-	Args:
-	    msg (NotificationType): The type of notification to send, the actual
-	    	body of the message is determined by this value
-	    data (dict, optional): Optional data that will be parsed into the message
-	    	such as where this notification is coming from, time of completion, etc.
+	TITLES = {
+		ROP_COMPLETE: '{} has completed',
+		ROP_FAILED: '{} has failed',
+		BACKGROUND_CACHE_COMPLETE: '{} has finished caching in the background',
+		CONVERSION_COMPLETE: '{} has finished converting'
+	}
+
+class NotificationError(Exception):
+	"""Raised by a transport when a notification can not be delivered, and trying again
+	would not help (i.e. bad credentials)
 	"""
-	if not msg:
-		return
+	pass
+
+class Notification(object):
+	"""A notification, and the structured data describing the event it is about
+	"""
+
+	def __init__(self, type, node=None, duration=None, frameRange=None, outputBytes=None, peakMemory=None, data=None):
+		"""
+		Args:
+			type (NotificationType): The type of event
+			node (str, optional): The path of the node the event is about
+			duration (float, optional): The number of seconds the operation took
+			frameRange (list, optional): The (start, end, increment) ranges of frames that
+				were output
+			outputBytes (int, optional): The total size of the files that were output
+			peakMemory (int, optional): The peak resident memory of the process, in bytes
+			data (dict, optional): Any other data to include
+		"""
+		self._type = type
+		self._node = node
+		self._duration = duration
+		self._frameRange = [list(r) for r in frameRange] if frameRange else None
+		self._outputBytes = outputBytes
+		self._peakMemory = peakMemory
+		self._data = dict(data or {})
+		self._time = time.time()
+		self._host = socket.gethostname()
+
+	def getType(self):
+		return self._type
+
+	def getNode(self):
+		return self._node
+
+	def getDuration(self):
+		return self._duration
+
+	def getFrameRange(self):
+		return self._frameRange
+
+	def getOutputBytes(self):
+		return self._outputBytes
+
+	def getPeakMemory(self):
+		return self._peakMemory
+
+	def getData(self):
+		return self._data
+
+	def getTime(self):
+		return self._time
+
+	def getTitle(self):
+		return NotificationType.TITLES.get(self._type, '{} notification').format(self._node or 'Operation')
+
+	def getBody(self):
+		"""Gets the human readable description of the notification, see formatMessage
+
+		Returns:
+			str: The title, followed by a line for each piece of data
+		"""
+		fields = []
 
-	server = smtplib.SMTP('smtp.gmail.com:587')
+		if self._node:
+			fields.append(('Node', self._node))
 
-	if msg == NotificationType.ROP_COMPLETE:
-		logger.info('Notifying for ROP completion')
-		server.starttls()
+		if self._duration is not None:
+			m, s = divmod(self._duration, 60)
+			h, m = divmod(m, 60)
 
+			fields.append(('Duration', '%d:%02d:%02d' % (h, m, s)))
+
+		if self._frameRange:
+			fields.append(('FrameRange', ', '.join('{}-{}x{}'.format(*r) for r in self._frameRange)))
+
+		if self._outputBytes is not None:
+			fields.append(('OutputSize', formatBytes(self._outputBytes)))
+
+		if self._peakMemory is not None:
+			fields.append(('PeakMemory', formatBytes(self._peakMemory)))
+
+		return formatMessage(self.getTitle(), fields + sorted(self._data.items()))
+
+	def toDict(self):
+		"""Gets the JSON-serializable payload of the notification
+
+		Returns:
+			dict: The type, time, host and data of the notification
+		"""
+		return {
+			'type': NotificationType.NAMES.get(self._type, self._type),
+			'time': self._time,
+			'host': self._host,
+			'node': self._node,
+			'duration': self._duration,
+			'frameRange': self._frameRange,
+			'outputBytes': self._outputBytes,
+			'peakMemory': self._peakMemory,
+			'data': self._data
+		}
+
+DEFAULT_SMTP_HOST = 'smtp.gmail.com'
+DEFAULT_SMTP_PORT = 587
+
+class SMTPSender(object):
+	"""Sends mail through a single authenticated SMTP connection that is kept open between
+	messages, and reopened when the server has dropped it. Credentials and server settings
+	are read from the settings file when connecting; nothing is sent (and no connection is
+	made) when no credentials are set
+	"""
+
+	def __init__(self, host=None, port=None, useTls=None, timeout=30):
+		"""
+		Args:
+			host (str, optional): The SMTP server. By default, the notificationSmtpHost setting,
+				or Gmail's server
+			port (int, optional): The SMTP port. By default, the notificationSmtpPort setting, or 587
+			useTls (bool, optional): Whether to upgrade the connection with STARTTLS. By default,
+				the notificationSmtpTls setting, or True
+			timeout (float, optional): The number of seconds to wait on the server
+		"""
+		self._host = host
+		self._port = port
+		self._useTls = useTls
+		self._timeout = timeout
+		self._server = None
+		self._user = None
+
+	def getCredentials(self):
+		"""Gets the notification email and password from the settings file
+
+		Returns:
+			tuple: The email and password, either of which may be empty
+		"""
 		settings = SettingsFile()
 		user = settings.get('notificationEmail', '')
-		pw = base64.b64decode(settings.get('notificationPassword', ''))
+		pw = base64.b64decode(settings.get('notificationPassword', '')).decode('utf-8')
+
+		if self._host is None:
+			self._host = settings.get('notificationSmtpHost', DEFAULT_SMTP_HOST)
+			self._port = self._port or settings.get('notificationSmtpPort', DEFAULT_SMTP_PORT)
 
-		if user and pw:
-			message = MIMEText(formatMessage('Cache completed', data))
-			message['Subject'] = 'SDMTools - {} has completed'.format(data.get('Node', 'Cache'))
+		if self._useTls is None:
+			self._useTls = settings.get('notificationSmtpTls', True)
+
+		return user, pw
+
+	def _connect(self):
+		user, pw = self.getCredentials()
+
+		if not user or not pw:
+			return False
+
+		logger.debug('Connecting to {}:{}'.format(self._host, self._port))
+
+		server = smtplib.SMTP(self._host, self._port or DEFAULT_SMTP_PORT, timeout=self._timeout)
+
+		try:
+			if self._useTls:
+				server.starttls()
 
 			logger.debug('Authenticating user')
 			server.login(user, pw)
-			server.sendmail(user, user, message.as_string())
-			logger.debug('Sent email')
+		except:
+			self._quit(server)
+			raise
+
+		self._server = server
+		self._user = user
+
+		return True
+
+	def _isConnected(self):
+		if self._server is None:
+			return False
+
+		try:
+			return self._server.noop()[0] == 250
+		except (smtplib.SMTPException, socket.error):
+			self.close()
+			return False
+
+	def send(self, subject, body):
+		"""Sends a mail to the notification email, from itself
+
+		Args:
+			subject (str): The subject of the mail
+			body (str): The body of the mail
+
+		Returns:
+			bool: True if the mail was sent, False if there are no credentials to send it with
+
+		Raises:
+			smtplib.SMTPException, socket.error: If the mail could not be sent
+		"""
+		if not self._isConnected() and not self._connect():
+			logger.info('No notification email set, not sending: {}'.format(subject))
+			return False
+
+		message = MIMEText(body)
+		message['Subject'] = subject
+
+		try:
+			self._server.sendmail(self._user, self._user, message.as_string())
+		except (smtplib.SMTPException, socket.error):
+			self.close()
+			raise
+
+		logger.debug('Sent email')
+
+		return True
+
+	def _quit(self, server):
+		try:
 			server.quit()
+		except (smtplib.SMTPException, socket.error):
+			server.close()
+
+	def close(self):
+		if self._server is not None:
+			self._quit(self._server)
+			self._server = None
+
+class Transport(ABCMeta('TransportBase', (object,), {})): # Abstract on both Python 2 and 3
+	"""Delivers batches of notifications somewhere. Transports are registered by name with
+	registerTransport, and the ones listed in the notificationTransports setting are used.
+
+	Subclasses must implement send(), and can't be instantiated otherwise. Each transport
+	gets its own NotificationDispatcher, which calls send() from a background thread and
+	retries it if it raises IOError, OSError, socket.error or an smtplib.SMTPException
+	"""
+	# Notifications arriving within this many seconds of each other are sent together
+	COALESCE_SECONDS = 0.0
+
+	@classmethod
+	def fromSettings(cls, settings):
+		"""Creates the transport from the settings file
+
+		Args:
+			settings (SettingsFile): The settings to read the transport's options from
+
+		Returns:
+			Transport: The transport, or None if it is not configured
+		"""
+		return cls()
+
+	@abstractmethod
+	def send(self, notifications):
+		"""Delivers the given notifications
+
+		Args:
+			notifications (list): The Notification to deliver
+
+		Raises:
+			NotificationError: If they can not be delivered, and trying again would not help
+		"""
+		pass
+
+	def close(self):
+		"""Releases any connection held between sends, called after a while without any
+		"""
+		pass
+
+class SMTPTransport(Transport):
+	"""Mails notifications through an SMTPSender, combining those of the same minute into
+	one digest
+	"""
+	COALESCE_SECONDS = 60.0
+
+	def __init__(self, sender=None):
+		self._sender = sender or SMTPSender()
+
+	def send(self, notifications):
+		subject, body = formatDigest(notifications)
+
+		try:
+			self._sender.send(subject, body)
+		except smtplib.SMTPAuthenticationError as e:
+			raise NotificationError('Could not authenticate with the notification email, check SDMTools > Preferences: {}'.format(e))
+
+	def close(self):
+		self._sender.close()
+
+class WebhookTransport(Transport):
+	"""POSTs notifications as JSON to a URL, as {"notifications": [payload, ...]}, see
+	Notification.toDict
+	"""
+
+	def __init__(self, url, timeout=10):
+		self._url = url
+		self._timeout = timeout
+
+	@classmethod
+	def fromSettings(cls, settings):
+		url = settings.get('notificationWebhookUrl')
+
+		return cls(url) if url else None
+
+	def send(self, notifications):
+		data = json.dumps({'notifications':[n.toDict() for n in notifications]}).encode('utf-8')
+		request = Request(self._url, data=data, headers={'Content-Type':'application/json'})
+
+		try:
+			urlopen(request, timeout=self._timeout).close()
+		except HTTPError as e:
+			if e.code < 500: # The request itself was refused
+				raise NotificationError('Webhook refused notification: {}'.format(e))
+
+			raise
+
+class CommandTransport(Transport):
+	"""Runs a desktop notification command, such as notify-send, with the title and body of
+	the notifications as its last two arguments
+	"""
+	COALESCE_SECONDS = 5.0
+
+	def __init__(self, command=None):
+		"""
+		Args:
+			command (list, optional): The command and its arguments. By default, notify-send
+		"""
+		self._command = command or ['notify-send']
+
+	@classmethod
+	def fromSettings(cls, settings):
+		command = settings.get('notificationCommand')
+
+		if command and not isinstance(command, list):
+			command = shlex.split(command)
+
+		return cls(command)
+
+	def send(self, notifications):
+		subject, body = formatDigest(notifications)
+
+		with open(os.devnull, 'wb') as devnull:
+			returnCode = subprocess.call(self._command + [subject, body], stdout=devnull, stderr=devnull)
+
+		if returnCode != 0:
+			raise NotificationError('{} exited with code {}'.format(self._command[0], returnCode))
+
+class FileTransport(Transport):
+	"""Appends each notification as a line of JSON to a file, for pipeline tools to ingest,
+	see Notification.toDict
+	"""
+
+	def __init__(self, path=None):
+		"""
+		Args:
+			path (str, optional): The file to append to. By default, notifications.jsonl in
+				the cache directory, see sdm.utils.getCacheDir
+		"""
+		self._path = path or getCacheDir('notifications.jsonl')
+
+	@classmethod
+	def fromSettings(cls, settings):
+		return cls(settings.get('notificationLogFile'))
+
+	def getPath(self):
+		return self._path
+
+	def send(self, notifications):
+		dir = os.path.dirname(self._path)
+
+		if dir and not os.path.exists(dir):
+			os.makedirs(dir)
+
+		lines = ''.join(json.dumps(n.toDict()) + '\n' for n in notifications)
+
+		# A single write in append mode, so lines of other sessions are not interleaved
+		with open(self._path, 'a') as f:
+			f.write(lines)
+
+TRANSPORTS = {}
+
+def registerTransport(name, cls):
+	"""Registers a transport so it can be enabled in the notificationTransports setting
+
+	Args:
+		name (str): The name of the transport in the setting
+		cls (type): The Transport subclass
+
+	Raises:
+		TypeError: If cls is not a Transport subclass
+	"""
+	if not (isinstance(cls, type) and issubclass(cls, Transport)):
+		raise TypeError('Notification transports must subclass Transport: {}'.format(cls))
+
+	TRANSPORTS[name] = cls
+
+registerTransport('smtp', SMTPTransport)
+registerTransport('webhook', WebhookTransport)
+registerTransport('command', CommandTransport)
+registerTransport('file', FileTransport)
+
+class NotificationDispatcher(object):
+	"""Delivers notifications through a transport from a background thread, so sending
+	never blocks the caller (i.e. a ROP's execute callback).
+
+	Notifications arriving within coalesceSeconds of each other are delivered together,
+	so a burst of completions (such as a wedge of ROPs) sends one mail rather than one
+	each. The transport is closed after idleSeconds without notifications, and failed
+	sends are retried with exponential backoff. A dispatcher that is no longer used should
+	be stopped, which ends its thread once the queued notifications have been delivered.
+	"""
+	_FLUSH = object()
+	_STOP = object()
+	RETRY_ERRORS = (smtplib.SMTPException, socket.error, IOError, OSError)
+
+	def __init__(self, transport, coalesceSeconds=None, idleSeconds=120.0, retries=4, backoffSeconds=2.0):
+		"""
+		Args:
+			transport (Transport): Delivers the notifications
+			coalesceSeconds (float, optional): The number of seconds after a notification during
+				which further notifications are delivered with it. By default, the transport's
+				COALESCE_SECONDS
+			idleSeconds (float, optional): The number of seconds without notifications after
+				which the transport is closed
+			retries (int, optional): The number of times a failed send is tried again
+			backoffSeconds (float, optional): The delay before the first retry, doubled for each
+				following retry
+		"""
+		self._transport = transport
+		self._coalesceSeconds = transport.COALESCE_SECONDS if coalesceSeconds is None else coalesceSeconds
+		self._idleSeconds = idleSeconds
+		self._retries = retries
+		self._backoffSeconds = backoffSeconds
+		self._queue = Queue()
+		self._thread = None
+		self._lock = threading.Lock()
+		self._sent = 0
+
+	def getTransport(self):
+		return self._transport
+
+	def getSentCount(self):
+		return self._sent
+
+	def submit(self, notification):
+		"""Queues a notification, returning immediately
+
+		Args:
+			notification (Notification): The notification to deliver
+		"""
+		self._queue.put(notification)
+		self._ensureThread()
+
+	def flush(self, timeout=None):
+		"""Sends any queued notifications right away, without waiting for the rest of
+		the coalescing window
+
+		Args:
+			timeout (float, optional): The maximum number of seconds to wait for the queued
+				notifications to be handled. By default, waits until they are
+		"""
+		if self._thread is None:
+			return
+
+		self._queue.put(NotificationDispatcher._FLUSH)
+
+		start = time.time()
+
+		while self._queue.unfinished_tasks:
+			if timeout is not None and time.time() - start >= timeout:
+				logger.warning('Timed out waiting for notifications to be sent')
+				return
+
+			time.sleep(0.05)
+
+	def stop(self, timeout=0):
+		"""Delivers the queued notifications right away, then closes the transport and ends
+		the background thread. Notifications submitted afterwards start a new thread
+
+		Args:
+			timeout (float, optional): The maximum number of seconds to wait for the thread to
+				end. By default, returns immediately. None waits until it has
+		"""
+		thread = self._thread
+
+		if thread is None:
+			return
+
+		self._queue.put(NotificationDispatcher._FLUSH)
+		self._queue.put(NotificationDispatcher._STOP)
+
+		if timeout != 0:
+			thread.join(timeout)
+
+	def isRunning(self):
+		thread = self._thread
+
+		return thread is not None and thread.is_alive()
+
+	def _ensureThread(self):
+		with self._lock:
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, name='NotificationDispatcher')
+				self._thread.daemon = True
+				self._thread.start()
+
+	def _run(self):
+		while True:
+			try:
+				item = self._queue.get(timeout=self._idleSeconds)
+			except Empty:
+				self._transport.close()
+				continue
+
+			if item is NotificationDispatcher._STOP:
+				self._queue.task_done()
+
+				with self._lock: # Checked under the lock, so a submit either sees the thread end or is handled by it
+					if self._queue.empty():
+						self._thread = None
+						break
+
+				self._queue.put(NotificationDispatcher._STOP) # Deliver what was submitted since first
+				continue
+
+			batch = []
+			taken = 1
+
+			if item is not NotificationDispatcher._FLUSH:
+				batch.append(item)
+				deadline = time.time() + self._coalesceSeconds
+
+				while True:
+					remaining = deadline - time.time()
+
+					if remaining <= 0:
+						break
+
+					try:
+						item = self._queue.get(timeout=remaining)
+					except Empty:
+						break
+
+					if item is NotificationDispatcher._STOP: # Handled once this batch is delivered
+						self._queue.task_done()
+						self._queue.put(item)
+						break
+
+					taken += 1
+
+					if item is NotificationDispatcher._FLUSH:
+						break
+
+					batch.append(item)
+
+			try:
+				if batch:
+					self._deliver(batch)
+			except Exception:
+				logger.exception('Could not deliver {} notification(s)'.format(len(batch)))
+			finally:
+				for i in range(taken):
+					self._queue.task_done()
+
+		self._transport.close()
+
+	def _deliver(self, batch):
+		for attempt in range(self._retries + 1):
+			try:
+				self._transport.send(batch)
+				self._sent += len(batch)
+
+				return
+			except NotificationError as e:
+				logger.error(str(e))
+				return
+			except NotificationDispatcher.RETRY_ERRORS as e:
+				if attempt == self._retries:
+					raise
+
+				delay = self._backoffSeconds * 2 ** attempt
+
+				logger.warning('Could not send notification ({}), retrying in {}s'.format(e, delay))
+				time.sleep(delay)
+
+def formatDigest(notifications):
+	"""Formats the subject and body describing the given notifications, as a digest if
+	there are several
+
+	Args:
+		notifications (list): The Notification to describe
+
+	Returns:
+		tuple: The subject and body
+	"""
+	if len(notifications) == 1:
+		return 'SDMTools - ' + notifications[0].getTitle(), notifications[0].getBody()
+
+	sections = [n.getBody() for n in notifications]
+
+	return 'SDMTools - {} notifications'.format(len(notifications)), '\n\n'.join(sections)
+
+_dispatchers = None
+_dispatchersLock = threading.Lock()
+
+def getDispatchers():
+	"""Gets the dispatchers of the transports listed in the notificationTransports setting
+	(by default, only 'smtp'), creating them on first use
+
+	Returns:
+		list: The NotificationDispatcher of each configured transport
+	"""
+	global _dispatchers
+
+	dispatchers = _dispatchers
+
+	if dispatchers is not None:
+		return dispatchers
+
+	# Built outside of the lock, as reading the settings may notify _onSettingsChanged
+	settings = SettingsFile()
+	dispatchers = []
+
+	for name in settings.get('notificationTransports', ['smtp']):
+		if name not in TRANSPORTS:
+			logger.warning('Unknown notification transport: {}'.format(name))
+			continue
+
+		transport = TRANSPORTS[name].fromSettings(settings)
+
+		if transport is None:
+			logger.warning('Notification transport {} is not configured, skipping'.format(name))
+			continue
+
+		dispatchers.append(NotificationDispatcher(transport))
+
+	with _dispatchersLock:
+		if _dispatchers is None:
+			_dispatchers = dispatchers
+
+		# Either these, or the ones another thread created first (unused ones have no thread to stop)
+		return _dispatchers
+
+def resetDispatchers():
+	"""Stops the current dispatchers, once they have delivered their queued notifications.
+	New ones are created from the settings the next time a notification is sent
+	"""
+	global _dispatchers
+
+	with _dispatchersLock:
+		dispatchers, _dispatchers = _dispatchers, None
+
+	for dispatcher in dispatchers or []:
+		dispatcher.stop()
+
+def _onSettingsChanged(changed):
+	# Transports are recreated with the new settings the next time they're used
+	if any(key.startswith('notification') for key in changed):
+		resetDispatchers()
+
+SettingsFile.subscribe(_onSettingsChanged)
+
+@atexit.register
+def _flushDispatchers():
+	# A single hook for whichever dispatchers are current, rather than one per dispatcher
+	for dispatcher in _dispatchers or []:
+		dispatcher.flush(timeout=30)
+
+def notify(notification):
+	"""Queues the given notification on every configured transport, returning immediately
+
+	Args:
+		notification (Notification): The notification to deliver
+	"""
+	for dispatcher in getDispatchers():
+		dispatcher.submit(notification)
+
+def notifyRop(node, duration, type=NotificationType.ROP_COMPLETE, frames=None, outputBytes=None, data=None):
+	"""Notifies about the output operation of a ROP, with the frames it output, their size
+	on disk and the peak memory of this session
+
+	Args:
+		node (hou.Node): The ROP node
+		duration (float): The number of seconds the operation took
+		type (NotificationType, optional): The type of notification, ROP_COMPLETE by default
+		frames (FrameSet, optional): The frames that were output. By default, the ROP's
+			frame range
+		outputBytes (int, optional): The size of the output files. By default, read from disk
+		data (dict, optional): Any other data to include
+	"""
+	from sdm.houdini.execution import getRopFrameSet, getRopOutputSizes
+
+	try:
+		frames = frames if frames is not None else getRopFrameSet(node)
+		frameRange = frames.getRanges()
+
+		if outputBytes is None:
+			outputBytes = sum(getRopOutputSizes(node, frames).values())
+	except Exception:
+		logger.debug('Could not get output of {}'.format(node.path()), exc_info=True)
+		frameRange = None
+
+	notify(Notification(type, node=node.path(), duration=duration, frameRange=frameRange, outputBytes=outputBytes, peakMemory=getPeakMemory(), data=data))
+
+def notifyUser(msg, data={}):
+	"""Given a message type and optional data, notifies
+	the user through the configured transports.
+
+	The notification is queued to be sent in the background, so this
+	returns immediately. See notify
+
+	Args:
+	    msg (NotificationType): The type of notification to send, the actual
+	    	body of the message is determined by this value
+	    data (dict, optional): Optional data that will be parsed into the message
+	    	such as where this notification is coming from, time of completion, etc.
+	"""
+	if not msg:
+		return
+
+	data = dict(data)
 
+	notify(Notification(msg, node=data.pop('Node', None), data=data))
 
 def formatMessage(body, data={}):
 	"""Formats a message as a string with the given
@@ -60,14 +777,15 @@ def formatMessage(body, data={}):
 	Args:
 	    body (str): The body of the message
 	    data (dict, optional): Optional data pieces to include underneath
-	    	the body
+	    	the body, or a list of (key, value) tuples to keep them in order
 
 	Returns:
 	    str: The formatted message with, at minimum, the given body.
 	"""
 	out = body + '\n'
+	items = data.items() if isinstance(data, dict) else data
 
-	for key, val in data.iteritems():
+	for key, val in items:
 		out += '\n' + '{}: {}'.format(' '.join(splitByCamelCase(key)), val)
 
-	return out
\ No newline at end of file
+	return out
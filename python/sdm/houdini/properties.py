@@ -12,19 +12,16 @@ def initRopNotificationProperty(node):
 	button that launches a notification after the cache/render process
 	if the newly added checkbox is checked.
 
+	The new button also records the time, CPU time, peak memory and output
+	size of each frame to the ROP's history, see sdm.houdini.telemetry.executeRop
+
 	Args:
 	    node (hou.Node): The ROP node to add the new button and notifications
 	    	checkbox to
 	"""
 	parmTemplate = node.parmTemplateGroup()
 	notifyParm = hou.ToggleParmTemplate('notify', 'Notify on Completion', help='Receive a notification when this ROP output operation completes. Notifications are based on settings in SDMTools > Preferences.')
-	notifyScript = "; from sdm.houdini.notifications import notifyUser, NotificationType;" \
-				"seconds = time.time() - start;" \
-				"m, s = divmod(seconds, 60);" \
-				"h, m = divmod(m, 60);" \
-				"p = hou.pwd().parm('notify');" \
-				"data = {'Node':hou.pwd().name(), 'Duration':'%d:%02d:%02d' % (h, m, s)};" \
-				"notifyUser(NotificationType.ROP_COMPLETE if p and p.eval() else None, data=data)"
+	executeScript = "from sdm.houdini.telemetry import executeRop; executeRop(hou.pwd(), {!r}, kwargs)"
 
 	if node.type() == 'filecache':
 		folderParm = parmTemplate.containingFolder('execute')
@@ -43,9 +40,7 @@ def initRopNotificationProperty(node):
 				parm.hide(True)
 
 				newParms += (parm,)
-				callback = execCache.scriptCallback()
-				callback = 'import time; start = time.time(); ' + callback
-				callback += notifyScript
+				callback = executeScript.format(execCache.scriptCallback())
 
 				execCache.setScriptCallback(callback)
 				execCache.setName('executeWithNotification')
@@ -64,9 +59,7 @@ def initRopNotificationProperty(node):
 
 			renderButton.hide(True)
 
-			callback = renderButton.scriptCallback() or 'import hou; hou.pwd().render()'
-			callback = 'import time; start = time.time(); ' + callback
-			callback += notifyScript
+			callback = executeScript.format(renderButton.scriptCallback() or 'import hou; hou.pwd().render()')
 
 			renderNotify.setScriptCallback(callback)
 			renderNotify.setName('executeWithNotification')
@@ -0,0 +1,428 @@
+"""Indexing of the files referenced by parameters throughout the scene
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, logging
+from collections import defaultdict
+
+import hou
+
+from sdm.utils import listDirectory
+from sdm.houdini.fileutils import isDescendant
+
+logger = logging.getLogger(__name__)
+
+def isFileReferenceParm(parm):
+	"""Determines if the given parameter holds a file reference, based on its template
+
+	Args:
+		parm (hou.Parm): The parameter to check
+
+	Returns:
+		bool: True if the parameter is a string parameter of the FileReference type
+	"""
+	template = parm.parmTemplate()
+
+	return isinstance(template, hou.StringParmTemplate) and template.stringType() == hou.stringParmType.FileReference
+
+class FileReferenceIndex(object):
+	"""An index of all parameters in the scene that reference existing files, grouped by
+	the (evaluated) path they reference.
+
+	Checking a parameter's template is by far the most expensive part of finding file
+	references, so which parameter names are file references is remembered per node type
+	and shared by all indexes: templates are checked once per type and parameter name,
+	rather than once per node. Spare parameters are always checked, as they differ
+	between nodes of the same type. The existence of the referenced files is then checked
+	in one batch, listing each directory once when many files are referenced from it.
+
+	An index that is built once holds the references as they were when it was built. A
+	watched index (see watch) remembers the file parameters of every node, and which
+	nodes had parameters change since the last query. Only those nodes are evaluated
+	again when the references are next queried.
+	"""
+	LIST_DIR_THRESHOLD = 8
+	NODE_EVENTS = (hou.nodeEventType.ParmTupleChanged, hou.nodeEventType.SpareParmTemplatesChanged, hou.nodeEventType.ChildCreated, hou.nodeEventType.BeingDeleted)
+
+	_fileParmsByType = {}
+
+	def __init__(self, root=None, hipOnly=True):
+		"""
+		Args:
+			root (hou.Node, optional): The node to index the children of. By default,
+				the whole scene is indexed
+			hipOnly (bool, optional): Whether to only index files under $HIP. True by default
+		"""
+		self._root = root
+		self._hipOnly = hipOnly
+		self._fileParms = {}
+		self._references = {}
+		self._nodeReferences = {}
+		self._dirtyNodes = set()
+		self._watchedNodes = {}
+		self._watching = False
+		self._dirty = False
+		self._stale = False
+
+	@classmethod
+	def clearTypeCache(cls):
+		"""Forgets which parameters of each node type are file references, i.e. after
+		asset definitions have been updated
+		"""
+		cls._fileParmsByType.clear()
+
+	def iterFileParms(self, node):
+		"""Iterates over the parameters of the given node that are file references
+
+		Args:
+			node (hou.Node): The node to get the file parameters of
+
+		Returns:
+			generator: Each hou.Parm of the node that is a file reference
+		"""
+		known = FileReferenceIndex._fileParmsByType.setdefault(node.type().nameWithCategory(), {})
+
+		for parm in node.parms():
+			name = parm.name()
+			isFile = known.get(name)
+
+			if isFile is None:
+				isFile = isFileReferenceParm(parm)
+
+				if not parm.isSpare():
+					known[name] = isFile
+
+			if isFile:
+				yield parm
+
+	def _getRoot(self):
+		return self._root or hou.node('/')
+
+	def _setFileParms(self, node):
+		parms = list(self.iterFileParms(node))
+
+		if parms:
+			self._fileParms[node.sessionId()] = parms
+		else:
+			self._fileParms.pop(node.sessionId(), None)
+
+	def _removeReferences(self, sessionId):
+		"""Removes the references held by the node with the given session id, looking up
+		only the paths it references
+		"""
+		values = self._nodeReferences.pop(sessionId, None)
+
+		if not values:
+			return
+
+		# Lists are replaced rather than modified, so callers iterating over them are unaffected
+		for val in set(val for parm, val in values):
+			parms = [p for p in self._references.get(val, []) if p.node().sessionId() != sessionId]
+
+			if parms:
+				self._references[val] = parms
+			else:
+				self._references.pop(val, None)
+
+	def _remove(self, nodes):
+		"""Removes the given nodes and every reference they hold from the index
+		"""
+		for node in nodes:
+			sessionId = node.sessionId()
+
+			self._fileParms.pop(sessionId, None)
+			self._dirtyNodes.discard(sessionId)
+			self._removeReferences(sessionId)
+
+	def _evaluate(self, sessionIds):
+		"""Evaluates the file parameters of the nodes with the given session ids
+
+		Returns:
+			list: The (sessionId, hou.Parm, str) tuple of each file parameter that
+				references a path
+		"""
+		values = []
+
+		for sessionId in sessionIds:
+			parms = self._fileParms.get(sessionId, [])
+
+			try:
+				values.extend([(sessionId, parm, parm.evalAsString()) for parm in parms])
+			except hou.ObjectWasDeleted:
+				self._fileParms.pop(sessionId, None)
+
+		return [(sessionId, parm, val) for sessionId, parm, val in values if val]
+
+	def _add(self, values):
+		"""Adds the given (sessionId, hou.Parm, str) tuples to the index, keeping only
+		those referencing existing files
+		"""
+		existing = self.filterExisting(set(val for sessionId, parm, val in values))
+		added = defaultdict(list)
+
+		for sessionId, parm, val in values:
+			if val in existing:
+				added[val].append(parm)
+				self._nodeReferences.setdefault(sessionId, []).append((parm, val))
+
+		for val, parms in added.items():
+			self._references[val] = self._references.get(val, []) + parms
+
+	def build(self):
+		"""(Re)builds the index by traversing the scene
+
+		Returns:
+			FileReferenceIndex: This index, for convenience
+		"""
+		nodes = self._getRoot().allSubChildren()
+		self._fileParms = {}
+
+		for node in nodes:
+			self._setFileParms(node)
+
+		self._dirty = False
+
+		if self._watching:
+			self._watchNodes([self._getRoot()] + nodes)
+
+		return self.refresh()
+
+	def refresh(self):
+		"""Evaluates every file parameter found when the index was built again, and checks
+		which of the files they reference exist. Unlike build, the scene is not traversed
+		and no templates are checked. A watched index already evaluates the nodes whose
+		parameters changed, so this is only needed to pick up what changes without a
+		parameter event: paths driven by expressions or variables ($F, $HIP, etc.), and
+		files being written or deleted
+
+		Returns:
+			FileReferenceIndex: This index, for convenience
+		"""
+		values = self._evaluate(list(self._fileParms))
+		self._references = {}
+		self._nodeReferences = {}
+		self._dirtyNodes = set()
+		self._stale = False
+
+		self._add(values)
+
+		logger.debug('Indexed {} file reference(s) to {} file(s)'.format(len(values), len(self._references)))
+
+		return self
+
+	def _refreshDirtyNodes(self):
+		"""Evaluates only the nodes whose parameters changed since the last query
+		"""
+		dirty = self._dirtyNodes
+		self._dirtyNodes = set()
+
+		for sessionId in dirty:
+			self._removeReferences(sessionId)
+
+		self._add(self._evaluate(dirty))
+
+	def update(self, node):
+		"""Finds the file parameters of a single node again, i.e. after its spare parameters
+		have changed. Its references are evaluated on the next query
+
+		Args:
+			node (hou.Node): The node to update the file parameters of
+		"""
+		self._remove([node])
+		self._setFileParms(node)
+		self._dirtyNodes.add(node.sessionId())
+
+	def watch(self):
+		"""Builds the index and keeps it up to date from then on: node event callbacks
+		index (or drop) nodes as they are created (or deleted), find the file parameters
+		of nodes whose spare parameters change, and mark nodes whose parameters change to
+		be evaluated again on the next query, so a query only costs as much as what
+		changed since the last one. Loading, merging or clearing the scene marks the index
+		to be rebuilt the next time it is queried, and saving it marks every reference to
+		be evaluated again against the new $HIP. See refresh for changes that don't send
+		an event.
+
+		Returns:
+			FileReferenceIndex: This index, for convenience
+		"""
+		if not self._watching:
+			self._watching = True
+
+			hou.hipFile.addEventCallback(self._onHipFileEvent)
+			self.build()
+
+		return self
+
+	def unwatch(self):
+		"""Stops keeping the index up to date, removing all of its event callbacks
+		"""
+		if not self._watching:
+			return
+
+		self._watching = False
+
+		try:
+			hou.hipFile.removeEventCallback(self._onHipFileEvent)
+		except hou.OperationFailed:
+			pass
+
+		self._unwatchNodes()
+
+	def isWatching(self):
+		return self._watching
+
+	def _watchNodes(self, nodes):
+		for node in nodes:
+			if node.sessionId() in self._watchedNodes:
+				continue
+
+			node.addEventCallback(self.NODE_EVENTS, self._onNodeEvent)
+			self._watchedNodes[node.sessionId()] = node
+
+	def _unwatchNodes(self):
+		for node in self._watchedNodes.values():
+			try:
+				node.removeEventCallback(self.NODE_EVENTS, self._onNodeEvent)
+			except (hou.OperationFailed, hou.ObjectWasDeleted):
+				pass
+
+		self._watchedNodes = {}
+
+	def _onNodeEvent(self, **kwargs):
+		if self._dirty or hou.hipFile.isLoadingHipFile(): # Rebuilt once the scene has loaded
+			return
+
+		eventType = kwargs['event_type']
+		node = kwargs['node']
+
+		if eventType == hou.nodeEventType.ParmTupleChanged:
+			if node.sessionId() in self._fileParms:
+				self._dirtyNodes.add(node.sessionId())
+		elif eventType == hou.nodeEventType.SpareParmTemplatesChanged:
+			self.update(node)
+		elif eventType == hou.nodeEventType.ChildCreated:
+			child = kwargs['child_node']
+			nodes = [child] + list(child.allSubChildren())
+
+			self._watchNodes(nodes)
+
+			for n in nodes:
+				self.update(n)
+		elif eventType == hou.nodeEventType.BeingDeleted:
+			nodes = [node] + list(node.allSubChildren())
+
+			self._remove(nodes)
+
+			for n in nodes:
+				self._watchedNodes.pop(n.sessionId(), None)
+
+	def _onHipFileEvent(self, eventType):
+		if eventType in (hou.hipFileEventType.AfterLoad, hou.hipFileEventType.AfterMerge, hou.hipFileEventType.AfterClear):
+			logger.debug('Scene changed, file reference index will be rebuilt')
+
+			self._dirty = True
+			self._fileParms = {}
+			self._references = {}
+			self._nodeReferences = {}
+			self._dirtyNodes = set()
+			self._unwatchNodes()
+		elif eventType == hou.hipFileEventType.AfterSave: # $HIP may have changed with Save As
+			self._stale = True
+
+	def _ensureCurrent(self):
+		if self._dirty:
+			self.build()
+		elif self._stale:
+			self.refresh()
+		elif self._dirtyNodes:
+			self._refreshDirtyNodes()
+
+	def filterExisting(self, paths):
+		"""Gets the subset of the given paths that are existing files (and under $HIP,
+		if this index is limited to it). Paths are grouped by directory, and directories
+		with many referenced files are listed once instead of checking each file
+
+		Args:
+			paths (iterable): The file paths to check
+
+		Returns:
+			set: The paths that exist
+		"""
+		hip = hou.getenv('HIP') if self._hipOnly else None
+		byDir = defaultdict(list)
+		existing = set()
+
+		for path in paths:
+			if hip is None or isDescendant(path, root=hip):
+				byDir[os.path.dirname(path)].append(path)
+
+		for dir, dirPaths in byDir.items():
+			if len(dirPaths) < self.LIST_DIR_THRESHOLD:
+				existing.update(p for p in dirPaths if os.path.isfile(p))
+				continue
+
+			try:
+				names = set(listDirectory(dir, filesOnly=True))
+			except (IOError, OSError):
+				continue
+
+			existing.update(p for p in dirPaths if os.path.basename(p) in names)
+
+		return existing
+
+	def getReferences(self):
+		"""Gets the parameters referencing each file. For a watched index, the file
+		parameters of the nodes that changed since the last query are evaluated first
+
+		Returns:
+			dict: Maps each referenced file path to the list of hou.Parm that reference it
+		"""
+		self._ensureCurrent()
+
+		return self._references
+
+	def getPaths(self):
+		return list(self.getReferences())
+
+	def getParms(self, path):
+		"""Gets the parameters referencing the given file
+
+		Args:
+			path (str): The referenced file path
+
+		Returns:
+			list: The hou.Parm referencing the file
+		"""
+		self._ensureCurrent()
+
+		return self._references.get(path, [])
+
+	def iterReferences(self):
+		"""Iterates over every parameter and the file it references
+
+		Returns:
+			generator: A (hou.Parm, str) tuple for each referencing parameter
+		"""
+		for path, parms in self.getReferences().items():
+			for parm in parms:
+				yield (parm, path)
+
+_liveIndex = None
+
+def getLiveReferenceIndex():
+	"""Gets the index of the whole scene that is kept up to date as the scene changes.
+	It is built on first use, after which queries only evaluate the file parameters of the
+	nodes that changed since the last query
+
+	Returns:
+		FileReferenceIndex: The live index
+	"""
+	global _liveIndex
+
+	if _liveIndex is None:
+		_liveIndex = FileReferenceIndex().watch()
+
+	return _liveIndex
@@ -0,0 +1,456 @@
+"""Collection and history of per-frame render/cache statistics of ROPs, i.e. to find which
+frames (or wedges) are blowing their cache budgets
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, json, time, hashlib, logging
+
+import hou
+
+from sdm.utils import getCacheDir, getCurrentMemory, getPeakMemory, writeFileAtomic
+from sdm.files.fileclassification import FrameSet
+from sdm.houdini.node import getRopNode
+from sdm.houdini.execution import getRopFrameSet, getRopOutputParm, getRopOutputSizes
+
+logger = logging.getLogger(__name__)
+
+def getCpuTime():
+	"""Gets the CPU time used by this process and its finished child processes (i.e. Mantra)
+
+	Returns:
+		float: The user and system CPU seconds
+	"""
+	times = os.times()
+
+	return times[0] + times[1] + times[2] + times[3]
+
+class RunProfile(object):
+	"""The statistics of one execution of a ROP: its totals, and the time, CPU time, output
+	size and memory of each frame. Per-frame values are stored as columns, so that long
+	histories stay compact on disk.
+
+	The peak memory of a run is that of the whole process, which includes everything done in
+	the session before the run. Per frame, two values are kept instead: 'memory' is the
+	resident memory sampled as the frame finished, and 'peakIncrease' is how much the frame
+	raised the process's peak, so only the frames that set a new high are non-zero
+	"""
+	COMPLETE = 'complete'
+	FAILED = 'failed'
+
+	COLUMNS = ('frame', 'seconds', 'cpu', 'bytes', 'memory', 'peakIncrease')
+
+	def __init__(self, data=None):
+		"""
+		Args:
+			data (dict, optional): The run as returned by toDict(), i.e. from a TelemetryStore
+		"""
+		data = data or {}
+
+		self._start = data.get('start', time.time())
+		self._duration = data.get('duration')
+		self._cpu = data.get('cpu')
+		self._peakMemory = data.get('peakMemory')
+		self._status = data.get('status')
+		columns = data.get('frames', {})
+		self._frames = dict((f, dict((c, columns[c][i]) for c in RunProfile.COLUMNS if c in columns)) for i, f in enumerate(columns.get('frame', [])))
+
+	def addFrame(self, frame, seconds=None, cpu=None, bytes=None, memory=None, peakIncrease=None):
+		self._frames[frame] = {'frame':frame, 'seconds':seconds, 'cpu':cpu, 'bytes':bytes, 'memory':memory, 'peakIncrease':peakIncrease}
+
+	def setFrameValue(self, frame, column, value):
+		self._frames.setdefault(frame, {'frame':frame})[column] = value
+
+	def finish(self, duration, cpu, peakMemory, status=COMPLETE):
+		self._duration = duration
+		self._cpu = cpu
+		self._peakMemory = peakMemory
+		self._status = status
+
+	def getStart(self):
+		return self._start
+
+	def getDuration(self):
+		return self._duration
+
+	def getCpuTime(self):
+		return self._cpu
+
+	def getPeakMemory(self):
+		return self._peakMemory
+
+	def getStatus(self):
+		return self._status
+
+	def isComplete(self):
+		return self._status == RunProfile.COMPLETE
+
+	def getFrames(self):
+		return FrameSet.fromFrames(self._frames)
+
+	def getFrameValues(self, column):
+		"""Gets the given value of each frame it is known for
+
+		Args:
+			column (str): One of COLUMNS, i.e. 'seconds'
+
+		Returns:
+			dict: Maps each frame to its value
+		"""
+		return dict((f, values[column]) for f, values in self._frames.items() if values.get(column) is not None)
+
+	def getFrameTimes(self):
+		return self.getFrameValues('seconds')
+
+	def getOutputBytes(self):
+		return sum(self.getFrameValues('bytes').values())
+
+	def toDict(self):
+		frames = sorted(self._frames)
+		columns = {}
+
+		for column in RunProfile.COLUMNS:
+			values = [self._frames[f].get(column) for f in frames]
+
+			if any(v is not None for v in values):
+				columns[column] = [round(v, 3) if isinstance(v, float) else v for v in values]
+
+		return {
+			'start': self._start,
+			'duration': self._duration,
+			'cpu': self._cpu,
+			'peakMemory': self._peakMemory,
+			'status': self._status,
+			'frames': columns
+		}
+
+class RopTelemetry(object):
+	"""Collects a RunProfile while a ROP executes.
+
+	Where ROPs support render event callbacks, the time, CPU time and memory of each frame
+	(see RunProfile) are recorded as it finishes. Otherwise frame times are derived from the
+	modification times of the output files once the ROP has finished. The output size of
+	each frame is always read from disk at the end, which costs a single stat per frame.
+	"""
+
+	def __init__(self, node, history=None):
+		"""
+		Args:
+			node (hou.Node): The ROP node, or a node containing one such as a File Cache SOP
+			history (TelemetryStore, optional): The history to project remaining time from
+				as frames finish
+		"""
+		self._node = node
+		self._rop = getRopNode(node) or node
+		self._history = history
+		self._profile = RunProfile()
+		self._frames = None
+		self._startTime = None
+		self._startCpu = None
+		self._frameStart = None
+		self._frameCpu = None
+		self._framePeak = None
+		self._hasFrameEvents = False
+
+	def getProfile(self):
+		return self._profile
+
+	def getFrames(self):
+		return self._frames
+
+	def start(self):
+		try:
+			self._frames = getRopFrameSet(self._rop)
+		except Exception: # ROPs without the usual frame range parameters
+			self._frames = FrameSet()
+
+		self._startTime = self._frameStart = time.time()
+		self._startCpu = self._frameCpu = getCpuTime()
+		self._framePeak = getPeakMemory()
+
+		if hasattr(self._rop, 'addRenderEventCallback'):
+			self._rop.addRenderEventCallback(self._onRenderEvent)
+			self._hasFrameEvents = True
+
+	def _onRenderEvent(self, rop, eventType, eventTime):
+		if eventType == hou.ropRenderEventType.PreFrame:
+			self._frameStart = time.time()
+			self._frameCpu = getCpuTime()
+			self._framePeak = getPeakMemory()
+		elif eventType == hou.ropRenderEventType.PostFrame:
+			frame = int(round(hou.timeToFrame(eventTime)))
+			seconds = time.time() - self._frameStart
+			peak = getPeakMemory()
+			peakIncrease = peak - self._framePeak if peak is not None and self._framePeak is not None else None
+
+			self._profile.addFrame(frame, seconds=seconds, cpu=getCpuTime() - self._frameCpu, memory=getCurrentMemory(), peakIncrease=peakIncrease)
+
+			if self._history is not None:
+				times = self._profile.getFrameTimes()
+				remaining = self._history.projectRemainingTime(self._frames.difference(FrameSet.fromFrames(times)), times)
+
+				logger.info('Frame {} took {:.2f}s, about {:.0f}s remaining'.format(frame, seconds, remaining))
+
+	def finish(self, status=RunProfile.COMPLETE):
+		"""Stops collecting, reading the output sizes (and times, if they were not recorded)
+		of the frames
+
+		Args:
+			status (str, optional): The status of the run, RunProfile.COMPLETE by default
+
+		Returns:
+			RunProfile: The collected profile
+		"""
+		if self._hasFrameEvents:
+			try:
+				self._rop.removeRenderEventCallback(self._onRenderEvent)
+			except hou.OperationFailed:
+				pass
+
+		frames = self._frames if self._frames else self._profile.getFrames()
+
+		for frame, size in getRopOutputSizes(self._rop, frames).items():
+			self._profile.setFrameValue(frame, 'bytes', size)
+
+		if not self._hasFrameEvents:
+			self._deriveFrameTimes(frames)
+
+		self._profile.finish(time.time() - self._startTime, getCpuTime() - self._startCpu, getPeakMemory(), status)
+
+		return self._profile
+
+	def _deriveFrameTimes(self, frames):
+		"""Estimates each frame's time as the time between its output file being written and
+		that of the frame before it
+		"""
+		parm = getRopOutputParm(self._rop)
+
+		if parm is None:
+			return
+
+		written = []
+
+		for frame in frames:
+			try:
+				mtime = os.path.getmtime(parm.evalAtFrame(frame))
+			except (IOError, OSError):
+				continue
+
+			if mtime >= self._startTime:
+				written.append((mtime, frame))
+
+		previous = self._startTime
+
+		for mtime, frame in sorted(written):
+			self._profile.setFrameValue(frame, 'seconds', mtime - previous)
+			previous = mtime
+
+class TelemetryStore(object):
+	"""The history of the RunProfiles of a ROP, kept as one small JSON file per ROP (and hip
+	file) in the telemetry cache directory, holding the most recent runs
+	"""
+
+	def __init__(self, node, path=None, maxRuns=20):
+		"""
+		Args:
+			node (hou.Node): The ROP node to keep the history of
+			path (str, optional): The file to keep the history in. By default, a file named
+				after the hip file and node path in the telemetry cache directory
+			maxRuns (int, optional): The number of runs to keep
+		"""
+		self._key = '{}:{}'.format(hou.hipFile.path(), node.path())
+		self._path = path or getCacheDir('telemetry', hashlib.sha1(self._key.encode('utf-8')).hexdigest()[:16] + '.json')
+		self._maxRuns = maxRuns
+		self._runs = None
+
+	def getPath(self):
+		return self._path
+
+	def getRuns(self):
+		"""Gets the recorded runs, oldest first
+
+		Returns:
+			list: The RunProfile of each run
+		"""
+		if self._runs is None:
+			self._runs = []
+
+			try:
+				with open(self._path, 'r') as f:
+					data = json.load(f)
+
+				self._runs = [RunProfile(run) for run in data.get('runs', [])]
+			except (IOError, OSError, ValueError):
+				pass
+
+		return self._runs
+
+	def addRun(self, profile):
+		"""Records the given run, dropping the oldest ones beyond maxRuns
+
+		Args:
+			profile (RunProfile): The run to record
+		"""
+		runs = (self.getRuns() + [profile])[-self._maxRuns:]
+		self._runs = runs
+
+		try:
+			writeFileAtomic(self._path, json.dumps({'rop':self._key, 'runs':[run.toDict() for run in runs]}, separators=(',', ':')))
+		except (IOError, OSError):
+			logger.warning('Could not save telemetry to {}'.format(self._path), exc_info=True)
+
+	def getLastRun(self, before=None):
+		"""Gets the most recent complete run
+
+		Args:
+			before (RunProfile, optional): Only consider runs recorded before this one
+
+		Returns:
+			RunProfile: The run, or None if there is none
+		"""
+		runs = self.getRuns()
+
+		if before is not None and before in runs:
+			runs = runs[:runs.index(before)]
+
+		for run in reversed(runs):
+			if run.isComplete():
+				return run
+
+		return None
+
+	def getSlowestFrames(self, count=10, run=None):
+		"""Gets the slowest frames of a run
+
+		Args:
+			count (int, optional): The number of frames to get
+			run (RunProfile, optional): The run to get the frames of. By default, the most
+				recent complete run
+
+		Returns:
+			list: The (frame, seconds) tuples of the slowest frames, slowest first
+		"""
+		run = run or self.getLastRun()
+
+		if run is None:
+			return []
+
+		return sorted(run.getFrameTimes().items(), key=lambda item: (-item[1], item[0]))[:count]
+
+	def getRegression(self, run=None, threshold=1.25):
+		"""Compares a run to the complete run before it
+
+		Args:
+			run (RunProfile, optional): The run to compare. By default, the most recent
+				complete run
+			threshold (float, optional): The ratio to the previous time above which a frame
+				counts as slower
+
+		Returns:
+			dict: The 'duration' ratio of the frames both runs have times for (above 1 means
+				slower), and the 'frames' that are slower than the threshold, as
+				(frame, seconds, previous seconds) tuples, slowest relative to before first.
+				None if there is no run to compare to
+		"""
+		run = run or self.getLastRun()
+		previous = self.getLastRun(before=run) if run is not None else None
+
+		if previous is None:
+			return None
+
+		times = run.getFrameTimes()
+		previousTimes = previous.getFrameTimes()
+		common = [f for f in times if f in previousTimes]
+		total = sum(times[f] for f in common)
+		previousTotal = sum(previousTimes[f] for f in common)
+
+		if not common or previousTotal <= 0:
+			ratio = run.getDuration() / previous.getDuration() if previous.getDuration() else None
+
+			return {'duration':ratio, 'frames':[]}
+
+		slower = [(f, times[f], previousTimes[f]) for f in common if times[f] > previousTimes[f] * threshold]
+		slower.sort(key=lambda item: -item[1] / max(item[2], 1e-6))
+
+		return {'duration':total / previousTotal, 'frames':slower}
+
+	def projectRemainingTime(self, remaining, times):
+		"""Projects how long the given remaining frames of a run will take, from the times of
+		the same frames in the last complete run, scaled by how the frames done so far compare
+		to that run. Without a previous run, the average time of the frames done so far is used
+
+		Args:
+			remaining (iterable): The frames still to be output
+			times (dict): Maps each frame output so far to its seconds
+
+		Returns:
+			float: The projected number of seconds, 0 if there is nothing to project from
+		"""
+		remaining = list(remaining)
+		last = self.getLastRun()
+		lastTimes = last.getFrameTimes() if last is not None else {}
+		average = sum(times.values()) / len(times) if times else 0.0
+
+		if not lastTimes:
+			return average * len(remaining)
+
+		common = [f for f in times if f in lastTimes]
+		lastTotal = sum(lastTimes[f] for f in common)
+		scale = sum(times[f] for f in common) / lastTotal if lastTotal > 0 else 1.0
+		lastAverage = sum(lastTimes.values()) / len(lastTimes)
+
+		return sum(lastTimes.get(f, lastAverage) for f in remaining) * scale
+
+def executeRop(node, callback, kwargs=None):
+	"""Runs a ROP's original execute callback, collecting telemetry into the ROP's
+	TelemetryStore while it runs and notifying the user once it has finished, if the node's
+	'notify' parameter is on. This wraps the execute button added by
+	sdm.houdini.properties.initRopNotificationProperty
+
+	Args:
+		node (hou.Node): The node the callback belongs to
+		callback (str): The Python source of the original callback
+		kwargs (dict, optional): The kwargs of the button press, available to the callback
+
+	Returns:
+		RunProfile: The collected profile
+	"""
+	from sdm.houdini.notifications import NotificationType, notifyRop
+
+	store = TelemetryStore(node)
+	telemetry = RopTelemetry(node, history=store)
+	notifyParm = node.parm('notify')
+	notify = notifyParm is not None and notifyParm.eval()
+
+	telemetry.start()
+
+	try:
+		exec(callback, {'hou':hou, 'kwargs':kwargs or {}})
+	except Exception:
+		profile = telemetry.finish(RunProfile.FAILED)
+		store.addRun(profile)
+
+		if notify:
+			notifyRop(node, profile.getDuration(), type=NotificationType.ROP_FAILED, frames=profile.getFrames(), outputBytes=profile.getOutputBytes())
+
+		raise
+
+	profile = telemetry.finish()
+	store.addRun(profile)
+
+	if notify:
+		data = {}
+		slowest = store.getSlowestFrames(1, run=profile)
+		regression = store.getRegression(run=profile)
+
+		if slowest:
+			data['SlowestFrame'] = '{} ({:.2f}s)'.format(*slowest[0])
+
+		if regression and regression['duration']:
+			data['ComparedToLastRun'] = '{:+.0f}%'.format((regression['duration'] - 1) * 100)
+
+		notifyRop(node, profile.getDuration(), frames=telemetry.getFrames(), outputBytes=profile.getOutputBytes(), data=data)
+
+	return profile
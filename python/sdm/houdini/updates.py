@@ -0,0 +1,191 @@
+"""Checking for new releases of SDMTools in the background, so that slow or offline machines
+don't freeze the UI while the releases are fetched.
+
+Responses are kept in an on-disk cache: within its maximum age the cached releases are used
+without a request, after which a conditional request (If-None-Match/If-Modified-Since) only
+downloads the releases again if they have changed.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import json, time, logging, threading
+
+try:
+	from urllib.request import Request, urlopen
+	from urllib.error import HTTPError
+except ImportError: # Python 2
+	from urllib2 import Request, urlopen, HTTPError
+
+from sdm.utils import getCacheDir, writeFileAtomic
+from sdm.houdini.fileutils import SettingsFile, getLargerVersions
+
+logger = logging.getLogger(__name__)
+
+RELEASES_URL = 'https://api.github.com/repos/sashaouellet/SDMTools/releases'
+DEFAULT_MAX_AGE = 6 * 60 * 60
+
+def getReleasesCachePath():
+	return getCacheDir('updates', 'releases.json')
+
+def _loadCache(path, url):
+	try:
+		with open(path, 'r') as f:
+			entry = json.load(f)
+	except (IOError, OSError, ValueError):
+		return None
+
+	return entry if entry.get('url') == url else None
+
+def _saveCache(path, entry):
+	try:
+		writeFileAtomic(path, json.dumps(entry))
+	except (IOError, OSError):
+		logger.warning('Could not save releases cache to {}'.format(path), exc_info=True)
+
+def fetchReleases(url=RELEASES_URL, maxAge=DEFAULT_MAX_AGE, cachePath=None, timeout=10):
+	"""Gets the releases of SDMTools, from the cache if it is recent enough, otherwise by
+	asking the server whether they have changed since they were cached. If the server
+	can't be reached, cached releases are used regardless of their age
+
+	Args:
+		url (str, optional): The releases endpoint of the GitHub API
+		maxAge (float, optional): The number of seconds cached releases are used for without
+			checking with the server. 0 to always check
+		cachePath (str, optional): The cache file. By default, releases.json in the updates
+			cache directory
+		timeout (float, optional): The number of seconds to wait on the server
+
+	Returns:
+		list: The releases, as JSON objects from the GitHub API
+
+	Raises:
+		IOError: If the releases could not be retrieved, and none are cached
+		ValueError: If the server did not respond with JSON
+	"""
+	cachePath = cachePath or getReleasesCachePath()
+	entry = _loadCache(cachePath, url)
+
+	if entry is not None and time.time() - entry['fetched'] < maxAge:
+		logger.debug('Using cached releases')
+		return entry['releases']
+
+	headers = {'User-Agent':'SDMTools', 'Accept':'application/json'}
+
+	if entry is not None:
+		if entry.get('etag'):
+			headers['If-None-Match'] = entry['etag']
+
+		if entry.get('lastModified'):
+			headers['If-Modified-Since'] = entry['lastModified']
+
+	try:
+		logger.info('Retrieving all releases')
+		response = urlopen(Request(url, headers=headers), timeout=timeout)
+
+		try:
+			releases = json.loads(response.read().decode('utf-8'))
+			info = response.info()
+		finally:
+			response.close()
+	except HTTPError as e:
+		if e.code != 304 or entry is None:
+			raise
+
+		logger.debug('Releases have not changed')
+		entry['fetched'] = time.time()
+		_saveCache(cachePath, entry)
+
+		return entry['releases']
+	except IOError:
+		if entry is None:
+			raise
+
+		logger.warning('Could not retrieve releases, using cached ones', exc_info=True)
+
+		return entry['releases']
+
+	_saveCache(cachePath, {
+		'url': url,
+		'etag': info.get('ETag'),
+		'lastModified': info.get('Last-Modified'),
+		'fetched': time.time(),
+		'releases': releases
+	})
+
+	return releases
+
+def runOnMainThread(function, *args, **kwargs):
+	"""Calls the given function from Houdini's main thread (where the UI can be used) once it
+	is idle, or right away outside of a graphical session
+
+	Args:
+		function (callable): The function to call
+		*args: Passed on to the function
+		**kwargs: Passed on to the function
+	"""
+	try:
+		import hdefereval
+	except ImportError: # hython
+		function(*args, **kwargs)
+		return
+
+	hdefereval.executeDeferred(lambda: function(*args, **kwargs))
+
+def _showMessage(message, error=False):
+	import hou
+
+	if error:
+		hou.ui.displayMessage(message, title='SDMTools Updates', severity=hou.severityType.Error)
+	else:
+		hou.ui.displayMessage(message, title='SDMTools Updates')
+
+def checkForUpdatesInBackground(onNewVersions, silent=True, currentVersion=None, maxAge=None, url=RELEASES_URL):
+	"""Checks for releases newer than the installed version from a background thread. Only if
+	there are any is onNewVersions called, from the main thread
+
+	Args:
+		onNewVersions (callable): Called with the list of newer releases and the list of all
+			releases, i.e. sdm.houdini.dialog.promptForUpdates
+		silent (bool, optional): Whether to not tell the user when there are no new versions or
+			when the check failed. When False (i.e. a check requested by the user), the cache's
+			maximum age is also ignored by default
+		currentVersion (str, optional): The installed version. By default, from the settings
+		maxAge (float, optional): The number of seconds cached releases are used for, see
+			fetchReleases. By default, the updateCheckMaxAge setting (or 6 hours) when silent
+		url (str, optional): The releases endpoint of the GitHub API
+
+	Returns:
+		threading.Thread: The thread running the check
+	"""
+	settings = SettingsFile()
+	currentVersion = currentVersion or settings.get('version', 'v1.0.0')
+
+	if maxAge is None:
+		maxAge = settings.get('updateCheckMaxAge', DEFAULT_MAX_AGE) if silent else 0
+
+	def check():
+		try:
+			releases = fetchReleases(url, maxAge=maxAge)
+			newVersions = getLargerVersions(currentVersion, releases)
+		except (IOError, OSError, ValueError, KeyError) as e:
+			logger.warning('Error in retrieval', exc_info=True)
+
+			if not silent:
+				runOnMainThread(_showMessage, 'Error when retrieving new versions: {}'.format(e), error=True)
+
+			return
+
+		logger.debug('Newer versions found: {}'.format([v.get('tag_name') for v in newVersions]))
+
+		if newVersions:
+			runOnMainThread(onNewVersions, newVersions, releases)
+		elif not silent:
+			runOnMainThread(_showMessage, 'No updates available')
+
+	thread = threading.Thread(target=check, name='SDMToolsUpdateCheck')
+	thread.daemon = True
+	thread.start()
+
+	return thread
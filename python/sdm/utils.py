@@ -5,7 +5,21 @@ __version__ = 1.0.0
 __date__ = 11/30/17
 """
 
-import re
+import os, re, sys, stat, time, errno, shutil, importlib
+from tempfile import mkstemp
+
+try:
+	import resource
+except ImportError: # Windows
+	resource = None
+
+try:
+	from os import scandir
+except ImportError: # Python 2, try for the backport
+	try:
+		from scandir import scandir
+	except ImportError:
+		scandir = None
 
 def splitByCamelCase(word):
 	"""Splits the input word by camel case
@@ -49,4 +63,337 @@ def convertToCamelCase(input, firstIsLowercase=False):
 		else:
 			words[i] = words[i].title()
 
-	return ''.join(words)
\ No newline at end of file
+	return ''.join(words)
+
+def listDirectory(dir, filesOnly=False):
+	"""Lists the names of all entries in the given directory. When available,
+	os.scandir (or the scandir backport) is used so that the names are streamed
+	from the directory handle rather than being built into a list up front
+
+	Args:
+		dir (str): The directory to list
+		filesOnly (bool, optional): Whether to only list regular files. With scandir,
+			this usually costs no extra system calls. False by default
+
+	Returns:
+		generator: The name of each entry in the directory
+	"""
+	if scandir is None:
+		for name in os.listdir(dir):
+			if not filesOnly or os.path.isfile(os.path.join(dir, name)):
+				yield name
+
+		return
+
+	for entry in scandir(dir):
+		if not filesOnly or entry.is_file():
+			yield entry.name
+
+def getCacheDir(*parts):
+	"""Gets the directory used for SDMTools' local, per-user caches. This is
+	$SDM_CACHE_DIR if set, otherwise ~/.sdm/cache
+
+	Args:
+		*parts (str): Optional path components to join onto the cache directory
+
+	Returns:
+		str: The cache directory path (not guaranteed to exist yet)
+	"""
+	cacheDir = os.environ.get('SDM_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.sdm', 'cache')
+
+	return os.path.join(cacheDir, *parts)
+
+def getUmask():
+	"""Gets the file mode creation mask of the current process. Where it can't be read from
+	/proc (i.e. before Linux 4.7, or on other platforms), it has to be set to be read, which
+	briefly affects files created by other threads
+
+	Returns:
+		int: The umask
+	"""
+	try:
+		with open('/proc/self/status', 'r') as f:
+			for line in f:
+				if line.startswith('Umask:'):
+					return int(line.split()[1], 8)
+	except (IOError, OSError, ValueError):
+		pass
+
+	umask = os.umask(0o022)
+	os.umask(umask)
+
+	return umask
+
+def writeFileAtomic(path, content, mode='w'):
+	"""Writes the given content to path by first writing it to a temporary
+	file in the same directory, then renaming that over the destination. Readers
+	will only ever see the old or the new file, never a partially written one
+
+	The new file keeps the permissions of the file it replaces, or gets the default
+	permissions of a new file (as limited by the umask), rather than the owner-only
+	permissions of the temporary file, so shared files stay shared
+
+	Args:
+		path (str): The file path to write to
+		content (str): The content to write
+		mode (str, optional): The mode to open the temporary file with, 'w' by default.
+			Use 'wb' for binary content
+	"""
+	dir = os.path.dirname(os.path.abspath(path))
+
+	if not os.path.exists(dir):
+		os.makedirs(dir)
+
+	try:
+		permissions = stat.S_IMODE(os.stat(path).st_mode)
+	except OSError: # New file
+		permissions = 0o666 & ~getUmask()
+
+	fd, tmp = mkstemp(dir=dir, prefix='.{}.'.format(os.path.basename(path)), suffix='.tmp')
+
+	try:
+		with os.fdopen(fd, mode) as f:
+			f.write(content)
+
+		os.chmod(tmp, permissions)
+		replaceFile(tmp, path)
+	except:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+		raise
+
+def replaceFile(source, target):
+	"""Renames source over target, replacing target if it exists. This is atomic
+	on POSIX systems; on Windows under Python 2 the target has to be removed first
+
+	Args:
+		source (str): The path to rename
+		target (str): The path to replace
+	"""
+	if hasattr(os, 'replace'):
+		os.replace(source, target)
+		return
+
+	if os.name == 'nt' and os.path.exists(target):
+		os.remove(target)
+
+	os.rename(source, target)
+
+def copyFileAtomic(source, target):
+	"""Copies source to target through a temporary file in the target's directory,
+	so target is never seen partially copied
+
+	Args:
+		source (str): The path of the file to copy
+		target (str): The path to copy it to
+	"""
+	dir = os.path.dirname(os.path.abspath(target))
+
+	if not os.path.exists(dir):
+		os.makedirs(dir)
+
+	fd, tmp = mkstemp(dir=dir, prefix='.{}.'.format(os.path.basename(target)), suffix='.tmp')
+	os.close(fd)
+
+	try:
+		shutil.copyfile(source, tmp)
+		replaceFile(tmp, target)
+	except:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+		raise
+
+def linkFileAtomic(source, target):
+	"""Hard-links source to target through a temporary name in the target's directory,
+	so target is never seen partially written. Falls back to copyFileAtomic where a hard
+	link can't be made (i.e. across file systems, or on platforms without them)
+
+	Note that target shares its contents with source afterwards, so neither should be
+	written to in place
+
+	Args:
+		source (str): The path of the file to link
+		target (str): The path to link it to
+	"""
+	if os.path.exists(target) and os.path.samefile(source, target): # Renaming over it would do nothing
+		return
+
+	dir = os.path.dirname(os.path.abspath(target))
+
+	if not os.path.exists(dir):
+		os.makedirs(dir)
+
+	fd, tmp = mkstemp(dir=dir, prefix='.{}.'.format(os.path.basename(target)), suffix='.tmp')
+	os.close(fd)
+	os.remove(tmp)
+
+	try:
+		os.link(source, tmp)
+	except (AttributeError, OSError): # No hard links on this platform or file system
+		copyFileAtomic(source, target)
+		return
+
+	try:
+		replaceFile(tmp, target)
+	except:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+		raise
+
+def getPeakMemory():
+	"""Gets the peak resident memory of the current process so far
+
+	Returns:
+		int: The peak resident set size in bytes, or None where it is not available
+			(i.e. on Windows)
+	"""
+	if resource is None:
+		return None
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	# Reported in kilobytes on Linux, but in bytes on macOS
+	return peak if sys.platform == 'darwin' else peak * 1024
+
+def getCurrentMemory():
+	"""Gets the resident memory of the current process right now, unlike getPeakMemory which
+	only ever grows
+
+	Returns:
+		int: The resident set size in bytes, or None where it is not available (only Linux
+			is supported)
+	"""
+	try:
+		with open('/proc/self/statm', 'r') as f:
+			pages = int(f.read().split()[1])
+	except (IOError, OSError, ValueError, IndexError):
+		return None
+
+	return pages * os.sysconf('SC_PAGE_SIZE')
+
+def formatBytes(size):
+	"""Formats the given number of bytes for display
+
+	1536 --> '1.5 KB'
+
+	Args:
+		size (int): The number of bytes
+
+	Returns:
+		str: The size, in the largest unit it is at least one of
+	"""
+	for unit in ('B', 'KB', 'MB', 'GB'):
+		if abs(size) < 1024:
+			break
+
+		size /= 1024.0
+	else:
+		unit = 'TB'
+
+	return '{} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+
+class FileLock(object):
+	"""A lock shared between processes (i.e. several Houdini sessions), held by creating a
+	lock file exclusively. Lock files older than staleSeconds are assumed to be left over
+	from a crashed process and are broken
+	"""
+
+	def __init__(self, path, timeout=10.0, staleSeconds=60.0, pollInterval=0.02):
+		"""
+		Args:
+			path (str): The lock file
+			timeout (float, optional): The number of seconds to wait for the lock
+			staleSeconds (float, optional): The age after which a lock file is broken
+			pollInterval (float, optional): The number of seconds between attempts
+		"""
+		self._path = path
+		self._timeout = timeout
+		self._staleSeconds = staleSeconds
+		self._pollInterval = pollInterval
+		self._locked = False
+
+	def acquire(self):
+		"""Waits for the lock and takes it
+
+		Raises:
+			IOError: If the lock could not be taken within the timeout
+		"""
+		start = time.time()
+
+		while True:
+			try:
+				fd = os.open(self._path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+			except OSError as e:
+				if e.errno != errno.EEXIST:
+					raise
+			else:
+				os.write(fd, str(os.getpid()).encode('utf-8'))
+				os.close(fd)
+				self._locked = True
+
+				return
+
+			try:
+				if time.time() - os.path.getmtime(self._path) > self._staleSeconds:
+					os.remove(self._path)
+					continue
+			except OSError: # Released in the meantime
+				continue
+
+			if time.time() - start > self._timeout:
+				raise IOError('Timed out waiting for lock: {}'.format(self._path))
+
+			time.sleep(self._pollInterval)
+
+	def release(self):
+		if self._locked:
+			self._locked = False
+
+			try:
+				os.remove(self._path)
+			except OSError:
+				pass
+
+	def __enter__(self):
+		self.acquire()
+
+		return self
+
+	def __exit__(self, *args):
+		self.release()
+
+class LazyModule(object):
+	"""A stand-in for a module that is only imported once one of its attributes is used,
+	to keep rarely needed (and slow to import) modules off of startup paths
+
+	urllib2 = LazyModule('urllib2') # Imported on the first call of urllib2.urlopen
+	"""
+
+	def __init__(self, name):
+		"""
+		Args:
+			name (str): The full name of the module, i.e. 'xml.etree.ElementTree'
+		"""
+		self.__dict__['_name'] = name
+		self.__dict__['_module'] = None
+
+	def _load(self):
+		if self._module is None:
+			self.__dict__['_module'] = importlib.import_module(self._name)
+
+		return self._module
+
+	def isLoaded(self):
+		return self._module is not None
+
+	def __getattr__(self, attr):
+		return getattr(self._load(), attr)
+
+	def __setattr__(self, attr, value):
+		setattr(self._load(), attr, value)
+
+	def __repr__(self):
+		return '<LazyModule {}{}>'.format(self._name, '' if self.isLoaded() else ' (not loaded)')
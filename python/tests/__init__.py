@@ -0,0 +1,21 @@
+"""Tests for SDMTools, runnable outside of Houdini:
+
+	cd python && python -m pytest tests
+	cd python && python -m unittest discover -s tests -t .
+
+The modules of sdm.houdini import hou, which is stood in for by tests/mockhou/hou.py.
+"""
+
+import os, sys, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mockhou'))
+
+import sdm.houdini
+
+# Logging would otherwise be configured on the first record, writing to the install's log folder
+_logger = logging.getLogger('sdm')
+
+for _handler in list(_logger.handlers):
+	_logger.removeHandler(_handler)
+
+_logger.addHandler(logging.NullHandler())
@@ -0,0 +1,366 @@
+"""Stand-in for the parts of the hou module used by sdm.houdini, so that its modules can be
+tested outside of Houdini. Scenes are built from Node and Parm directly, see reset().
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os
+
+_env = {}
+stats = {}
+
+class OperationFailed(Exception): pass
+class ObjectWasDeleted(Exception): pass
+class OperationInterrupted(Exception): pass
+
+class stringParmType(object):
+	Regular = 'Regular'
+	FileReference = 'FileReference'
+
+class nodeEventType(object):
+	ParmTupleChanged = 'ParmTupleChanged'
+	SpareParmTemplatesChanged = 'SpareParmTemplatesChanged'
+	ChildCreated = 'ChildCreated'
+	ChildDeleted = 'ChildDeleted'
+	BeingDeleted = 'BeingDeleted'
+
+class hipFileEventType(object):
+	BeforeClear = 'BeforeClear'
+	AfterClear = 'AfterClear'
+	BeforeLoad = 'BeforeLoad'
+	AfterLoad = 'AfterLoad'
+	AfterMerge = 'AfterMerge'
+	BeforeSave = 'BeforeSave'
+	AfterSave = 'AfterSave'
+
+class ropRenderEventType(object):
+	PreRender = 'PreRender'
+	PreFrame = 'PreFrame'
+	PostFrame = 'PostFrame'
+	PostRender = 'PostRender'
+
+class severityType(object):
+	Message = 'Message'
+	Warning = 'Warning'
+	Error = 'Error'
+
+def getenv(name, default=None):
+	return _env.get(name, default)
+
+def putenv(name, value):
+	_env[name] = value
+
+def expandString(value):
+	for name, var in sorted(_env.items(), key=lambda item: -len(item[0])):
+		value = value.replace('${}'.format(name), var)
+
+	return value
+
+def applicationVersionString():
+	return '16.5.0'
+
+def timeToFrame(time):
+	return time * 24.0 + 1
+
+class ParmTemplate(object):
+	def __init__(self, name):
+		self._name = name
+
+	def name(self):
+		return self._name
+
+class FloatParmTemplate(ParmTemplate): pass
+
+class StringParmTemplate(ParmTemplate):
+	def __init__(self, name, stringType=stringParmType.Regular):
+		ParmTemplate.__init__(self, name)
+		self._stringType = stringType
+
+	def stringType(self):
+		return self._stringType
+
+class Parm(object):
+	"""A parameter whose value is a constant, or a callable standing in for an expression"""
+
+	def __init__(self, node, template, value='', spare=False):
+		self._node = node
+		self._template = template
+		self._value = value
+		self._spare = spare
+
+	def name(self):
+		return self._template.name()
+
+	def node(self):
+		return self._node
+
+	def path(self):
+		return '{}/{}'.format(self._node.path(), self.name())
+
+	def isSpare(self):
+		return self._spare
+
+	def parmTemplate(self):
+		stats['parmTemplate'] = stats.get('parmTemplate', 0) + 1
+
+		return self._template
+
+	def eval(self):
+		return self._value() if callable(self._value) else self._value
+
+	def evalAsString(self):
+		stats['evalAsString'] = stats.get('evalAsString', 0) + 1
+
+		return expandString(str(self.eval()))
+
+	def unexpandedString(self):
+		return str(self._value)
+
+	def set(self, value):
+		self._value = value
+		self._node._fire(nodeEventType.ParmTupleChanged, parm_tuple=self)
+
+	def __repr__(self):
+		return '<hou.Parm {}>'.format(self.path())
+
+class NodeType(object):
+	def __init__(self, name, category='Sop'):
+		self._name = name
+		self._category = category
+
+	def name(self):
+		return self._name
+
+	def nameWithCategory(self):
+		return '{}/{}'.format(self._category, self._name)
+
+class Node(object):
+	_nextSessionId = 1
+
+	def __init__(self, name, parent=None, typeName='subnet', parms=()):
+		"""
+		Args:
+			parms (list, optional): The (hou.ParmTemplate, value) of the parameters the node
+				is created with, before the ChildCreated event is sent
+		"""
+		self._name = name
+		self._parent = parent
+		self._type = NodeType(typeName)
+		self._children = []
+		self._parms = []
+		self._callbacks = []
+		self._sessionId = Node._nextSessionId
+
+		Node._nextSessionId += 1
+
+		for template, value in parms:
+			self._parms.append(Parm(self, template, value))
+
+		if parent is not None:
+			parent._children.append(self)
+			parent._fire(nodeEventType.ChildCreated, child_node=self)
+
+	def sessionId(self):
+		return self._sessionId
+
+	def name(self):
+		return self._name
+
+	def path(self):
+		if self._parent is None:
+			return '/'
+
+		return '{}/{}'.format(self._parent.path().rstrip('/'), self._name)
+
+	def type(self):
+		return self._type
+
+	def addParm(self, template, value='', spare=False):
+		parm = Parm(self, template, value, spare)
+		self._parms.append(parm)
+
+		if spare:
+			self._fire(nodeEventType.SpareParmTemplatesChanged)
+
+		return parm
+
+	def parms(self):
+		return list(self._parms)
+
+	def globParms(self, pattern):
+		return list(self._parms)
+
+	def parm(self, name):
+		for parm in self._parms:
+			if parm.name() == name:
+				return parm
+
+		return None
+
+	def children(self):
+		return list(self._children)
+
+	def allSubChildren(self):
+		nodes = []
+
+		for child in self._children:
+			nodes.append(child)
+			nodes.extend(child.allSubChildren())
+
+		return nodes
+
+	def addEventCallback(self, eventTypes, callback):
+		self._callbacks.append((tuple(eventTypes), callback))
+
+	def removeEventCallback(self, eventTypes, callback):
+		self._callbacks = [c for c in self._callbacks if c[1] != callback]
+
+	def eventCallbacks(self):
+		return list(self._callbacks)
+
+	def _fire(self, eventType, **kwargs):
+		for eventTypes, callback in list(self._callbacks):
+			if eventType in eventTypes:
+				callback(node=self, event_type=eventType, **kwargs)
+
+	def destroy(self):
+		self._fire(nodeEventType.BeingDeleted)
+		self._parent._children.remove(self)
+		self._parent._fire(nodeEventType.ChildDeleted, child_node=self)
+
+	def __repr__(self):
+		return '<hou.Node {}>'.format(self.path())
+
+class RopNode(Node): pass
+
+class _HipFile(object):
+	def __init__(self):
+		self._callbacks = []
+		self._unsavedChanges = False
+		self._isNew = True
+		self._path = 'untitled.hip'
+
+	def addEventCallback(self, callback):
+		self._callbacks.append(callback)
+
+	def removeEventCallback(self, callback):
+		if callback not in self._callbacks:
+			raise OperationFailed('Callback not found')
+
+		self._callbacks.remove(callback)
+
+	def eventCallbacks(self):
+		return list(self._callbacks)
+
+	def path(self):
+		return self._path
+
+	def isLoadingHipFile(self):
+		return False
+
+	def isNewFile(self):
+		return self._isNew
+
+	def hasUnsavedChanges(self):
+		return self._unsavedChanges
+
+	def save(self, path=None):
+		if path:
+			self._path = path
+			putenv('HIP', os.path.dirname(path))
+
+		self._unsavedChanges = False
+		self._isNew = False
+		self.fire(hipFileEventType.AfterSave)
+
+	def fire(self, eventType):
+		for callback in list(self._callbacks):
+			callback(eventType)
+
+hipFile = None
+_root = None
+
+def node(path):
+	if path == '/':
+		return _root
+
+	current = _root
+
+	for name in path.strip('/').split('/'):
+		matches = [child for child in current._children if child._name == name]
+
+		if not matches:
+			return None
+
+		current = matches[0]
+
+	return current
+
+def isUIAvailable():
+	return ui is not None
+
+class _UI(object):
+	"""Records the messages shown to the user, answering each with the next of responses
+	(or the first button, once there are none left)
+	"""
+
+	def __init__(self):
+		self.messages = []
+		self.responses = []
+
+	def displayMessage(self, text, buttons=('OK',), **kwargs):
+		self.messages.append(text)
+
+		return self.responses.pop(0) if self.responses else 0
+
+ui = None
+
+class InterruptableOperation(object):
+	"""Records the progress reported to it. Interrupts once progress reaches interruptAt,
+	as if the user had pressed Escape
+	"""
+	interruptAt = None
+	instances = []
+
+	def __init__(self, operationName, long_operation_name=None, open_interrupt_dialog=False):
+		self.progress = []
+
+		InterruptableOperation.instances.append(self)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		return False
+
+	def updateProgress(self, percentage):
+		self.progress.append(percentage)
+
+		if InterruptableOperation.interruptAt is not None and percentage >= InterruptableOperation.interruptAt:
+			raise OperationInterrupted('Operation interrupted')
+
+def reset(hip='/tmp/hip', uiAvailable=True):
+	"""Starts an empty scene saved at $HIP/scene.hip
+
+	Args:
+		hip (str, optional): The value of $HIP
+		uiAvailable (bool, optional): Whether there is a UI, or this stands in for hython
+	"""
+	global hipFile, ui, _root
+
+	_env.clear()
+	_env.update({'HIP': hip, 'HFS': '/opt/hfs', 'JOB': hip})
+	stats.clear()
+
+	hipFile = _HipFile()
+	hipFile._path = os.path.join(hip, 'scene.hip')
+	hipFile._isNew = False
+	ui = _UI() if uiAvailable else None
+	_root = Node('')
+
+	InterruptableOperation.interruptAt = None
+	InterruptableOperation.instances = []
+
+reset()
@@ -0,0 +1,137 @@
+"""Local stand-ins for the servers SDMTools talks to, run on a background thread for the
+duration of a test. They record what they were sent, and answer with canned responses.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import threading
+
+try:
+	from socketserver import ThreadingTCPServer, StreamRequestHandler
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError: # Python 2
+	from SocketServer import ThreadingTCPServer, StreamRequestHandler
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+class _StandIn(object):
+	def start(self):
+		self.server.daemon_threads = True
+		self._thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval':0.05})
+		self._thread.daemon = True
+		self._thread.start()
+
+		return self
+
+	def getPort(self):
+		return self.server.server_address[1]
+
+	def close(self):
+		self.server.shutdown()
+		self.server.server_close()
+		self._thread.join()
+
+class _SMTPHandler(StreamRequestHandler):
+	def reply(self, line):
+		self.wfile.write((line + '\r\n').encode('utf-8'))
+
+	def handle(self):
+		standIn = self.server.standIn
+		standIn.connections += 1
+
+		self.reply('220 localhost stand-in')
+
+		while True:
+			line = self.rfile.readline().decode('utf-8')
+
+			if not line:
+				return
+
+			command = line.strip().split(' ')[0].upper()
+
+			if command == 'EHLO':
+				self.reply('250-localhost')
+				self.reply('250 AUTH PLAIN LOGIN')
+			elif command == 'AUTH':
+				self.reply('235 Authenticated' if standIn.acceptLogin else '535 Bad credentials')
+			elif command == 'DATA':
+				self.reply('354 End data with <CR><LF>.<CR><LF>')
+				lines = []
+
+				while True:
+					line = self.rfile.readline().decode('utf-8')
+
+					if line in ('.\r\n', ''):
+						break
+
+					lines.append(line)
+
+				standIn.messages.append(''.join(lines))
+				self.reply('250 OK')
+			elif command == 'QUIT':
+				standIn.quits += 1
+				self.reply('221 Bye')
+				return
+			else: # HELO, MAIL, RCPT, RSET, NOOP
+				self.reply('250 OK')
+
+class SMTPStandIn(_StandIn):
+	"""An SMTP server accepting any login (unless acceptLogin is False) and recording the
+	messages sent through it
+	"""
+
+	def __init__(self):
+		self.messages = []
+		self.connections = 0
+		self.quits = 0
+		self.acceptLogin = True
+		self.server = ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+		self.server.standIn = self
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+	def _respond(self):
+		standIn = self.server.standIn
+		length = int(self.headers.get('Content-Length') or 0)
+		body = self.rfile.read(length) if length else b''
+
+		standIn.requests.append({'method':self.command, 'path':self.path, 'headers':dict((name.lower(), value) for name, value in self.headers.items()), 'body':body})
+
+		status, headers, content = standIn.responses.pop(0) if len(standIn.responses) > 1 else standIn.responses[0]
+
+		self.send_response(status)
+
+		for name, value in headers.items():
+			self.send_header(name, value)
+
+		if 'Content-Length' not in headers:
+			self.send_header('Content-Length', str(len(content)))
+
+		self.end_headers()
+		self.wfile.write(content)
+
+	do_GET = _respond
+	do_POST = _respond
+
+	def log_message(self, *args):
+		pass
+
+class HTTPStandIn(_StandIn):
+	"""An HTTP server recording the requests made to it, with lowercase header names. Each
+	request is answered with the next of responses, the last of which is repeated from then on
+	"""
+
+	def __init__(self, responses=None):
+		"""
+		Args:
+			responses (list, optional): The (status, headers dict, content bytes) of each
+				response. By default, an empty 200. A Content-Length header longer than the
+				content makes the response end early, as if the connection dropped
+		"""
+		self.requests = []
+		self.responses = list(responses or [(200, {}, b'')])
+		self.server = HTTPServer(('127.0.0.1', 0), _HTTPHandler)
+		self.server.standIn = self
+
+	def getUrl(self, path='/'):
+		return 'http://127.0.0.1:{}{}'.format(self.getPort(), path)
@@ -0,0 +1,225 @@
+import os, json, time, shutil, tempfile, unittest
+
+from sdm.files.cache import ChecksumCache, ConversionCache, SequenceIndexCache
+from sdm.files.fileclassification import SequenceScanner, scanDirectories
+
+class CountingScanner(SequenceScanner):
+	listings = 0
+
+	def listFrameNumbers(self):
+		CountingScanner.listings += 1
+
+		return SequenceScanner.listFrameNumbers(self)
+
+class CountingCache(SequenceIndexCache):
+	saves = 0
+
+	def save(self):
+		self.saves += 1
+
+		SequenceIndexCache.save(self)
+
+class SequenceIndexCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.renders = os.path.join(self.dir, 'renders')
+		self.cache = CountingCache(os.path.join(self.dir, 'sequenceIndex.json'))
+
+		os.makedirs(self.renders)
+
+		for frame in (1001, 1002, 1003, 1005):
+			self.touch(self.renders, 'beauty.{}.exr'.format(frame))
+
+		CountingScanner.listings = 0
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def touch(self, dir, name):
+		open(os.path.join(dir, name), 'w').close()
+
+	def age(self, dir, seconds):
+		then = time.time() - seconds
+
+		os.utime(dir, (then, then))
+
+	def scan(self, dir=None):
+		return CountingScanner(dir or self.renders, cache=self.cache).scanFrameNumbers()
+
+	def testUnchangedDirectoryIsNotListedAgain(self):
+		self.age(self.renders, 60)
+
+		first = self.scan()
+		second = self.scan()
+
+		self.assertEqual(CountingScanner.listings, 1)
+		self.assertEqual(dict(second), {('beauty', 4, 'exr'): [1001, 1002, 1003, 1005]})
+		self.assertEqual(sorted(first[('beauty', 4, 'exr')]), second[('beauty', 4, 'exr')])
+
+		# Persisted, so a new session reuses it too
+		self.cache = SequenceIndexCache(self.cache.getPath())
+		self.scan()
+
+		self.assertEqual(CountingScanner.listings, 1)
+
+	def testChangedSignatureListsAgain(self):
+		self.age(self.renders, 60)
+		self.scan()
+
+		self.touch(self.renders, 'beauty.1004.exr')
+		self.age(self.renders, 30)
+
+		self.assertEqual(sorted(self.scan()[('beauty', 4, 'exr')]), [1001, 1002, 1003, 1004, 1005])
+		self.assertEqual(CountingScanner.listings, 2)
+
+		self.scan()
+
+		self.assertEqual(CountingScanner.listings, 2) # The new listing was cached
+
+	def testRecentlyModifiedDirectoryIsNotCached(self):
+		self.scan() # Just created, within the racy window
+		self.scan()
+
+		self.assertEqual(CountingScanner.listings, 2)
+		self.assertFalse(os.path.exists(self.cache.getPath()))
+
+		self.age(self.renders, 60)
+		self.scan()
+		self.touch(self.renders, 'beauty.1004.exr') # Modified again, so the entry is dropped
+
+		self.assertEqual(sorted(self.scan()[('beauty', 4, 'exr')]), [1001, 1002, 1003, 1004, 1005])
+
+		with open(self.cache.getPath()) as f:
+			self.assertEqual(json.load(f), {})
+
+	def testScanDirectoriesSavesOnce(self):
+		dirs = []
+
+		for i in range(4):
+			dir = os.path.join(self.dir, 'shot_{}'.format(i))
+			os.makedirs(dir)
+			self.touch(dir, 'beauty.1001.exr')
+			self.age(dir, 60)
+			dirs.append(dir)
+
+		scanned = dict(scanDirectories(dirs, workers=2, cache=self.cache))
+
+		self.assertEqual(sorted(scanned), dirs)
+		self.assertEqual(self.cache.saves, 1)
+
+		with open(self.cache.getPath()) as f:
+			self.assertEqual(len(json.load(f)), 4)
+
+class ConversionCacheTest(unittest.TestCase):
+	SETTINGS = ['-s', '50', '.rat']
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.cache = self.open()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def open(self, **kwargs):
+		return ConversionCache(os.path.join(self.dir, 'conversions.json'), blobDir=os.path.join(self.dir, 'blobs'), checksums=ChecksumCache(os.path.join(self.dir, 'checksums.json')), **kwargs)
+
+	def write(self, name, content):
+		path = os.path.join(self.dir, name)
+
+		with open(path, 'w') as f:
+			f.write(content)
+
+		return path
+
+	def read(self, path):
+		with open(path) as f:
+			return f.read()
+
+	def convert(self, source, output, cache=None):
+		"""Stands in for runConversionJobs: restores the output, or converts and stores it"""
+		cache = cache or self.cache
+		key = cache.getKey(source, self.SETTINGS)
+
+		if cache.restore(key, output):
+			return False
+
+		cache.release(output)
+
+		with open(output, 'w') as f:
+			f.write('converted ' + self.read(source))
+
+		cache.store(key, output)
+
+		return True
+
+	def testMissThenHit(self):
+		source = self.write('a.png', 'a')
+		output = os.path.join(self.dir, 'a.rat')
+
+		self.assertTrue(self.convert(source, output))
+		self.assertFalse(self.convert(source, output)) # Unchanged output left as is
+		self.assertEqual(self.read(output), 'converted a')
+
+		self.write('a.png', 'b') # Changed source
+
+		self.assertTrue(self.convert(source, output))
+		self.assertEqual(self.read(output), 'converted b')
+
+		self.assertNotEqual(self.cache.getKey(source, self.SETTINGS), self.cache.getKey(source, ['-s', '25', '.rat']))
+
+	def testRestoresFromBlob(self):
+		source = self.write('a.png', 'a')
+		output = os.path.join(self.dir, 'a.rat')
+		self.convert(source, output)
+		self.cache.save()
+
+		os.remove(output)
+		copy = self.write('b.png', 'a') # Same contents at another path
+		cache = self.open() # Persisted
+
+		self.assertFalse(self.convert(source, output, cache))
+		self.assertFalse(self.convert(copy, os.path.join(self.dir, 'b.rat'), cache))
+		self.assertEqual(self.read(output), 'converted a')
+		self.assertEqual(self.read(os.path.join(self.dir, 'b.rat')), 'converted a')
+
+	def testOutputsAreHardLinked(self):
+		source = self.write('a.png', 'a')
+		output = os.path.join(self.dir, 'a.rat')
+		self.convert(source, output)
+		blob = os.path.join(self.cache.getBlobDir(), os.listdir(self.cache.getBlobDir())[0])
+
+		self.assertTrue(os.path.samefile(output, blob))
+
+		restored = os.path.join(self.dir, 'b.rat')
+		self.cache.restore(self.cache.getKey(source, self.SETTINGS), restored)
+
+		self.assertTrue(os.path.samefile(restored, blob))
+
+		# Converting again with other settings must not write through to the stored result
+		self.SETTINGS = ['-s', '25', '.rat']
+		self.write('a.png', 'changed')
+
+		self.assertTrue(self.convert(source, output))
+		self.assertEqual(self.read(blob), 'converted a')
+		self.assertEqual(self.read(restored), 'converted a')
+
+	def testBlobsEvictedPastBudget(self):
+		cache = self.open(maxBlobBytes=25)
+		outputs = []
+
+		for name in 'abc':
+			source = self.write(name + '.png', name * 5)
+			outputs.append(os.path.join(self.dir, name + '.rat'))
+			self.convert(source, outputs[-1], cache) # 15 bytes each
+
+		self.assertEqual(len(os.listdir(cache.getBlobDir())), 1)
+		self.assertTrue(all(os.path.exists(output) for output in outputs)) # Only the stored copies are removed
+
+		for output in outputs:
+			os.remove(output)
+
+		self.assertFalse(self.convert(os.path.join(self.dir, 'c.png'), outputs[2], cache))
+		self.assertTrue(self.convert(os.path.join(self.dir, 'a.png'), outputs[0], cache)) # Evicted
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,187 @@
+import os, sys, time, shutil, tempfile, threading, unittest
+
+import hou
+
+from sdm.files.fileclassification import FrameSet
+from sdm.houdini.execution import BackgroundCache, ChunkedExecutor, ChunkManifest, HeadlessRopExecutor
+from sdm.houdini.headless import HeadlessJob
+
+from tests.test_headless import STUB_HYTHON, writeStub
+
+class BackgroundCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.hython = writeStub(self.dir, 'hython', STUB_HYTHON.format(sys.executable))
+
+		hou.reset(hip=self.dir)
+		self.rop = hou.Node('cache', hou.node('/'), 'rop_geometry')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def cache(self, frames, **kwargs):
+		return BackgroundCache(self.rop, frames=FrameSet.fromString(frames), hip='scene.hip', hython=self.hython, **kwargs)
+
+	def testDefaultSessionCount(self):
+		cache = self.cache('1-10', chunkSize=2)
+
+		try:
+			cache.poll()
+
+			self.assertEqual([job.getStatus() for chunk, job in cache.getJobs()].count(HeadlessJob.RUNNING), 2)
+		finally:
+			cache.cancel()
+
+	def testCallbackErrorsDontRepeatChunks(self):
+		reported = []
+		completed = []
+
+		def onChunkComplete(chunk):
+			reported.append(chunk)
+			raise RuntimeError('Flipbook failed')
+
+		def onComplete(cache):
+			completed.append(cache)
+			raise RuntimeError('Dialog failed')
+
+		cache = self.cache('1-6', chunkSize=2, onChunkComplete=onChunkComplete, onComplete=onComplete)
+		cache.wait(interval=0.05)
+
+		self.assertEqual(sorted(str(chunk) for chunk in reported), sorted(str(chunk) for chunk, job in cache.getJobs()))
+		self.assertEqual(completed, [cache])
+		self.assertTrue(cache.isComplete())
+		self.assertEqual(cache.getProgress(), 1.0)
+
+ALWAYS = float('inf')
+
+class FakeExecutor(object):
+	"""Executes chunks by sleeping for each of their frames. Chunks named in failures fail
+	that many times before succeeding
+	"""
+
+	def __init__(self, seconds=None, failures=None):
+		self.seconds = seconds or (lambda frame: 0)
+		self.failures = dict(failures or {})
+		self.executed = []
+		self.lock = threading.Lock()
+
+	def __call__(self, chunk):
+		with self.lock:
+			self.executed.append(str(chunk))
+			remaining = self.failures.get(str(chunk), 0)
+			self.failures[str(chunk)] = max(0, remaining - 1)
+
+		if remaining:
+			raise RuntimeError('Frame {} failed'.format(chunk))
+
+		for frame in chunk:
+			time.sleep(self.seconds(frame))
+
+class ChunkedWorkTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.manifestPath = os.path.join(self.dir, 'manifest.json')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def testIdleWorkersStealChunks(self):
+		frames = FrameSet.fromString('1-20')
+		execute = FakeExecutor(seconds=lambda frame: 0.05 if frame <= 10 else 0) # The first worker's block is slow
+		executor = ChunkedExecutor(execute, frames, chunkSize=1, workers=2)
+
+		self.assertTrue(executor.run())
+		self.assertGreater(executor.getStealCount(), 0)
+		self.assertEqual(sorted(execute.executed, key=int), [str(f) for f in frames]) # Each chunk ran once
+		self.assertEqual(len(executor.getCompleted()), 20)
+
+	def testFailedChunksAreRetried(self):
+		execute = FakeExecutor(failures={'5, 6':2, '9, 10':ALWAYS})
+		executor = ChunkedExecutor(execute, FrameSet.fromString('1-10'), chunkSize=2, workers=2, retries=2)
+
+		self.assertFalse(executor.run())
+		self.assertEqual(execute.executed.count('5, 6'), 3) # Succeeded on the last retry
+		self.assertEqual(execute.executed.count('9, 10'), 3)
+		self.assertEqual([str(chunk) for chunk, error in executor.getFailed()], ['9, 10'])
+		self.assertIn('Frame 9, 10 failed', executor.getFailed()[0][1])
+		self.assertEqual(sorted(str(chunk) for chunk in executor.getCompleted()), ['1, 2', '3, 4', '5, 6', '7, 8'])
+
+	def testManifestResumesMissingFrames(self):
+		frames = FrameSet.fromString('1-30')
+		manifest = ChunkManifest(self.manifestPath, '/out/cache', frames)
+		executor = ChunkedExecutor(FakeExecutor(failures={'11-20':ALWAYS}), frames, retries=0, manifest=manifest)
+
+		self.assertFalse(executor.run())
+		self.assertEqual(list(manifest.getFailed()), ['11-20'])
+
+		manifest = ChunkManifest(self.manifestPath, '/out/cache', frames) # Another session
+		execute = FakeExecutor()
+
+		self.assertEqual(str(manifest.getRemaining()), '11-20')
+		self.assertTrue(ChunkedExecutor(execute, frames, retries=0, manifest=manifest).run())
+		self.assertEqual(execute.executed, ['11-20'])
+		self.assertTrue(ChunkManifest(self.manifestPath, '/out/cache', frames).isComplete())
+
+		other = ChunkManifest(self.manifestPath, '/out/other', frames) # Not for this ROP
+
+		self.assertEqual(str(other.getRemaining()), '1-30')
+
+	def testCallbackErrorsDontStopWorkers(self):
+		reported = []
+
+		def onChunkComplete(chunk):
+			reported.append(chunk)
+			raise RuntimeError('Flipbook failed')
+
+		frames = FrameSet.fromString('1-40')
+		manifest = ChunkManifest(self.manifestPath, '/out/cache', frames)
+		executor = ChunkedExecutor(FakeExecutor(), frames, workers=2, manifest=manifest, onChunkComplete=onChunkComplete)
+
+		self.assertTrue(executor.run())
+		self.assertEqual(len(reported), 4)
+		self.assertTrue(manifest.isComplete())
+
+class ChunkedExecutorTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.hython = writeStub(self.dir, 'hython', '#!{}\nimport time\ntime.sleep(60)\n'.format(sys.executable))
+		self.threads = threading.active_count()
+
+		hou.reset(hip=self.dir)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def executor(self):
+		return ChunkedExecutor(HeadlessRopExecutor('/out/cache', hip='scene.hip', hython=self.hython), FrameSet.fromString('1-40'), retries=0)
+
+	def waitForWorkers(self, timeout=10):
+		deadline = time.time() + timeout
+
+		while threading.active_count() > self.threads and time.time() < deadline:
+			time.sleep(0.05)
+
+		return threading.active_count() <= self.threads
+
+	def testCancelKillsRunningChunks(self):
+		executor = self.executor()
+		threading.Timer(0.5, executor.cancel).start()
+		start = time.time()
+
+		self.assertFalse(executor.run())
+		self.assertLess(time.time() - start, 10)
+		self.assertEqual(executor.getFailed(), []) # Cancelled chunks aren't failures
+		self.assertTrue(self.waitForWorkers())
+
+	def testInterruptKillsRunningChunks(self):
+		executor = self.executor()
+		hou.InterruptableOperation.interruptAt = 0
+
+		with self.assertRaises(hou.OperationInterrupted):
+			executor.run(operation=hou.InterruptableOperation('Executing'))
+
+		self.assertTrue(self.waitForWorkers())
+		self.assertEqual(executor.getFailed(), [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+
+from sdm.files.fileclassification import FrameSet, GapIndex, Sequence, iterFrameRuns
+
+def sequence(numbers):
+	return Sequence.fromFrameNumbers('/renders', 'beauty', 4, 'exr', numbers)
+
+class GapIndexTest(unittest.TestCase):
+	def testRuns(self):
+		self.assertEqual(list(iterFrameRuns([1, 2, 3, 5, 7, 8])), [(1, 3), (5, 5), (7, 8)])
+		self.assertEqual(list(iterFrameRuns([0, 0, 1, 3])), [(0, 1), (3, 3)]) # Duplicates are ignored
+		self.assertEqual(list(iterFrameRuns([])), [])
+
+	def testContains(self):
+		index = GapIndex([1, 2, 3, 5, 7, 8])
+
+		self.assertEqual([n for n in range(0, 10) if n in index], [1, 2, 3, 5, 7, 8])
+		self.assertFalse(GapIndex([]).contains(1))
+
+	def testMissingRanges(self):
+		index = GapIndex([1, 2, 3, 5, 7, 8, 20])
+
+		self.assertEqual(index.getRange(), (1, 20))
+		self.assertEqual(index.getRunCount(), 4)
+		self.assertEqual(index.getFrameCount(), 7)
+		self.assertEqual(list(index.iterMissingRanges()), [(4, 4), (6, 6), (9, 19)])
+		self.assertEqual(list(index.iterMissingFrames()), [4, 6] + list(range(9, 20)))
+
+	def testNoGaps(self):
+		index = GapIndex(range(1001, 1101))
+
+		self.assertEqual(list(index.iterMissingRanges()), [])
+		self.assertEqual(index.getRange(), (1001, 1100))
+		self.assertEqual(GapIndex([]).getRange(), ())
+
+	def testSequenceGaps(self):
+		frames = sequence([1005, 1001, 1002, 1009, 1010, 1003])
+
+		self.assertTrue(frames.hasFrame(1002))
+		self.assertFalse(frames.hasFrame(1004))
+		self.assertEqual(frames.getMissingRanges(), [(1004, 1004), (1006, 1008)])
+		self.assertEqual(frames.getMissingFrames(), [1004, 1006, 1007, 1008])
+		self.assertEqual(frames.getMissingFrames(format=True), '1004, 1006-1008')
+
+	def testIndexRebuiltWhenFramesAdded(self):
+		frames = sequence([1, 2, 5])
+
+		self.assertEqual(frames.getMissingFrames(), [3, 4])
+
+		frames.addFrameNumbers([3, 4, 7])
+
+		self.assertEqual(frames.getMissingFrames(), [6])
+		self.assertTrue(frames.hasFrame(7))
+
+	def testPrettyPrint(self):
+		self.assertEqual(Sequence.prettyPrintFrameList([1, 2, 3, 4, 5, 9, 10, 13, 15]), '1-5, 9, 10, 13, 15')
+		self.assertEqual(Sequence.prettyPrintFrameList([0, 1, 2]), '0-2')
+		self.assertEqual(Sequence.prettyPrintFrameList([]), '')
+
+# Frame strings covering disjoint, merged, interleaved and negative ranges
+FRAME_STRINGS = ['1-10', '1-10, 20-30:5', '1-20:2, 2-20:2', '1-30:3, 1-30:2', '5, 1-4, 3-12:4', '-10--2:3, 0', '1-100:7, 40-60', '']
+
+def expand(frameString):
+	frames = set()
+
+	for block in filter(None, [b.strip() for b in frameString.split(',')]):
+		parts = FrameSet.BLOCK_PATTERN.match(block)
+		start = int(parts.group('start'))
+		end = int(parts.group('end') or start)
+
+		frames.update(range(start, end + 1, int(parts.group('inc') or 1)))
+
+	return frames
+
+class FrameSetTest(unittest.TestCase):
+	def testIterLenContains(self):
+		for frameString in FRAME_STRINGS:
+			frames = FrameSet.fromString(frameString)
+			expected = expand(frameString)
+
+			self.assertEqual(list(frames), sorted(expected), frameString)
+			self.assertEqual(len(frames), len(expected), frameString)
+			self.assertEqual(bool(frames), bool(expected), frameString)
+			self.assertEqual([n for n in range(-15, 110) if n in frames], sorted(expected), frameString)
+
+	def testLargeRangesStaySymbolic(self):
+		frames = FrameSet.fromString('1-10000000:2')
+
+		self.assertEqual(frames.getRanges(), [(1, 9999999, 2)])
+		self.assertEqual(len(frames), 5000000)
+		self.assertIn(9999999, frames)
+		self.assertNotIn(10000000, frames)
+
+	def testSetOperations(self):
+		for a in FRAME_STRINGS:
+			for b in FRAME_STRINGS:
+				x = FrameSet.fromString(a)
+				y = FrameSet.fromString(b)
+
+				self.assertEqual(list(x | y), sorted(expand(a) | expand(b)), (a, b))
+				self.assertEqual(list(x & y), sorted(expand(a) & expand(b)), (a, b))
+				self.assertEqual(list(x - y), sorted(expand(a) - expand(b)), (a, b))
+
+	def testStringRoundTrip(self):
+		self.assertEqual(str(FrameSet.fromString('1-5, 9, 10, 13, 20-30:5')), '1-5, 9, 10, 13, 20-30:5')
+		self.assertEqual(str(FrameSet.fromString('1-10, 5-20')), '1-20')
+		self.assertEqual(str(FrameSet.fromFrames([7, 3, 1, 2])), '1-3, 7')
+
+		for frameString in FRAME_STRINGS:
+			frames = FrameSet.fromString(frameString)
+
+			self.assertEqual(list(FrameSet.fromString(str(frames))), list(frames), frameString)
+
+	def testChunks(self):
+		self.assertEqual([str(chunk) for chunk in FrameSet.fromString('1-10, 20-30:5').chunks(4)], ['1-4', '5-8', '9, 10, 20-25:5', '30'])
+
+		for frameString in FRAME_STRINGS:
+			frames = FrameSet.fromString(frameString)
+
+			for size in (1, 3, 50):
+				chunks = list(frames.chunks(size))
+
+				self.assertEqual([f for chunk in chunks for f in chunk], list(frames), (frameString, size))
+				self.assertTrue(all(0 < len(chunk) <= size for chunk in chunks))
+				self.assertTrue(all(len(chunk) == size for chunk in chunks[:-1]))
+
+		with self.assertRaises(ValueError):
+			list(FrameSet.fromString('1-10').chunks(0))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,71 @@
+import os, json, shutil, tempfile, unittest
+
+from sdm.houdini.fileutils import SettingsFile
+
+class SettingsFileTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'settings.json')
+
+		with open(self.path, 'w') as f:
+			json.dump({'disabledTools': ['a'], 'notification': {'smtp': {'host': 'mail', 'port': 25}}}, f)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def read(self):
+		with open(self.path) as f:
+			return json.load(f)
+
+	def testReturnedValuesAreCopies(self):
+		settings = SettingsFile(self.path)
+		settings.get('disabledTools').append('b')
+		settings.get('notification')['smtp']['port'] = 0
+		settings.get('notification.smtp')['host'] = 'other'
+
+		other = SettingsFile(self.path)
+
+		self.assertEqual(other.get('disabledTools'), ['a'])
+		self.assertEqual(other.get('notification.smtp'), {'host': 'mail', 'port': 25})
+		self.assertEqual(other.get('notification.smtp.port'), 25)
+
+	def testDottedChangesAreNested(self):
+		settings = SettingsFile(self.path)
+		settings.set('notification.smtp.port', 587)
+
+		self.assertEqual(settings.get('notification.smtp.port'), 587)
+		self.assertEqual(settings.get('notification.smtp'), {'host': 'mail', 'port': 587})
+		self.assertEqual(settings.get('notification')['smtp']['port'], 587)
+		self.assertEqual(SettingsFile(self.path).get('notification.smtp.port'), 25) # Not saved yet
+
+		settings.write()
+
+		self.assertEqual(self.read()['notification'], {'smtp': {'host': 'mail', 'port': 587}})
+		self.assertNotIn('notification.smtp.port', self.read())
+		self.assertEqual(SettingsFile(self.path).get('notification.smtp.port'), 587)
+
+	def testChangedParentHidesChildren(self):
+		settings = SettingsFile(self.path)
+		settings.set('notification.smtp', 'disabled')
+
+		self.assertEqual(settings.get('notification.smtp'), 'disabled')
+		self.assertIsNone(settings.get('notification.smtp.port'))
+
+		settings.set('notification.smtp.port', 2525) # A dictionary again, merged with the saved one
+
+		self.assertEqual(settings.get('notification.smtp'), {'host': 'mail', 'port': 2525})
+
+		settings.write()
+
+		self.assertEqual(self.read()['notification'], {'smtp': {'host': 'mail', 'port': 2525}})
+
+	def testSetValueIsCopied(self):
+		settings = SettingsFile(self.path)
+		tools = ['a', 'b']
+		settings.set('disabledTools', tools)
+		tools.append('c')
+
+		self.assertEqual(settings.get('disabledTools'), ['a', 'b'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,143 @@
+import os, sys, json, stat, time, shutil, tempfile, unittest
+
+import hou
+
+from sdm.houdini import headless
+from sdm.houdini.headless import HeadlessJob, UnsavedHipFileError, getBackgroundSessionCount, getSavedHipFile, runHeadlessJobs
+
+from tests.test_image import InterruptAfter
+
+# Stands in for hython: sleeps for the 'seconds' option, then fails if asked to
+STUB_HYTHON = '''#!{}
+import sys, json, time
+
+options = json.loads(sys.argv[-1])
+time.sleep(options.get('seconds', 0))
+
+if options.get('fail'):
+	sys.stderr.write('Failed')
+	sys.exit(1)
+'''
+
+def writeStub(dir, name, content):
+	path = os.path.join(dir, name)
+
+	with open(path, 'w') as f:
+		f.write(content)
+
+	os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+	return path
+
+class SavedHipFileTest(unittest.TestCase):
+	def setUp(self):
+		self.hip = tempfile.mkdtemp()
+
+		hou.reset(hip=self.hip)
+		open(hou.hipFile.path(), 'w').close()
+
+	def tearDown(self):
+		shutil.rmtree(self.hip)
+
+	def testSavedScene(self):
+		self.assertEqual(getSavedHipFile(), hou.hipFile.path())
+		self.assertEqual(hou.ui.messages, [])
+
+	def testUntitledSceneRefused(self):
+		hou.hipFile._isNew = True
+
+		with self.assertRaises(UnsavedHipFileError):
+			getSavedHipFile()
+
+		self.assertEqual(hou.ui.messages, [])
+
+	def testMissingHipFileRefused(self):
+		os.remove(hou.hipFile.path())
+
+		with self.assertRaises(UnsavedHipFileError):
+			getSavedHipFile()
+
+	def testUnsavedChangesSavedWhenAccepted(self):
+		hou.hipFile._unsavedChanges = True
+		hou.ui.responses = [0]
+
+		self.assertEqual(getSavedHipFile(), hou.hipFile.path())
+		self.assertEqual(len(hou.ui.messages), 1)
+		self.assertFalse(hou.hipFile.hasUnsavedChanges())
+
+	def testUnsavedChangesRefusedWhenCancelled(self):
+		hou.hipFile._unsavedChanges = True
+		hou.ui.responses = [1]
+
+		with self.assertRaises(UnsavedHipFileError):
+			getSavedHipFile()
+
+		self.assertTrue(hou.hipFile.hasUnsavedChanges())
+
+	def testUnsavedChangesRefusedWithoutUI(self):
+		hou.reset(hip=self.hip, uiAvailable=False)
+		hou.hipFile._unsavedChanges = True
+
+		with self.assertRaises(UnsavedHipFileError):
+			getSavedHipFile()
+
+		self.assertTrue(hou.hipFile.hasUnsavedChanges())
+
+class RunHeadlessJobsTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.hython = writeStub(self.dir, 'hython', STUB_HYTHON.format(sys.executable))
+		self.settings = os.path.join(self.dir, 'settings.json')
+		self.environ = dict(os.environ)
+
+		os.environ['SDMTOOLS_USER_SETTINGS'] = self.settings
+
+	def tearDown(self):
+		os.environ.clear()
+		os.environ.update(self.environ)
+		shutil.rmtree(self.dir)
+
+	def job(self, **options):
+		return HeadlessJob('render', 'scene.hip', options, hython=self.hython)
+
+	def testSessionCountSetting(self):
+		self.assertEqual(getBackgroundSessionCount(), headless.DEFAULT_BACKGROUND_SESSIONS)
+
+		os.environ['SDMTOOLS_USER_SETTINGS'] = os.path.join(self.dir, 'other')
+		os.makedirs(os.environ['SDMTOOLS_USER_SETTINGS'])
+
+		with open(os.path.join(self.dir, 'other', 'settings.json'), 'w') as f:
+			json.dump({'backgroundSessions': 3}, f)
+
+		self.assertEqual(getBackgroundSessionCount(), 3)
+
+	def testRunsDefaultSessionCountAtOnce(self):
+		jobs = [self.job(seconds=0.5) for i in range(4)]
+		start = time.time()
+
+		runHeadlessJobs(jobs, pollInterval=0.02)
+		elapsed = time.time() - start
+
+		self.assertTrue(all(job.succeeded() for job in jobs))
+		self.assertGreater(elapsed, 1.0) # Two rounds of two, rather than all four at once
+		self.assertLess(elapsed, 1.9)
+
+	def testReportsFailures(self):
+		jobs = runHeadlessJobs([self.job(), self.job(fail=True)], pollInterval=0.02)
+
+		self.assertEqual([job.getStatus() for job in jobs], [HeadlessJob.SUCCEEDED, HeadlessJob.FAILED])
+		self.assertEqual(jobs[1].getError(), 'Failed')
+
+	def testInterruptKillsRunningSessions(self):
+		jobs = [self.job(seconds=60), self.job(seconds=60), self.job()]
+		start = time.time()
+
+		with self.assertRaises(hou.OperationInterrupted):
+			runHeadlessJobs(jobs, operation=InterruptAfter(0.5), pollInterval=0.02)
+
+		# Noticed while the sessions were still running, rather than once they finished
+		self.assertLess(time.time() - start, 10)
+		self.assertEqual([job.getStatus() for job in jobs], [HeadlessJob.CANCELLED] * 3)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,223 @@
+import os, sys, stat, time, shutil, struct, tempfile, unittest
+
+import hou
+
+from sdm.houdini import image
+from sdm.houdini.image import ConversionJob, ImageType, convertImages, probeImage, runConversionJobs
+
+# Stands in for icp: copies the source to the output after a delay. Sources named 'bad' fail
+# with an error, and sources named 'slow' take a minute
+STUB_CONVERTER = '''#!{}
+import sys, time, shutil
+
+source, output = sys.argv[-2], sys.argv[-1]
+
+if 'bad' in source:
+	sys.stderr.write('icp: cannot read ' + source)
+	sys.exit(3)
+
+time.sleep(60 if 'slow' in source else {})
+shutil.copy(source, output)
+'''
+
+DELAY = 0.3
+
+def writePNG(path, width=1024, height=1024):
+	with open(path, 'wb') as f:
+		f.write(b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+def writeJPEG(path, width, height, channels=3):
+	exif = b'Exif\0\0' + b'\0' * 10 # Segments before the frame header are skipped
+
+	with open(path, 'wb') as f:
+		f.write(b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', 2 + len(exif)) + exif)
+		f.write(b'\xff\xc2' + struct.pack('>HBHHB', 8 + 3 * channels, 8, height, width, channels))
+
+def writeTIFF(path, width, height, order='<'):
+	entries = [(256, 4, 1, struct.pack(order + 'I', width)), (257, 3, 1, struct.pack(order + 'HH', height, 0)), (258, 3, 3, struct.pack(order + 'I', 62)), (277, 3, 1, struct.pack(order + 'HH', 3, 0))]
+	ifd = struct.pack(order + 'H', len(entries)) + b''.join(struct.pack(order + 'HHI', tag, type, count) + value for tag, type, count, value in entries) + b'\0' * 4
+
+	with open(path, 'wb') as f:
+		f.write((b'II*\0' if order == '<' else b'MM\0*') + struct.pack(order + 'I', 8) + ifd) # 8 + 54 bytes
+		f.write(struct.pack(order + 'HHH', 16, 16, 16)) # Bits per sample, at offset 62
+
+def writeEXR(path, width, height, channels='BGR', pixelType=1):
+	def attribute(name, type, value):
+		return name + b'\0' + type + b'\0' + struct.pack('<i', len(value)) + value
+
+	chlist = b''.join(c.encode('utf-8') + b'\0' + struct.pack('<iB3xii', pixelType, 0, 1, 1) for c in channels) + b'\0'
+
+	with open(path, 'wb') as f:
+		f.write(b'\x76\x2f\x31\x01' + struct.pack('<I', 2))
+		f.write(attribute(b'compression', b'compression', b'\3'))
+		f.write(attribute(b'channels', b'chlist', chlist))
+		f.write(attribute(b'dataWindow', b'box2i', struct.pack('<iiii', 10, 20, 10 + width - 1, 20 + height - 1)))
+		f.write(b'\0')
+
+def writeHDR(path, width, height):
+	with open(path, 'wb') as f:
+		f.write('#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n-Y {} +X {}\n'.format(height, width).encode('utf-8'))
+
+class InterruptAfter(object):
+	"""An operation the user interrupts after the given number of seconds"""
+
+	def __init__(self, seconds):
+		self.deadline = time.time() + seconds
+
+	def updateProgress(self, percentage):
+		if time.time() > self.deadline:
+			raise hou.OperationInterrupted('Operation interrupted')
+
+class ConvertImagesTest(unittest.TestCase):
+	def setUp(self):
+		hou.reset()
+
+		self.dir = tempfile.mkdtemp()
+		self.converter = os.path.join(self.dir, 'icp')
+
+		with open(self.converter, 'w') as f:
+			f.write(STUB_CONVERTER.format(sys.executable, DELAY))
+
+		os.chmod(self.converter, os.stat(self.converter).st_mode | stat.S_IXUSR)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def makeImages(self, names):
+		paths = [os.path.join(self.dir, name + '.png') for name in names]
+
+		for path in paths:
+			writePNG(path)
+
+		return paths
+
+	def testRunsConcurrently(self):
+		files = self.makeImages(['tex{}'.format(i) for i in range(8)])
+		operation = hou.InterruptableOperation('Converting')
+		start = time.time()
+		jobs = convertImages(files, -1, 100.0, ImageType.RAT, workers=4, operation=operation, converter=self.converter)
+		elapsed = time.time() - start
+
+		self.assertTrue(all(job.succeeded() for job in jobs))
+		self.assertTrue(all(os.path.exists(os.path.splitext(f)[0] + '.rat') for f in files))
+		self.assertLess(elapsed, DELAY * 8 * 0.75) # Two rounds of 4, rather than 8 one after the other
+		self.assertEqual(operation.progress[-1], 1.0)
+
+	def testReportsFailures(self):
+		files = self.makeImages(['good', 'bad'])
+		jobs = convertImages(files, -1, 100.0, ImageType.RAT, workers=2, converter=self.converter)
+
+		self.assertEqual([job.getStatus() for job in jobs], [ConversionJob.SUCCEEDED, ConversionJob.FAILED])
+		self.assertEqual(jobs[1].getReturnCode(), 3)
+		self.assertIn('cannot read', jobs[1].getError())
+
+	def testMissingConverter(self):
+		files = self.makeImages(['tex'])
+		jobs = convertImages(files, -1, 100.0, ImageType.RAT, converter=os.path.join(self.dir, 'missing'))
+
+		self.assertEqual(jobs[0].getStatus(), ConversionJob.FAILED)
+		self.assertIn('Could not run', jobs[0].getError())
+
+	def testFailedTierFailsDependents(self):
+		files = self.makeImages(['bad'])
+		jobs = convertImages(files, -1, 100.0, ImageType.RAT, converter=self.converter, tiers=[('', -1), ('1k', 1024), ('256', 256)])
+
+		self.assertEqual([job.getStatus() for job in jobs], [ConversionJob.FAILED] * 3)
+
+	def testInterruptKillsRunningConversions(self):
+		files = self.makeImages(['slow0', 'slow1', 'tex'])
+		jobs = [ConversionJob(f, os.path.splitext(f)[0] + '.rat', [self.converter, f, os.path.splitext(f)[0] + '.rat']) for f in files]
+		start = time.time()
+
+		with self.assertRaises(hou.OperationInterrupted):
+			runConversionJobs(jobs, workers=2, operation=InterruptAfter(0.5))
+
+		# Noticed while the slow conversions were still running, rather than once they finished
+		self.assertLess(time.time() - start, 10)
+		self.assertEqual([job.getStatus() for job in jobs], [ConversionJob.CANCELLED] * 3)
+		self.assertFalse(any(os.path.exists(job.getOutput()) for job in jobs))
+
+class ProbeImageTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def path(self, name):
+		return os.path.join(self.dir, name)
+
+	def probe(self, name):
+		info = probeImage(self.path(name))
+
+		return (info.getFormat(), info.getResolution(), info.getChannels(), info.getBitDepth())
+
+	def testHeaders(self):
+		writePNG(self.path('a.png'), 640, 480)
+		writeJPEG(self.path('a.jpg'), 1920, 1080)
+		writeTIFF(self.path('le.tif'), 300, 200)
+		writeTIFF(self.path('be.tif'), 300, 200, order='>')
+		writeEXR(self.path('a.exr'), 2048, 858)
+		writeEXR(self.path('full.exr'), 16, 8, channels='ABGRZ', pixelType=2)
+		writeHDR(self.path('a.hdr'), 960, 540)
+
+		self.assertEqual(self.probe('a.png'), (ImageType.PNG, (640, 480), 4, 8))
+		self.assertEqual(self.probe('a.jpg'), (ImageType.JPG, (1920, 1080), 3, 8))
+		self.assertEqual(self.probe('le.tif'), (ImageType.TIFF, (300, 200), 3, 16))
+		self.assertEqual(self.probe('be.tif'), (ImageType.TIFF, (300, 200), 3, 16))
+		self.assertEqual(self.probe('a.exr'), (ImageType.EXR, (2048, 858), 3, 16))
+		self.assertEqual(self.probe('full.exr'), (ImageType.EXR, (16, 8), 5, 32))
+		self.assertEqual(self.probe('a.hdr'), (ImageType.HDR, (960, 540), 3, 32))
+
+	def testUnrecognized(self):
+		with open(self.path('notes.txt'), 'w') as f:
+			f.write('Not an image')
+
+		with open(self.path('truncated.png'), 'wb') as f:
+			f.write(b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR\0\0')
+
+		with open(self.path('truncated.jpg'), 'wb') as f:
+			f.write(b'\xff\xd8\xff\xe1\x00')
+
+		self.assertIsNone(probeImage(self.path('notes.txt')))
+		self.assertIsNone(probeImage(self.path('truncated.png')))
+		self.assertIsNone(probeImage(self.path('truncated.jpg')))
+		self.assertIsNone(probeImage(self.path('missing.png')))
+
+	def testRatResolutionFromHoudini(self):
+		asked = []
+
+		def imageResolution(file):
+			asked.append(file)
+			return (512, 256)
+
+		hou.imageResolution = imageResolution
+		self.addCleanup(delattr, hou, 'imageResolution')
+
+		with open(self.path('a.rat'), 'wb') as f:
+			f.write(b'\0' * 64)
+
+		writePNG(self.path('a.png'), 64, 32)
+
+		self.assertEqual(probeImage(self.path('a.rat')).getResolution(), (512, 256))
+		self.assertEqual(image.getImageResolution(self.path('a.png')), (64, 32)) # Not through Houdini
+		self.assertEqual(asked, [self.path('a.rat')])
+
+	def testCachedUntilModified(self):
+		path = self.path('a.png')
+		mtime = 1500000000 # Whole seconds, so it is set back exactly on any platform
+		writePNG(path, 64, 32)
+		os.utime(path, (mtime, mtime))
+		probeImage(path)
+
+		writePNG(path, 128, 64)
+		os.utime(path, (mtime, mtime))
+
+		self.assertEqual(probeImage(path).getResolution(), (64, 32)) # Not read again
+
+		os.utime(path, (mtime + 10, mtime + 10))
+
+		self.assertEqual(probeImage(path).getResolution(), (128, 64))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,184 @@
+import os, json, shutil, zipfile, tempfile, unittest
+
+from sdm.houdini.installer import downloadFile, extractRelease, getFileCrc, mergeSettingsTransform, swapDirectories
+
+from tests.standins import HTTPStandIn
+
+CONTENT = b''.join(str(i).encode('utf-8') for i in range(2000))
+TOP = 'sashaouellet-SDMTools-1a2b3c/'
+
+def write(path, content):
+	if not os.path.isdir(os.path.dirname(path)):
+		os.makedirs(os.path.dirname(path))
+
+	with open(path, 'wb') as f:
+		f.write(content)
+
+def read(path):
+	with open(path, 'rb') as f:
+		return f.read()
+
+class DownloadFileTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.path = os.path.join(self.dir, 'release.zip')
+		self.server = None
+
+	def tearDown(self):
+		if self.server is not None:
+			self.server.close()
+
+		shutil.rmtree(self.dir)
+
+	def serve(self, *responses):
+		self.server = HTTPStandIn(responses).start()
+
+		return self.server.getUrl('/zipball/v1.1.0')
+
+	def interrupted(self, content, validator='"v1"'):
+		"""Leaves a partial download behind, as a previous attempt would have"""
+		write(self.path + '.part', content)
+
+		with open(self.path + '.part.json', 'w') as f:
+			json.dump({'url':'', 'validator':validator}, f)
+
+	def testResumesWithRange(self):
+		self.interrupted(CONTENT[:1000])
+		url = self.serve((206, {'ETag':'"v1"'}, CONTENT[1000:]))
+		progress = []
+
+		downloadFile(url, self.path, chunkSize=500, onProgress=lambda done, total: progress.append((done, total)))
+		headers = self.server.requests[0]['headers']
+
+		self.assertEqual((headers.get('range'), headers.get('if-range')), ('bytes=1000-', '"v1"'))
+		self.assertEqual(read(self.path), CONTENT)
+		self.assertEqual(progress[0], (1500, len(CONTENT)))
+		self.assertEqual(os.listdir(self.dir), ['release.zip']) # The part and its metadata are removed
+
+	def testResumesAfterDroppedConnection(self):
+		url = self.serve((200, {'ETag':'"v1"', 'Content-Length':str(len(CONTENT))}, CONTENT[:1000]), (206, {'ETag':'"v1"'}, CONTENT[1000:]))
+
+		downloadFile(url, self.path, retries=1)
+
+		self.assertEqual(self.server.requests[0]['headers'].get('range'), None)
+		self.assertEqual(self.server.requests[1]['headers'].get('range'), 'bytes=1000-')
+		self.assertEqual(read(self.path), CONTENT)
+
+	def testFailsAfterRetries(self):
+		url = self.serve((200, {'Content-Length':str(len(CONTENT))}, CONTENT[:1000]))
+
+		with self.assertRaises(IOError):
+			downloadFile(url, self.path, retries=0)
+
+		self.assertFalse(os.path.exists(self.path))
+
+	def testChangedFileStartsOver(self):
+		self.interrupted(CONTENT[:1000])
+		url = self.serve((200, {'ETag':'"v2"'}, CONTENT)) # If-Range didn't match, so the whole file is sent
+
+		downloadFile(url, self.path)
+
+		self.assertEqual(self.server.requests[0]['headers'].get('if-range'), '"v1"')
+		self.assertEqual(read(self.path), CONTENT)
+
+	def testUnsatisfiableRangeStartsOver(self):
+		self.interrupted(CONTENT + b'0' * 10) # Longer than the file is now
+		url = self.serve((416, {}, b''), (200, {'ETag':'"v2"'}, CONTENT))
+
+		downloadFile(url, self.path)
+
+		self.assertEqual(self.server.requests[0]['headers'].get('range'), 'bytes={}-'.format(len(CONTENT) + 10))
+		self.assertNotIn('range', self.server.requests[1]['headers'])
+		self.assertEqual(read(self.path), CONTENT)
+
+	def testPartWithoutValidatorStartsOver(self):
+		self.interrupted(CONTENT[:1000], validator=None)
+		url = self.serve((200, {}, CONTENT))
+
+		downloadFile(url, self.path)
+
+		self.assertNotIn('range', self.server.requests[0]['headers'])
+		self.assertEqual(read(self.path), CONTENT)
+
+class InstallTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.installDir = os.path.join(self.dir, 'SDMTools')
+		self.stagingDir = os.path.join(self.dir, 'staging')
+		self.archivePath = os.path.join(self.dir, 'release.zip')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def release(self, files):
+		with zipfile.ZipFile(self.archivePath, 'w', zipfile.ZIP_DEFLATED) as archive:
+			archive.writestr(TOP, b'')
+
+			for relPath, content in files.items():
+				archive.writestr(TOP + relPath, content)
+
+	def install(self, files):
+		for relPath, content in files.items():
+			write(os.path.join(self.installDir, relPath), content)
+
+	def testUnchangedFilesAreLinked(self):
+		self.install({'houdini/a.txt':b'unchanged', 'python/b.py':b'version = 1', 'python/c.py':b'c'})
+		self.release({'houdini/a.txt':b'unchanged', 'python/b.py':b'version = 2', 'python/c.py':b'cc', 'python/d.py':b'new', '../outside.txt':b'x'})
+		progress = []
+
+		extracted, unchanged = extractRelease(self.archivePath, self.installDir, self.stagingDir, onProgress=lambda done, total: progress.append(total))
+		staged = lambda relPath: os.path.join(self.stagingDir, relPath)
+
+		self.assertEqual((extracted, unchanged), (3, 1)) # b.py is the same size, but not the same CRC-32
+		self.assertTrue(os.path.samefile(staged('houdini/a.txt'), os.path.join(self.installDir, 'houdini/a.txt')))
+		self.assertEqual([read(staged(relPath)) for relPath in ('python/b.py', 'python/c.py', 'python/d.py')], [b'version = 2', b'cc', b'new'])
+		self.assertFalse(os.path.samefile(staged('python/b.py'), os.path.join(self.installDir, 'python/b.py')))
+		self.assertFalse(os.path.exists(os.path.join(self.dir, 'outside.txt')))
+		self.assertEqual(progress, [6] * 4) # Reported for each file, out of every member
+
+	def testFileCrcMatchesArchive(self):
+		self.install({'a.bin':CONTENT})
+		self.release({'a.bin':CONTENT})
+
+		with zipfile.ZipFile(self.archivePath) as archive:
+			self.assertEqual(getFileCrc(os.path.join(self.installDir, 'a.bin'), chunkSize=100), archive.getinfo(TOP + 'a.bin').CRC)
+
+	def testSwapDirectories(self):
+		self.install({'old.txt':b'old'})
+		write(os.path.join(self.stagingDir, 'new.txt'), b'new')
+
+		swapDirectories(self.stagingDir, self.installDir)
+
+		self.assertEqual(os.listdir(self.installDir), ['new.txt'])
+		self.assertEqual(sorted(os.listdir(self.dir)), ['SDMTools']) # The old install is removed
+
+	def testSwapRollsBack(self):
+		self.install({'old.txt':b'old'})
+
+		with self.assertRaises(OSError):
+			swapDirectories(self.stagingDir, self.installDir) # Never staged
+
+		self.assertEqual(os.listdir(self.installDir), ['old.txt'])
+		self.assertEqual(sorted(os.listdir(self.dir)), ['SDMTools'])
+
+	def testSettingsAreMerged(self):
+		settingsPath = os.path.join('houdini', 'settings.json')
+		transforms = {settingsPath:mergeSettingsTransform('v1.1.0', True)}
+		self.install({settingsPath:json.dumps({'version':'v1.0.0', 'backgroundSessions':4, 'custom':'kept'}).encode('utf-8')})
+		self.release({'houdini/settings.json':json.dumps({'version':'v1.1.0', 'backgroundSessions':2, 'disabledTools':[]}).encode('utf-8')})
+
+		self.assertEqual(extractRelease(self.archivePath, self.installDir, self.stagingDir, transforms=transforms), (1, 0))
+
+		with open(os.path.join(self.stagingDir, settingsPath)) as f:
+			self.assertEqual(json.load(f), {'version':'v1.1.0', 'autoCheckUpdates':True, 'backgroundSessions':4, 'custom':'kept', 'disabledTools':[]})
+
+	def testForcedSettingsOverwrite(self):
+		transform = mergeSettingsTransform('v1.1.0', False)
+		content = json.dumps({'forceOverwrite':True, 'backgroundSessions':2}).encode('utf-8')
+		self.install({'settings.json':b'{"backgroundSessions": 4}'})
+
+		self.assertEqual(transform(content, os.path.join(self.installDir, 'settings.json')), content)
+		self.assertEqual(json.loads(transform(b'{"a": 1}', os.path.join(self.dir, 'missing.json')).decode('utf-8')), {'a':1, 'version':'v1.1.0', 'autoCheckUpdates':False})
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,87 @@
+import os, sys, time, shutil, logging, tempfile, threading, unittest
+
+try:
+	from StringIO import StringIO
+except ImportError: # Python 3
+	from io import StringIO
+
+import sdm.houdini
+from sdm.houdini import DeferredLoggingHandler
+
+class RecordingHandler(DeferredLoggingHandler):
+	def __init__(self, target):
+		DeferredLoggingHandler.__init__(self, target)
+		self.errors = []
+
+	def handleError(self, record):
+		self.errors.append(record)
+
+class DeferredLoggingHandlerTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.target = logging.getLogger('sdmtest')
+		self.rootHandlers = list(logging.getLogger().handlers)
+		self.saved = (sdm.houdini.folder, sdm.houdini.logDir, sdm.houdini.configureLogging)
+
+		sdm.houdini.folder = self.dir
+		sdm.houdini.logDir = os.path.join(self.dir, 'logs')
+
+	def tearDown(self):
+		sdm.houdini.folder, sdm.houdini.logDir, sdm.houdini.configureLogging = self.saved
+		root = logging.getLogger()
+
+		for handler in list(root.handlers):
+			if handler not in self.rootHandlers:
+				root.removeHandler(handler)
+				handler.close()
+
+		self.target.handlers = []
+		shutil.rmtree(self.dir)
+
+	def install(self):
+		handler = RecordingHandler(self.target)
+		self.target.setLevel(logging.DEBUG)
+		self.target.addHandler(handler)
+
+		return handler
+
+	def testMalformedConfigFallsBack(self):
+		with open(os.path.join(self.dir, 'logging.json'), 'w') as f:
+			f.write('{"handlers": ')
+
+		handler = self.install()
+		stderr = sys.stderr
+		sys.stderr = StringIO() # Where the fallback configuration logs to, rather than the test output
+
+		try:
+			self.target.info('First record') # Must not raise
+		finally:
+			sys.stderr = stderr
+
+		self.assertEqual([r.getMessage() for r in handler.errors], ['First record'])
+		self.assertNotIn(handler, self.target.handlers)
+		self.assertTrue(logging.getLogger().handlers)
+
+	def testConfiguredOnceAcrossThreads(self):
+		calls = []
+
+		def configure():
+			calls.append(threading.current_thread().name)
+			time.sleep(0.2) # Long enough for the other threads to emit meanwhile
+
+		sdm.houdini.configureLogging = configure
+		handler = self.install()
+		record = self.target.makeRecord('sdmtest', logging.INFO, __file__, 0, 'Record', (), None)
+		threads = [threading.Thread(target=handler.handle, args=(record,)) for i in range(8)]
+
+		for thread in threads:
+			thread.start()
+
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(handler.errors, [])
+
+if __name__ == '__main__':
+	unittest.main()
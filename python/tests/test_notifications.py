@@ -0,0 +1,154 @@
+import os, json, time, base64, shutil, tempfile, threading, unittest
+
+from sdm.houdini import notifications
+from sdm.houdini.fileutils import SettingsFile
+from sdm.houdini.notifications import Notification, NotificationDispatcher, NotificationError, NotificationType, Transport, WebhookTransport, getDispatchers, notify, registerTransport
+
+from tests.standins import HTTPStandIn, SMTPStandIn
+
+def waitFor(condition, timeout=5):
+	deadline = time.time() + timeout
+
+	while not condition() and time.time() < deadline:
+		time.sleep(0.02)
+
+	return condition()
+
+def getDispatcherThreads():
+	return [t for t in threading.enumerate() if t.name == 'NotificationDispatcher']
+
+class SMTPNotificationTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.servers = [SMTPStandIn().start(), SMTPStandIn().start()]
+		self.environ = dict(os.environ)
+
+		with open(os.path.join(self.dir, 'settings.json'), 'w') as f:
+			json.dump({
+				'notificationTransports': ['smtp'],
+				'notificationEmail': 'artist@example.com',
+				'notificationPassword': base64.b64encode(b'password').decode('utf-8'),
+				'notificationSmtpHost': '127.0.0.1',
+				'notificationSmtpPort': self.servers[0].getPort(),
+				'notificationSmtpTls': False
+			}, f)
+
+		os.environ['SDMTOOLS_USER_SETTINGS'] = self.dir
+		notifications._dispatchers = None
+
+	def tearDown(self):
+		notifications.resetDispatchers()
+		waitFor(lambda: not getDispatcherThreads())
+
+		for server in self.servers:
+			server.close()
+
+		os.environ.clear()
+		os.environ.update(self.environ)
+		shutil.rmtree(self.dir)
+
+	def notification(self, node='/out/cache'):
+		return Notification(NotificationType.ROP_COMPLETE, node=node, duration=65)
+
+	def testDigestOfCoalescedNotifications(self):
+		notify(self.notification('/out/a'))
+		notify(self.notification('/out/b'))
+		getDispatchers()[0].flush(timeout=5)
+
+		self.assertEqual(len(self.servers[0].messages), 1)
+		self.assertIn('2 notifications', self.servers[0].messages[0])
+		self.assertIn('/out/b', self.servers[0].messages[0])
+
+	def testSettingsChangeStopsOldDispatchers(self):
+		for i in range(3):
+			notify(self.notification())
+			old = getDispatchers()[0]
+
+			settings = SettingsFile()
+			settings.set('notificationSmtpPort', self.servers[(i + 1) % 2].getPort())
+			settings.write()
+
+			# The queued notification is still delivered, then the thread ends and the connection is closed
+			self.assertTrue(waitFor(lambda: not old.isRunning()))
+			self.assertEqual(sum(len(server.messages) for server in self.servers), i + 1)
+			self.assertTrue(waitFor(lambda: all(server.quits == server.connections for server in self.servers)))
+			self.assertIsNot(getDispatchers()[0], old)
+
+		self.assertEqual(getDispatcherThreads(), [])
+
+		sent = len(self.servers[1].messages)
+		notify(self.notification())
+		getDispatchers()[0].flush(timeout=5)
+
+		self.assertEqual(len(self.servers[1].messages), sent + 1) # Sent with the last port set
+		self.assertEqual(len(getDispatcherThreads()), 1)
+
+	def testSubmitAfterStopIsDelivered(self):
+		dispatcher = getDispatchers()[0]
+		dispatcher.submit(self.notification('/out/a'))
+		dispatcher.stop()
+		dispatcher.submit(self.notification('/out/b'))
+
+		self.assertTrue(waitFor(lambda: len(self.servers[0].messages) == 2 or (len(self.servers[0].messages) == 1 and '/out/b' in self.servers[0].messages[0])))
+		self.assertTrue(waitFor(lambda: not dispatcher.isRunning()))
+
+class TransportTest(unittest.TestCase):
+	def testSendIsAbstract(self):
+		class Incomplete(Transport): pass
+
+		with self.assertRaises(TypeError):
+			Incomplete()
+
+	def testRegisterRequiresTransport(self):
+		with self.assertRaises(TypeError):
+			registerTransport('bad', object)
+
+class WebhookTransportTest(unittest.TestCase):
+	def setUp(self):
+		self.server = None
+
+	def tearDown(self):
+		if self.server is not None:
+			self.server.close()
+
+	def serve(self, *responses):
+		self.server = HTTPStandIn(responses).start()
+
+		return WebhookTransport(self.server.getUrl('/hooks/sdm'), timeout=5)
+
+	def testPostsNotificationsAsJson(self):
+		transport = self.serve((204, {}, b''))
+		transport.send([Notification(NotificationType.ROP_COMPLETE, node='/out/a', outputBytes=1024), Notification(NotificationType.ROP_FAILED, node='/out/b')])
+		request = self.server.requests[0]
+		payload = json.loads(request['body'].decode('utf-8'))
+
+		self.assertEqual((request['method'], request['path']), ('POST', '/hooks/sdm'))
+		self.assertEqual(request['headers'].get('content-type'), 'application/json')
+		self.assertEqual([(n['type'], n['node']) for n in payload['notifications']], [('ropComplete', '/out/a'), ('ropFailed', '/out/b')])
+		self.assertEqual(payload['notifications'][0]['outputBytes'], 1024)
+
+	def testServerErrorsAreRetried(self):
+		dispatcher = NotificationDispatcher(self.serve((503, {}, b''), (503, {}, b''), (200, {}, b'')), backoffSeconds=0.01)
+		dispatcher.submit(Notification(NotificationType.ROP_COMPLETE, node='/out/a'))
+		dispatcher.flush(timeout=5)
+		dispatcher.stop(timeout=5)
+
+		self.assertEqual(len(self.server.requests), 3)
+		self.assertEqual(dispatcher.getSentCount(), 1)
+
+	def testRefusedRequestsAreNotRetried(self):
+		transport = self.serve((403, {}, b''))
+
+		with self.assertRaises(NotificationError):
+			transport.send([Notification(NotificationType.ROP_COMPLETE)])
+
+		dispatcher = NotificationDispatcher(transport, backoffSeconds=0.01)
+		dispatcher.submit(Notification(NotificationType.ROP_COMPLETE))
+		dispatcher.flush(timeout=5)
+		dispatcher.stop(timeout=5)
+
+		self.assertEqual(len(self.server.requests), 2)
+		self.assertEqual(dispatcher.getSentCount(), 0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,251 @@
+import os, shutil, tempfile, unittest
+
+import hou
+
+from sdm.houdini import references
+from sdm.houdini.references import FileReferenceIndex, getLiveReferenceIndex
+from sdm.houdini.fileutils import getAllFileReferences
+
+SCENE_SIZE = int(os.environ.get('SDM_TEST_SCENE_SIZE', 500))
+
+def buildScene(numNodes, texDir, numFiles=50, regularParms=20):
+	"""Builds a synthetic scene of shader nodes, each with a texture referencing one of
+	numFiles files in texDir, an empty texture parm and a number of regular parms
+
+	Returns:
+		hou.Node: The parent of the shaders
+	"""
+	parent = hou.Node('mat', hou.node('/'), 'matnet')
+
+	for i in range(numNodes):
+		node = hou.Node('shader{}'.format(i), parent, 'principledshader')
+
+		for j in range(regularParms):
+			node.addParm(hou.FloatParmTemplate('p{}'.format(j)), 0.5)
+
+		node.addParm(hou.StringParmTemplate('basecolor_texture', hou.stringParmType.FileReference), os.path.join(texDir, 'tex{}.rat'.format(i % numFiles)))
+		node.addParm(hou.StringParmTemplate('rough_texture', hou.stringParmType.FileReference), '')
+		node.addParm(hou.StringParmTemplate('label', hou.stringParmType.Regular), 'label')
+
+	return parent
+
+def makeFiles(dir, count, pattern='tex{}.rat'):
+	if not os.path.isdir(dir):
+		os.makedirs(dir)
+
+	for i in range(count):
+		open(os.path.join(dir, pattern.format(i)), 'w').close()
+
+class FileReferenceIndexTest(unittest.TestCase):
+	def setUp(self):
+		self.hip = tempfile.mkdtemp()
+		self.texDir = os.path.join(self.hip, 'tex')
+
+		hou.reset(hip=self.hip)
+		FileReferenceIndex.clearTypeCache()
+		makeFiles(self.texDir, 40) # tex40-49 are referenced but missing
+
+	def tearDown(self):
+		references._liveIndex = None
+		shutil.rmtree(self.hip)
+
+	def testGroupsExistingReferencesByPath(self):
+		buildScene(SCENE_SIZE, self.texDir)
+		index = FileReferenceIndex().build()
+		refs = index.getReferences()
+
+		self.assertEqual(set(refs), set(os.path.join(self.texDir, 'tex{}.rat'.format(i)) for i in range(40)))
+		self.assertEqual(sum(len(parms) for parms in refs.values()), len([i for i in range(SCENE_SIZE) if i % 50 < 40]))
+
+		for path, parms in refs.items():
+			for parm in parms:
+				self.assertEqual(parm.name(), 'basecolor_texture')
+				self.assertEqual(parm.evalAsString(), path)
+
+	def testTemplatesCheckedOncePerType(self):
+		buildScene(SCENE_SIZE, self.texDir)
+		FileReferenceIndex().build()
+
+		self.assertEqual(hou.stats['parmTemplate'], 23)
+
+		FileReferenceIndex().build() # Shared by all indexes
+
+		self.assertEqual(hou.stats['parmTemplate'], 23)
+
+	def testSpareParmsCheckedPerNode(self):
+		parent = buildScene(3, self.texDir)
+
+		for node in parent.children():
+			node.addParm(hou.StringParmTemplate('extra', hou.stringParmType.FileReference), os.path.join(self.texDir, 'tex0.rat'), spare=True)
+
+		parent.children()[0].addParm(hou.StringParmTemplate('other', hou.stringParmType.Regular), os.path.join(self.texDir, 'tex1.rat'), spare=True)
+		index = FileReferenceIndex().build()
+
+		self.assertEqual(len(index.getParms(os.path.join(self.texDir, 'tex0.rat'))), 4)
+		self.assertEqual(len(index.getParms(os.path.join(self.texDir, 'tex1.rat'))), 1)
+		self.assertEqual(hou.stats['parmTemplate'], 23 + 4)
+
+	def testOnlyFilesUnderHip(self):
+		outside = tempfile.mkdtemp()
+
+		try:
+			makeFiles(outside, 1)
+			node = hou.Node('shader', hou.node('/'), 'principledshader')
+			node.addParm(hou.StringParmTemplate('basecolor_texture', hou.stringParmType.FileReference), os.path.join(outside, 'tex0.rat'))
+
+			self.assertEqual(FileReferenceIndex().build().getPaths(), [])
+			self.assertEqual(FileReferenceIndex(hipOnly=False).build().getPaths(), [os.path.join(outside, 'tex0.rat')])
+		finally:
+			shutil.rmtree(outside)
+
+	def testFilterExisting(self):
+		index = FileReferenceIndex()
+		few = [os.path.join(self.texDir, 'tex{}.rat'.format(i)) for i in (0, 1, 45)]
+		many = [os.path.join(self.texDir, 'tex{}.rat'.format(i)) for i in range(50)]
+
+		self.assertTrue(len(few) < FileReferenceIndex.LIST_DIR_THRESHOLD <= len(many))
+		self.assertEqual(index.filterExisting(few), set(few[:2]))
+		self.assertEqual(index.filterExisting(many), set(many[:40]))
+		self.assertEqual(index.filterExisting([self.texDir, os.path.join(self.hip, 'missing', 'tex0.rat')]), set())
+
+	def testMatchesFullTraversal(self):
+		buildScene(SCENE_SIZE, self.texDir)
+		expected = []
+
+		for node in hou.node('/').allSubChildren():
+			for parm in node.globParms('*'):
+				template = parm.parmTemplate()
+
+				if isinstance(template, hou.StringParmTemplate) and template.stringType() == hou.stringParmType.FileReference:
+					val = parm.evalAsString()
+
+					if val and os.path.isfile(val) and val.startswith(self.hip):
+						expected.append((parm.path(), val))
+
+		self.assertEqual(sorted((parm.path(), val) for parm, val in getAllFileReferences()), sorted(expected))
+
+class LiveReferenceIndexTest(unittest.TestCase):
+	def setUp(self):
+		self.hip = tempfile.mkdtemp()
+		self.texDir = os.path.join(self.hip, 'tex')
+
+		hou.reset(hip=self.hip)
+		FileReferenceIndex.clearTypeCache()
+		makeFiles(self.texDir, 10)
+
+		references._liveIndex = None
+		self.parent = buildScene(20, self.texDir, numFiles=10)
+		self.index = getLiveReferenceIndex()
+
+	def tearDown(self):
+		self.index.unwatch()
+		references._liveIndex = None
+		shutil.rmtree(self.hip)
+
+	def tex(self, i):
+		return os.path.join(self.texDir, 'tex{}.rat'.format(i))
+
+	def testParmChangesEvaluateOnlyChangedNodes(self):
+		node = self.parent.children()[0]
+		self.index.getPaths()
+		evaluated = hou.stats['evalAsString']
+
+		node.parm('rough_texture').set(self.tex(5))
+		node.parm('basecolor_texture').set(self.tex(4))
+		node.parm('p0').set(1.0) # Not a file parameter
+
+		self.assertEqual(self.index.getParms(self.tex(5))[-1], node.parm('rough_texture'))
+		self.assertEqual(len(self.index.getParms(self.tex(5))), 3)
+		self.assertIn(node.parm('basecolor_texture'), self.index.getParms(self.tex(4)))
+		self.assertNotIn(node.parm('basecolor_texture'), self.index.getParms(self.tex(0)))
+		self.assertEqual(hou.stats['evalAsString'] - evaluated, 2) # Only the file parameters of the changed node
+
+		for i in range(3):
+			self.index.getPaths()
+
+		self.assertEqual(hou.stats['evalAsString'] - evaluated, 2)
+
+	def testFilesCreatedAndDeletedAfterIndexing(self):
+		node = self.parent.children()[0]
+		node.parm('rough_texture').set(self.tex(99))
+
+		self.assertNotIn(self.tex(99), self.index.getPaths())
+
+		makeFiles(self.texDir, 1, pattern='tex99.rat')
+		os.remove(self.tex(3))
+
+		self.assertIn(self.tex(3), self.index.getPaths()) # Without a parameter change, files are checked on refresh
+
+		paths = self.index.refresh().getPaths()
+
+		self.assertIn(self.tex(99), paths)
+		self.assertNotIn(self.tex(3), paths)
+
+	def testExpressionDrivenPaths(self):
+		frame = [1]
+		node = self.parent.children()[0]
+		node.parm('basecolor_texture').set(lambda: os.path.join('$HIP', 'tex', 'tex{}.rat'.format(frame[0])))
+
+		self.assertIn(node.parm('basecolor_texture'), self.index.getReferences()[self.tex(1)])
+
+		frame[0] = 7 # Changes without an event, so it is picked up on refresh
+		self.index.refresh()
+
+		self.assertIn(node.parm('basecolor_texture'), self.index.getReferences()[self.tex(7)])
+		self.assertNotIn(node.parm('basecolor_texture'), self.index.getReferences()[self.tex(1)])
+
+	def testSaveAs(self):
+		self.assertEqual(len(self.index.getPaths()), 10)
+
+		newHip = tempfile.mkdtemp()
+
+		try:
+			hou.hipFile.save(os.path.join(newHip, 'scene.hip')) # Textures are no longer under $HIP
+
+			self.assertEqual(self.index.getParms(self.tex(0)), [])
+			self.assertEqual(self.index.getPaths(), [])
+		finally:
+			shutil.rmtree(newHip)
+
+	def testNodesCreatedAndDeleted(self):
+		subnet = hou.Node('extra', self.parent, 'subnet')
+		node = hou.Node('shader', subnet, 'othershader', parms=[(hou.StringParmTemplate('tex', hou.stringParmType.FileReference), self.tex(0))])
+
+		self.assertIn(node.parm('tex'), self.index.getReferences()[self.tex(0)])
+
+		node.addParm(hou.StringParmTemplate('spare_texture', hou.stringParmType.FileReference), self.tex(1), spare=True)
+
+		self.assertIn(node.parm('spare_texture'), self.index.getReferences()[self.tex(1)])
+
+		deleted = self.parent.children()[0]
+		deleted.destroy()
+		subnet.destroy()
+
+		self.assertEqual(len(self.index.getParms(self.tex(1))), 2) # Removed from the last results as well
+		self.assertNotIn(deleted.parm('basecolor_texture'), self.index.getParms(self.tex(0)))
+		self.assertEqual(len(self.index.getReferences()[self.tex(0)]), 1)
+
+	def testSceneLoadRebuilds(self):
+		self.parent.destroy()
+		hou.hipFile.fire(hou.hipFileEventType.AfterLoad)
+		buildScene(5, self.texDir, numFiles=10)
+
+		self.assertEqual(len(self.index.getPaths()), 5)
+
+	def testTemplatesNotCheckedOnQuery(self):
+		self.index.getPaths()
+		checked = hou.stats['parmTemplate']
+
+		for i in range(3):
+			self.index.getPaths()
+
+		self.assertEqual(hou.stats['parmTemplate'], checked)
+
+	def testGetAllFileReferencesIsFresh(self):
+		self.index.unwatch() # No events, a traversal is needed to find the node
+		node = hou.Node('extra', self.parent, 'principledshader', parms=[(hou.StringParmTemplate('basecolor_texture', hou.stringParmType.FileReference), self.tex(0))])
+
+		self.assertIn((node.parm('basecolor_texture'), self.tex(0)), getAllFileReferences())
+
+if __name__ == '__main__':
+	unittest.main()
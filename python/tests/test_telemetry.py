@@ -0,0 +1,151 @@
+import os, sys, shutil, tempfile, unittest
+
+import hou
+
+from sdm.utils import getCurrentMemory, getPeakMemory
+from sdm.houdini.telemetry import RopTelemetry, RunProfile, TelemetryStore, executeRop
+
+MB = 1024 * 1024
+
+class FakeRop(hou.RopNode):
+	"""A ROP with render event callbacks, allocating the given number of megabytes per frame"""
+
+	def __init__(self, name, parent):
+		hou.RopNode.__init__(self, name, parent, 'rop_geometry')
+		self.renderCallbacks = []
+		self.kept = []
+
+	def addRenderEventCallback(self, callback):
+		self.renderCallbacks.append(callback)
+
+	def removeRenderEventCallback(self, callback):
+		self.renderCallbacks.remove(callback)
+
+	def render(self, allocations):
+		for i, megabytes in enumerate(allocations):
+			time = i / 24.0
+
+			for callback in list(self.renderCallbacks):
+				callback(self, hou.ropRenderEventType.PreFrame, time)
+
+			self.kept.append(b'\x01' * (megabytes * MB)) # Filled, so the pages are resident
+
+			for callback in list(self.renderCallbacks):
+				callback(self, hou.ropRenderEventType.PostFrame, time)
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'Current memory is only available on Linux')
+class FrameMemoryTest(unittest.TestCase):
+	def setUp(self):
+		hou.reset()
+
+	def testPerFrameMemory(self):
+		baseline = getCurrentMemory()
+		peak = getPeakMemory()
+		rop = FakeRop('cache', hou.node('/'))
+		telemetry = RopTelemetry(rop)
+		telemetry.start()
+
+		rop.render([40, 0, 30]) # Kept, so resident memory only grows
+		profile = telemetry.finish()
+		memory = profile.getFrameValues('memory')
+		increase = profile.getFrameValues('peakIncrease')
+		slack = 8 * MB
+
+		self.assertGreater(memory[1], baseline + 40 * MB - slack)
+		self.assertLess(abs(memory[2] - memory[1]), slack)
+		self.assertGreater(memory[3], memory[1] + 30 * MB - slack)
+
+		# Frames only raise the peak by what they allocate beyond the earlier peak
+		self.assertTrue(all(0 <= increase[f] < megabytes * MB + slack for f, megabytes in ((1, 40), (2, 0), (3, 30))))
+		self.assertGreater(sum(increase.values()), baseline + 70 * MB - peak - slack)
+
+		rop.kept = []
+
+	def testColumnsRoundTrip(self):
+		profile = RunProfile()
+		profile.addFrame(1, seconds=1.5, memory=100 * MB, peakIncrease=0)
+		profile.finish(1.5, 1.0, 200 * MB)
+		loaded = RunProfile(profile.toDict())
+
+		self.assertEqual(loaded.getFrameValues('memory'), {1: 100 * MB})
+		self.assertEqual(loaded.getFrameValues('peakIncrease'), {1: 0})
+		self.assertEqual(loaded.getPeakMemory(), 200 * MB)
+
+def makeRun(times, status=RunProfile.COMPLETE):
+	profile = RunProfile()
+
+	for frame, seconds in enumerate(times, 1):
+		profile.addFrame(frame, seconds=seconds)
+
+	profile.finish(sum(times), sum(times), 100 * MB, status)
+
+	return profile
+
+class TelemetryStoreTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.environ = dict(os.environ)
+
+		os.environ['SDM_CACHE_DIR'] = self.dir
+		hou.reset(hip=self.dir)
+		self.node = hou.Node('cache', hou.node('/'), 'rop_geometry')
+
+	def tearDown(self):
+		os.environ.clear()
+		os.environ.update(self.environ)
+		shutil.rmtree(self.dir)
+
+	def store(self, **kwargs):
+		return TelemetryStore(self.node, path=os.path.join(self.dir, 'telemetry.json'), **kwargs)
+
+	def testTwoRuns(self):
+		store = self.store()
+		store.addRun(makeRun([1.0, 1.0, 1.0, 1.0]))
+		store.addRun(makeRun([1.0, 3.0, 1.0, 1.1]))
+		store = self.store() # Loaded from disk
+		regression = store.getRegression(threshold=1.25)
+
+		self.assertEqual(len(store.getRuns()), 2)
+		self.assertEqual(store.getSlowestFrames(2), [(2, 3.0), (4, 1.1)])
+		self.assertAlmostEqual(regression['duration'], 6.1 / 4)
+		self.assertEqual(regression['frames'], [(2, 3.0, 1.0)]) # Frame 4 is within the threshold
+		self.assertEqual(store.getSlowestFrames(1, run=store.getRuns()[0]), [(1, 1.0)])
+		self.assertIsNone(store.getRegression(run=store.getRuns()[0])) # Nothing before it
+
+		# Frame 1 is taking twice as long as in the last run, so are frames 3 and 4 expected to
+		self.assertAlmostEqual(store.projectRemainingTime([3, 4], {1:2.0}), (1.0 + 1.1) * 2)
+		self.assertAlmostEqual(store.projectRemainingTime([5], {1:1.0}), 6.1 / 4) # Unknown frames take the average
+
+	def testProjectionWithoutHistory(self):
+		self.assertEqual(self.store().projectRemainingTime([3, 4, 5], {1:2.0, 2:4.0}), 9.0)
+		self.assertEqual(self.store().projectRemainingTime([3], {}), 0)
+
+	def testFailedRunsAreNotCompared(self):
+		store = self.store(maxRuns=2)
+		store.addRun(makeRun([5.0]))
+		store.addRun(makeRun([1.0]))
+		store.addRun(makeRun([9.0], status=RunProfile.FAILED))
+
+		self.assertEqual(len(store.getRuns()), 2) # The oldest was dropped
+		self.assertEqual(store.getLastRun().getDuration(), 1.0)
+		self.assertIsNone(store.getRegression())
+
+	def testExecuteRopRecordsRuns(self):
+		kwargs = {'node':self.node}
+
+		profile = executeRop(self.node, "kwargs['executed'] = True", kwargs)
+
+		self.assertTrue(kwargs['executed'])
+		self.assertTrue(profile.isComplete())
+
+		with self.assertRaises(RuntimeError):
+			executeRop(self.node, "raise RuntimeError('Cook failed')")
+
+		store = TelemetryStore(self.node) # In the cache directory
+		runs = store.getRuns()
+
+		self.assertEqual([run.getStatus() for run in runs], [RunProfile.COMPLETE, RunProfile.FAILED])
+		self.assertEqual(store.getLastRun().toDict(), runs[0].toDict()) # The failed run isn't compared against
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,116 @@
+import os, json, shutil, tempfile, unittest
+
+from sdm.houdini.updates import checkForUpdatesInBackground, fetchReleases
+
+from tests.standins import HTTPStandIn
+
+RELEASES = [{'tag_name': 'v1.2.0'}, {'tag_name': 'v1.0.0'}]
+
+def ok(releases, etag='"abc"'):
+	return (200, {'Content-Type': 'application/json', 'ETag': etag, 'Last-Modified': 'Sat, 17 Oct 2026 10:00:00 GMT'}, json.dumps(releases).encode('utf-8'))
+
+NOT_MODIFIED = (304, {'ETag': '"abc"'}, b'')
+
+class FetchReleasesTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.cachePath = os.path.join(self.dir, 'releases.json')
+		self.server = None
+
+	def tearDown(self):
+		if self.server is not None:
+			self.server.close()
+
+		shutil.rmtree(self.dir)
+
+	def serve(self, *responses):
+		self.server = HTTPStandIn(responses).start()
+
+		return self.server.getUrl('/releases')
+
+	def fetch(self, url, maxAge):
+		return fetchReleases(url, maxAge=maxAge, cachePath=self.cachePath, timeout=5)
+
+	def readCache(self):
+		with open(self.cachePath) as f:
+			return json.load(f)
+
+	def testNotModifiedReusesCache(self):
+		url = self.serve(ok(RELEASES), NOT_MODIFIED)
+
+		self.assertEqual(self.fetch(url, 0), RELEASES)
+
+		fetched = self.readCache()['fetched']
+
+		self.assertEqual(self.fetch(url, 0), RELEASES)
+		self.assertEqual(len(self.server.requests), 2)
+		self.assertNotIn('if-none-match', self.server.requests[0]['headers'])
+		self.assertEqual(self.server.requests[1]['headers'].get('if-none-match'), '"abc"')
+		self.assertEqual(self.server.requests[1]['headers'].get('if-modified-since'), 'Sat, 17 Oct 2026 10:00:00 GMT')
+		self.assertGreaterEqual(self.readCache()['fetched'], fetched) # Counts as fresh again
+
+	def testMaxAgeSkipsRequest(self):
+		url = self.serve(ok(RELEASES))
+
+		self.fetch(url, 3600)
+
+		self.assertEqual(self.fetch(url, 3600), RELEASES)
+		self.assertEqual(len(self.server.requests), 1)
+
+	def testChangedReleasesReplaceCache(self):
+		changed = [{'tag_name': 'v1.3.0'}] + RELEASES
+		url = self.serve(ok(RELEASES), ok(changed, etag='"def"'))
+
+		self.fetch(url, 0)
+
+		self.assertEqual(self.fetch(url, 0), changed)
+		self.assertEqual(self.readCache()['etag'], '"def"')
+
+	def testUnreachableServerUsesCache(self):
+		url = self.serve(ok(RELEASES))
+		self.fetch(url, 0)
+		self.server.close()
+		self.server = None
+
+		self.assertEqual(self.fetch(url, 0), RELEASES)
+
+		os.remove(self.cachePath)
+
+		with self.assertRaises(IOError):
+			self.fetch(url, 0)
+
+	def testCacheIsPerUrl(self):
+		url = self.serve(ok(RELEASES))
+		self.fetch(url, 3600)
+		self.fetch(url + '?other', 3600)
+
+		self.assertEqual(len(self.server.requests), 2)
+
+class CheckForUpdatesTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.environ = dict(os.environ)
+		self.server = HTTPStandIn([ok(RELEASES)]).start()
+
+		os.environ['SDM_CACHE_DIR'] = self.dir
+
+	def tearDown(self):
+		self.server.close()
+		os.environ.clear()
+		os.environ.update(self.environ)
+		shutil.rmtree(self.dir)
+
+	def check(self, currentVersion):
+		found = []
+		thread = checkForUpdatesInBackground(lambda newVersions, releases: found.append(newVersions), currentVersion=currentVersion, maxAge=3600, url=self.server.getUrl('/releases'))
+		thread.join(10)
+
+		return found
+
+	def testNewerVersionsReported(self):
+		self.assertEqual(self.check('v1.0.0'), [[{'tag_name': 'v1.2.0'}]])
+		self.assertEqual(self.check('v1.2.0'), []) # From the cache
+		self.assertEqual(len(self.server.requests), 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,59 @@
+import os, json, stat, shutil, tempfile, unittest
+
+from sdm.utils import getUmask, writeFileAtomic
+from sdm.houdini.fileutils import SettingsFile
+
+def getPermissions(path):
+	return stat.S_IMODE(os.stat(path).st_mode)
+
+@unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+class WriteFileAtomicTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.umask = os.umask(0o002)
+
+	def tearDown(self):
+		os.umask(self.umask)
+		shutil.rmtree(self.dir)
+
+	def testGetUmask(self):
+		self.assertEqual(getUmask(), 0o002)
+		self.assertEqual(getUmask(), 0o002) # Unchanged by reading it
+
+	def testNewFileGetsDefaultPermissions(self):
+		path = os.path.join(self.dir, 'new.json')
+		writeFileAtomic(path, '{}')
+
+		self.assertEqual(getPermissions(path), 0o664)
+
+	def testKeepsPermissionsOfReplacedFile(self):
+		for permissions in (0o664, 0o644, 0o600):
+			path = os.path.join(self.dir, 'existing{:o}.json'.format(permissions))
+			open(path, 'w').close()
+			os.chmod(path, permissions)
+
+			writeFileAtomic(path, '{}')
+			writeFileAtomic(path, '{"a": 1}')
+
+			self.assertEqual(getPermissions(path), permissions)
+
+			with open(path) as f:
+				self.assertEqual(f.read(), '{"a": 1}')
+
+	def testSharedSettingsStayShared(self):
+		path = os.path.join(self.dir, 'settings.json')
+
+		with open(path, 'w') as f:
+			json.dump({'version': 'v1.0.0'}, f)
+
+		os.chmod(path, 0o666)
+		settings = SettingsFile(path)
+		settings.set('autoCheckUpdates', True)
+		settings.write()
+
+		self.assertEqual(getPermissions(path), 0o666)
+		self.assertEqual(SettingsFile(path).get('autoCheckUpdates'), True)
+		self.assertEqual([name for name in os.listdir(self.dir) if name.endswith('.tmp')], [])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,88 @@
+import os, shutil, tempfile, unittest
+
+from sdm.files.cache import ChecksumCache
+from sdm.files.fileclassification import Sequence
+from sdm.files.verification import FrameIssue, hashFile, verifySequence
+
+class VerifySequenceTest(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def path(self, frame):
+		return os.path.join(self.dir, 'beauty.{:04d}.exr'.format(frame))
+
+	def write(self, frame, size=1000):
+		with open(self.path(frame), 'wb') as f:
+			f.write(b'x' * size)
+
+	def sequence(self, frames):
+		return Sequence.fromFrameNumbers(self.dir, 'beauty', 4, 'exr', frames)
+
+	def testSizeOutliers(self):
+		for frame in range(1, 11):
+			self.write(frame)
+
+		self.write(3, size=0)
+		self.write(5, size=100)
+		self.write(8, size=5000)
+		report = verifySequence(self.sequence(range(1, 11)))
+
+		self.assertEqual(report.getIssues(), {3:FrameIssue.EMPTY, 5:FrameIssue.SMALL, 8:FrameIssue.LARGE})
+		self.assertEqual(report.getBadFrames(format=True), '3, 5, 8')
+		self.assertEqual(report.getSizes()[1], 1000)
+		self.assertFalse(report.isValid())
+
+	def testFramesGoneSinceListingAreMissing(self):
+		for frame in (1, 2, 4):
+			self.write(frame)
+
+		os.symlink(os.path.join(self.dir, 'gone'), self.path(3)) # Listed, but can't be stat'ed
+		report = verifySequence(self.sequence([1, 2, 3, 4, 5]))
+
+		self.assertEqual(report.getIssues(), {3:FrameIssue.MISSING, 5:FrameIssue.MISSING})
+		self.assertEqual(str(report.getRerenderFrames()), '3, 5')
+
+	def testRerenderFramesIncludeGaps(self):
+		for frame in (1, 2, 5, 6):
+			self.write(frame)
+
+		self.write(6, size=0)
+		report = verifySequence(self.sequence([1, 2, 5, 6]))
+
+		self.assertEqual(str(report.getRerenderFrames()), '3, 4, 6')
+
+	def testHashContents(self):
+		for frame in range(1, 4):
+			self.write(frame)
+
+		os.makedirs(self.path(4)) # Can be stat'ed, but not read
+		report = verifySequence(self.sequence(range(1, 5)), window=0, hashContents=True, useThreads=True, processes=2)
+
+		self.assertEqual(report.getIssues(), {4:FrameIssue.UNREADABLE})
+		self.assertEqual(report.getChecksums(), dict((frame, hashFile(self.path(frame))[1]) for frame in range(1, 4)))
+
+	def testCachedChecksumsAreReused(self):
+		for frame in range(1, 4):
+			self.write(frame)
+
+		cache = ChecksumCache(os.path.join(self.dir, 'checksums.json'))
+		verifySequence(self.sequence(range(1, 4)), hashContents=True, useThreads=True, cache=cache)
+
+		stat = os.stat(self.path(2))
+		cache.setChecksum(self.path(2), stat.st_size, stat.st_mtime, 'cached')
+		cache = ChecksumCache(cache.getPath()) # Persisted
+		report = verifySequence(self.sequence(range(1, 4)), hashContents=True, useThreads=True, cache=cache)
+
+		self.assertEqual(report.getChecksums()[2], 'cached')
+		self.assertEqual(report.getChecksums()[1], hashFile(self.path(1))[1])
+
+		self.write(2, size=1001) # Changed since it was hashed
+		report = verifySequence(self.sequence(range(1, 4)), hashContents=True, useThreads=True, cache=cache)
+
+		self.assertEqual(report.getChecksums()[2], hashFile(self.path(2))[1])
+
+if __name__ == '__main__':
+	unittest.main()
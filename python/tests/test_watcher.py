@@ -0,0 +1,107 @@
+import os, time, shutil, tempfile, unittest
+
+from sdm.files.fileclassification import FrameSet
+from sdm.files.watcher import SequenceWatcher, _Inotify
+
+class SequenceWatcherTest(unittest.TestCase):
+	useInotify = False
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.arrived = []
+		self.completed = []
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def path(self, frame, padding=4):
+		return os.path.join(self.dir, 'beauty.{}.exr'.format(str(frame).zfill(padding)))
+
+	def write(self, frame, padding=4, age=0):
+		path = self.path(frame, padding)
+
+		with open(path, 'w') as f:
+			f.write('data')
+
+		if age:
+			then = time.time() - age
+
+			os.utime(path, (then, then))
+
+	def watch(self, expected='1-3'):
+		watcher = SequenceWatcher.forFrames(self.dir, 'beauty', 4, 'exr', expected=FrameSet.fromString(expected), onFrameArrived=lambda frame: self.arrived.append(frame.getNumber()), onRangeComplete=self.completed.append, useInotify=self.useInotify)
+		self.addCleanup(watcher.close)
+
+		return watcher
+
+	def testExistingFramesArePickedUp(self):
+		self.write(1, age=60)
+		self.write(2, padding=3, age=60) # Another sequence
+		watcher = self.watch()
+
+		self.assertEqual(self.arrived, [1])
+		self.assertEqual(watcher.getSequence().getFramesAsNumberList(), [1])
+		self.assertFalse(watcher.isComplete())
+
+	def testRangeCompletesOnce(self):
+		self.write(1, age=60)
+		watcher = self.watch()
+
+		self.write(2, age=60)
+		self.write(3, age=60)
+		self.write(4, age=60) # Outside the expected range
+
+		self.assertEqual(watcher.poll(), [2, 3, 4])
+		self.assertTrue(watcher.isComplete())
+		self.assertEqual(self.completed, [watcher.getSequence()])
+		self.assertEqual(watcher.poll(), [])
+		self.assertEqual(self.completed, [watcher.getSequence()])
+		self.assertEqual(self.arrived, [1, 2, 3, 4])
+
+	def testFrameBeingWrittenWaitsForItsSizeToSettle(self):
+		watcher = self.watch()
+
+		self.write(1)
+
+		self.assertEqual(watcher.poll(), []) # Just written, could still be growing
+		self.assertEqual(watcher.poll(), [1])
+		self.assertEqual(self.arrived, [1])
+
+@unittest.skipUnless(_Inotify.isAvailable(), 'inotify is only available on Linux')
+class InotifySequenceWatcherTest(SequenceWatcherTest):
+	useInotify = True
+
+	def testFrameBeingWrittenWaitsForItsSizeToSettle(self):
+		watcher = self.watch()
+
+		with open(self.path(1), 'w') as f:
+			f.write('data')
+			f.flush()
+
+			self.assertEqual(watcher.poll(), []) # Still open
+
+		self.assertEqual(watcher.poll(), [1]) # Closed after writing, no need for a second poll
+
+	def testMovedFramesArrive(self):
+		watcher = self.watch()
+		temp = os.path.join(self.dir, 'beauty.0002.exr.tmp')
+
+		with open(temp, 'w') as f:
+			f.write('data')
+
+		os.rename(temp, self.path(2))
+
+		self.assertEqual(watcher.poll(), [2])
+
+	def testFramesArriveWithoutListing(self):
+		watcher = self.watch('1-2')
+		watcher._rescan = None # Listing again would fail
+
+		self.write(1)
+		self.write(2)
+
+		self.assertEqual(watcher.poll(), [1, 2])
+		self.assertTrue(watcher.isComplete())
+
+if __name__ == '__main__':
+	unittest.main()
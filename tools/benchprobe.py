@@ -0,0 +1,89 @@
+"""Benchmarks reading image resolutions with sdm.houdini.image.probeImage, which parses
+image headers directly, against asking Houdini for each file with hou.imageResolution.
+Must be run with hython, against a directory of existing images (i.e. a texture library).
+
+	hython tools/benchprobe.py DIR [--runs N]
+
+Every image in DIR (not recursively) is probed cold (with the probe cache cleared), then
+again warm (from the probe cache), and finally through hou.imageResolution. Resolutions
+that differ between probeImage and Houdini are reported.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, sys, time, argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(ROOT, 'python'))
+
+import hou
+
+import sdm.houdini.image as image
+
+def best(function, runs):
+	"""Times the given function
+
+	Args:
+		function (callable): The function to time
+		runs (int): The number of times to call it
+
+	Returns:
+		tuple: The fastest time in seconds, and the result of the last call
+	"""
+	times = []
+	result = None
+
+	for i in range(max(1, runs)):
+		start = time.time()
+		result = function()
+		times.append(time.time() - start)
+
+	return min(times), result
+
+def getHoudiniResolution(file):
+	try:
+		return tuple(hou.imageResolution(file))
+	except hou.OperationFailed:
+		return None
+
+def getProbedResolution(file):
+	info = image.probeImage(file)
+
+	return info.getResolution() if info is not None else None
+
+def probeCold(files):
+	image._probeCache.clear()
+
+	return [getProbedResolution(f) for f in files]
+
+def main(argv):
+	parser = argparse.ArgumentParser(description='Benchmark image header probing against hou.imageResolution')
+	parser.add_argument('dir', help='The directory of images to probe')
+	parser.add_argument('--runs', type=int, default=3, help='The number of runs to take the best of')
+	args = parser.parse_args(argv)
+
+	files = sorted(os.path.join(args.dir, name) for name in os.listdir(args.dir))
+	files = [f for f in files if os.path.isfile(f)]
+
+	cold, probed = best(lambda: probeCold(files), args.runs)
+	warm, probed = best(lambda: [getProbedResolution(f) for f in files], args.runs)
+	houdini, resolutions = best(lambda: [getHoudiniResolution(f) for f in files], args.runs)
+
+	recognized = [(f, p, r) for f, p, r in zip(files, probed, resolutions) if p is not None]
+	mismatched = [(f, p, r) for f, p, r in recognized if p != r]
+
+	print('{} files, {} recognized by probeImage, {} by Houdini, best of {}'.format(len(files), len(recognized), len([r for r in resolutions if r is not None]), args.runs))
+	print('  probeImage, cold:        {:>9.3f} s'.format(cold))
+	print('  probeImage, cached:      {:>9.3f} s'.format(warm))
+	print('  hou.imageResolution:     {:>9.3f} s ({:.1f}x the cold probe)'.format(houdini, houdini / max(cold, 1e-9)))
+
+	for f, p, r in mismatched:
+		print('  Mismatch: {} probed as {}, Houdini reads {}'.format(f, p, r))
+
+	return 1 if mismatched else 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,249 @@
+"""Benchmarks sequence discovery in sdm.files.fileclassification against synthetic
+render directories.
+
+	python tools/benchscan.py scanner [--sequences N] [--frames N] [--runs N]
+	python tools/benchscan.py directories [--dirs N] [--latency MS] [--workers N] [--runs N]
+	python tools/benchscan.py gaps [--frames N] [--gaps PERCENT] [--lookups N] [--runs N]
+	python tools/benchscan.py memory [--frames N]
+
+scanner: builds one directory holding N sequences (i.e. the AOVs of a render) and
+compares constructing a Sequence per sequence, each of which lists the directory, with
+a single SequenceScanner.scan() returning all of them.
+
+directories: builds N directories and adds a fixed delay to every listing, standing in
+for the latency of a network file system. Compares scanning them one after the other
+with scanDirectories.
+
+gaps: builds a sequence spanning N frames with a percentage of them randomly missing,
+without touching the disk. Times building its GapIndex and the missing frame and
+membership queries answered from it, against testing list membership for every frame
+in the range (only over the first --linear frames, as that approach is quadratic).
+
+memory: measures with tracemalloc the memory retained by a sequence of N frames stored
+as the array of frame numbers Sequence keeps, against a list holding a Frame per file
+built from its parsed file name, as Sequence stored them before. Requires Python 3.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, re, sys, time, random, shutil, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(ROOT, 'python'))
+
+try:
+	import tracemalloc
+except ImportError: # Python 2
+	tracemalloc = None
+
+import sdm.files.fileclassification as fileclassification
+from sdm.files.fileclassification import Frame, GapIndex, Sequence, SequenceScanner, getFramePattern, scanDirectories
+
+def makeSequenceDir(dir, sequences, frames, ext='exr'):
+	"""Fills the given directory with empty frame files
+
+	Args:
+		dir (str): The directory to write to
+		sequences (int): The number of sequences, named beauty_0, beauty_1, etc.
+		frames (int): The number of frames of each sequence, starting at 1001
+
+	Returns:
+		list: The prefix of each sequence
+	"""
+	prefixes = ['beauty_{}'.format(i) for i in range(sequences)]
+
+	for prefix in prefixes:
+		for frame in range(1001, 1001 + frames):
+			open(os.path.join(dir, '{}.{:04d}.{}'.format(prefix, frame, ext)), 'w').close()
+
+	return prefixes
+
+def best(function, runs):
+	"""Times the given function
+
+	Args:
+		function (callable): The function to time
+		runs (int): The number of times to call it
+
+	Returns:
+		tuple: The fastest time in seconds, and the result of the last call
+	"""
+	times = []
+	result = None
+
+	for i in range(max(1, runs)):
+		start = time.time()
+		result = function()
+		times.append(time.time() - start)
+
+	return min(times), result
+
+def benchScanner(args):
+	dir = tempfile.mkdtemp()
+
+	try:
+		prefixes = makeSequenceDir(dir, args.sequences, args.frames)
+		perSequence, sequences = best(lambda: [Sequence(dir, prefix=re.escape(prefix), ext='exr') for prefix in prefixes], args.runs)
+		scanner, scanned = best(lambda: SequenceScanner(dir).scan(), args.runs)
+	finally:
+		shutil.rmtree(dir)
+
+	assert sorted(len(s) for s in sequences) == sorted(len(s) for s in scanned)
+
+	print('{} sequences x {} frames ({} files), best of {}'.format(args.sequences, args.frames, args.sequences * args.frames, args.runs))
+	print('  Sequence() per sequence: {:>9.3f} s'.format(perSequence))
+	print('  SequenceScanner.scan():  {:>9.3f} s ({:.1f}x)'.format(scanner, perSequence / max(scanner, 1e-9)))
+
+def benchDirectories(args):
+	root = tempfile.mkdtemp()
+	listDirectory = fileclassification.listDirectory
+
+	def slowListDirectory(dir, *listArgs, **kwargs):
+		time.sleep(latency)
+
+		return listDirectory(dir, *listArgs, **kwargs)
+
+	latency = args.latency / 1000.0
+	fileclassification.listDirectory = slowListDirectory
+
+	try:
+		dirs = []
+
+		for i in range(args.dirs):
+			dir = os.path.join(root, 'shot_{}'.format(i))
+			os.makedirs(dir)
+			makeSequenceDir(dir, args.sequences, args.frames)
+			dirs.append(dir)
+
+		serial, sequences = best(lambda: [SequenceScanner(dir).scan() for dir in dirs], args.runs)
+		concurrent, scanned = best(lambda: list(scanDirectories(dirs, workers=args.workers)), args.runs)
+	finally:
+		fileclassification.listDirectory = listDirectory
+		shutil.rmtree(root)
+
+	assert sum(len(s) for s in sequences) == sum(len(s) for dir, s in scanned)
+
+	print('{} directories x {} sequences x {} frames, {:.0f} ms per listing, best of {}'.format(args.dirs, args.sequences, args.frames, args.latency, args.runs))
+	print('  Serial loop:                   {:>9.3f} s'.format(serial))
+	print('  scanDirectories({} workers):    {:>9.3f} s ({:.1f}x)'.format(args.workers, concurrent, serial / max(concurrent, 1e-9)))
+
+def benchGaps(args):
+	rand = random.Random(0)
+	numbers = [n for n in range(1, args.frames + 1) if rand.random() * 100 >= args.gaps]
+	sequence = Sequence.fromFrameNumbers('/renders', 'beauty', 4, 'exr', numbers)
+	lookups = [rand.randint(1, args.frames) for i in range(args.lookups)]
+
+	def linearMissing():
+		present = numbers[:args.linear] # A list, as getMissingFrames searched before GapIndex
+		end = present[-1]
+
+		return [f for f in range(present[0], end + 1) if f not in present]
+
+	def missing():
+		sequence._gapIndex = None # Include building the index
+
+		return sequence.getMissingFrames()
+
+	build, index = best(lambda: GapIndex(sequence.getFramesAsNumberList()), args.runs)
+	indexed, missingFrames = best(missing, args.runs)
+	formatted, text = best(lambda: sequence.getMissingFrames(format=True), args.runs)
+	contains, found = best(lambda: sum(1 for n in lookups if sequence.hasFrame(n)), args.runs)
+	linear, linearFrames = best(linearMissing, args.runs)
+
+	assert index.getFrameCount() == len(numbers)
+	assert len(missingFrames) == args.frames - len(numbers) - (args.frames - numbers[-1]) - (numbers[0] - 1)
+	assert linearFrames == [f for f in missingFrames if f < numbers[args.linear - 1]]
+
+	print('{} frames, {} missing in {} gaps, best of {}'.format(args.frames, len(missingFrames), index.getRunCount() - 1, args.runs))
+	print('  GapIndex build:                    {:>9.3f} s'.format(build))
+	print('  getMissingFrames() with build:     {:>9.3f} s'.format(indexed))
+	print('  getMissingFrames(format=True):     {:>9.3f} s ({} characters)'.format(formatted, len(text)))
+	print('  {:<35}{:>9.3f} s ({} present)'.format('{} hasFrame() lookups:'.format(args.lookups), contains, found))
+	print('  {:<35}{:>9.3f} s'.format('List membership, first {} frames:'.format(args.linear), linear))
+
+def measure(function):
+	"""Measures the memory allocated by the given function with tracemalloc
+
+	Args:
+		function (callable): The function to call
+
+	Returns:
+		tuple: The bytes still allocated once it returns, the peak bytes allocated
+			while it ran, and its result, which is kept alive until then
+	"""
+	tracemalloc.start()
+
+	try:
+		result = function()
+		retained, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+
+	return retained, peak, result
+
+def benchMemory(args):
+	if tracemalloc is None:
+		raise SystemExit('The memory benchmark requires tracemalloc (Python 3)')
+
+	names = ['beauty.{:04d}.exr'.format(n) for n in range(1001, 1001 + args.frames)]
+	regx = getFramePattern()
+
+	def frameList():
+		return [Frame(*regx.match(name).groups()) for name in names]
+
+	def numberArray():
+		return Sequence.fromFrameNumbers('/renders', 'beauty', 4, 'exr', [int(regx.match(name).group('framePadding')) for name in names])
+
+	frameRetained, framePeak, frames = measure(frameList)
+	arrayRetained, arrayPeak, sequence = measure(numberArray)
+
+	assert [f.getNumber() for f in frames] == sequence.getFramesAsNumberList()
+
+	mb = 1024.0 * 1024.0
+
+	print('{} frames'.format(args.frames))
+	print('  Frame per file:      {:>8.1f} MB retained, {:>8.1f} MB peak'.format(frameRetained / mb, framePeak / mb))
+	print('  Frame number array:  {:>8.1f} MB retained, {:>8.1f} MB peak ({:.1f}x less retained)'.format(arrayRetained / mb, arrayPeak / mb, frameRetained / float(max(arrayRetained, 1))))
+
+def main(argv):
+	parser = argparse.ArgumentParser(description='Benchmark sequence discovery')
+	commands = parser.add_subparsers(dest='command')
+	commands.required = True
+
+	scanner = commands.add_parser('scanner', help='One SequenceScanner against a Sequence per sequence')
+	scanner.add_argument('--sequences', type=int, default=40, help='The number of sequences in the directory')
+	scanner.add_argument('--frames', type=int, default=2500, help='The number of frames of each sequence')
+	scanner.add_argument('--runs', type=int, default=3, help='The number of runs to take the best of')
+	scanner.set_defaults(run=benchScanner)
+
+	directories = commands.add_parser('directories', help='scanDirectories against a serial loop, with simulated listing latency')
+	directories.add_argument('--dirs', type=int, default=48, help='The number of directories to scan')
+	directories.add_argument('--sequences', type=int, default=4, help='The number of sequences in each directory')
+	directories.add_argument('--frames', type=int, default=100, help='The number of frames of each sequence')
+	directories.add_argument('--latency', type=float, default=50, help='The delay added to every listing, in milliseconds')
+	directories.add_argument('--workers', type=int, default=8, help='The number of workers of scanDirectories')
+	directories.add_argument('--runs', type=int, default=3, help='The number of runs to take the best of')
+	directories.set_defaults(run=benchDirectories)
+
+	gaps = commands.add_parser('gaps', help='GapIndex queries against list membership, without touching the disk')
+	gaps.add_argument('--frames', type=int, default=1000000, help='The number of frames the sequence spans')
+	gaps.add_argument('--gaps', type=float, default=1, help='The percentage of frames that are missing')
+	gaps.add_argument('--lookups', type=int, default=100000, help='The number of hasFrame lookups')
+	gaps.add_argument('--linear', type=int, default=20000, help='The number of frames to test list membership over')
+	gaps.add_argument('--runs', type=int, default=3, help='The number of runs to take the best of')
+	gaps.set_defaults(run=benchGaps)
+
+	memory = commands.add_parser('memory', help='Memory retained by Sequence frame storage against a Frame per file')
+	memory.add_argument('--frames', type=int, default=200000, help='The number of frames of the sequence')
+	memory.set_defaults(run=benchMemory)
+
+	args = parser.parse_args(argv)
+	args.run(args)
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
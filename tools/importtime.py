@@ -0,0 +1,223 @@
+"""Measures what SDMTools adds to Houdini's startup, by running houdini/scripts/123.py
+outside of Houdini against stand-ins for hou, hdefereval and PySide2.
+
+	python tools/importtime.py [--runs N] [--run-deferred] [--top N]
+
+Reports the time 123.py takes to run, the SDMTools modules it loaded and whether it
+configured logging. On Python 3.7+, the modules that took longest to import are listed
+too, parsed from the output of -X importtime.
+
+__author__ = Sasha Ouellet (www.sashaouellet.com)
+__version__ = 1.0.0
+__date__ = 10/17/26
+"""
+
+import os, sys, json, shutil, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_SCRIPT = os.path.join(ROOT, 'houdini', 'scripts', '123.py')
+
+STUB = '''import sys
+
+class _Stub(object):
+	"""Stands in for any attribute, call or class of the module"""
+	def __init__(self, name):
+		self.__dict__['_name'] = name
+
+	def __getattr__(self, attr):
+		if attr.startswith('__'):
+			raise AttributeError(attr)
+
+		return _Stub(self._name + '.' + attr)
+
+	def __call__(self, *args, **kwargs):
+		return _Stub(self._name + '()')
+
+	def __iter__(self):
+		return iter([])
+
+	def __nonzero__(self):
+		return False
+
+	__bool__ = __nonzero__
+
+	def __repr__(self):
+		return self._name
+'''
+
+HOU_STUB = STUB + '''
+_module = sys.modules[__name__] # Python 2 clears the globals of modules once they're unreferenced
+sys.modules[__name__] = _Stub('hou')
+sys.modules[__name__]._module = _module
+'''
+
+HDEFEREVAL_STUB = '''deferred = []
+
+def executeDeferred(function, *args, **kwargs):
+	deferred.append((function, args, kwargs))
+
+def executeInMainThreadWithResult(function, *args, **kwargs):
+	return function(*args, **kwargs)
+'''
+
+QT_NAMES = ['QObject', 'QDialog', 'QFile', 'QCheckBox', 'QLineEdit', 'QHeaderView', 'QAbstractItemView', 'QTableWidgetItem', 'QUiLoader', 'Qt']
+
+QT_STUB = STUB + ''.join('''
+class {0}(object):
+	def __init__(self, *args, **kwargs):
+		pass
+
+	def __getattr__(self, attr):
+		return _Stub('{0}.' + attr)
+'''.format(name) for name in QT_NAMES)
+
+CHILD = '''import sys, time
+
+sys.stderr.write('SDM_START\\n')
+sys.stderr.flush()
+start = time.time()
+namespace = {'__name__':'__main__', '__file__':SCRIPT}
+
+exec(compile(open(SCRIPT).read(), SCRIPT, 'exec'), namespace)
+
+result = {'seconds':time.time() - start, 'errors':[]}
+
+if RUN_DEFERRED:
+	import hdefereval
+
+	start = time.time()
+
+	for function, args, kwargs in hdefereval.deferred:
+		try:
+			function(*args, **kwargs)
+		except Exception as e:
+			result['errors'].append('{}: {}'.format(function.__name__, e))
+
+	result['deferredSeconds'] = time.time() - start
+
+sys.stderr.write('SDM_END\\n')
+sys.stderr.flush()
+
+import json, logging
+
+result['modules'] = sorted(m for m in sys.modules if (m == 'sdm' or m.startswith('sdm.')) and sys.modules[m] is not None)
+result['loggingConfigured'] = not any(type(h).__name__ == 'DeferredLoggingHandler' for h in logging.getLogger('sdm').handlers) and 'sdm.houdini' in sys.modules
+
+sys.stdout.write('RESULT ' + json.dumps(result) + '\\n')
+'''
+
+def writeStubs(dir):
+	"""Writes the stand-in modules to the given directory
+
+	Args:
+		dir (str): The directory to put on the PYTHONPATH of the measured process
+	"""
+	with open(os.path.join(dir, 'hou.py'), 'w') as f:
+		f.write(HOU_STUB)
+
+	with open(os.path.join(dir, 'hdefereval.py'), 'w') as f:
+		f.write(HDEFEREVAL_STUB)
+
+	package = os.path.join(dir, 'PySide2')
+	os.makedirs(package)
+
+	with open(os.path.join(package, '__init__.py'), 'w') as f:
+		f.write('')
+
+	for module in ('QtCore', 'QtGui', 'QtWidgets', 'QtUiTools'):
+		with open(os.path.join(package, module + '.py'), 'w') as f:
+			f.write(QT_STUB)
+
+def supportsImportTime():
+	return sys.version_info >= (3, 7)
+
+def parseImportTimes(output):
+	"""Parses the report of -X importtime
+
+	Args:
+		output (str): The stderr of the process
+
+	Returns:
+		list: The (module, self microseconds, cumulative microseconds) of each import done
+			by 123.py (and its deferred functions), rather than by the interpreter or harness
+	"""
+	times = []
+	measuring = False
+
+	for line in output.splitlines():
+		if line in ('SDM_START', 'SDM_END'):
+			measuring = line == 'SDM_START'
+			continue
+
+		if not measuring or not line.startswith('import time:') or 'self [us]' in line:
+			continue
+
+		selfTime, cumulative, name = line[len('import time:'):].split('|')
+		times.append((name.rstrip(), int(selfTime), int(cumulative)))
+
+	return times
+
+def measure(runDeferred=False):
+	"""Runs 123.py once in a fresh interpreter
+
+	Args:
+		runDeferred (bool, optional): Whether to also run the functions it defers until the UI is up
+
+	Returns:
+		tuple: The result reported by the process, and the import times (empty if -X importtime
+			is not supported)
+	"""
+	stubDir = tempfile.mkdtemp()
+
+	try:
+		writeStubs(stubDir)
+
+		env = dict(os.environ)
+		env['PYTHONPATH'] = os.pathsep.join([stubDir, os.path.join(ROOT, 'python')])
+		code = 'SCRIPT = {!r}\nRUN_DEFERRED = {!r}\n'.format(STARTUP_SCRIPT, runDeferred) + CHILD
+		args = [sys.executable] + (['-X', 'importtime'] if supportsImportTime() else []) + ['-c', code]
+		process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=stubDir)
+		out, err = process.communicate()
+		out, err = out.decode('utf-8', 'replace'), err.decode('utf-8', 'replace')
+	finally:
+		shutil.rmtree(stubDir)
+
+	for line in out.splitlines():
+		if line.startswith('RESULT '):
+			return json.loads(line[len('RESULT '):]), parseImportTimes(err)
+
+	raise RuntimeError('123.py failed:\n' + err[-4000:])
+
+def main(argv):
+	parser = argparse.ArgumentParser(description='Measure the startup cost of SDMTools')
+	parser.add_argument('--runs', type=int, default=5, help='The number of runs to take the best of')
+	parser.add_argument('--run-deferred', action='store_true', help='Also run the functions 123.py defers until the UI is up')
+	parser.add_argument('--top', type=int, default=10, help='The number of slowest imports to list')
+	args = parser.parse_args(argv)
+
+	runs = [measure(args.run_deferred) for i in range(max(1, args.runs))]
+	result, times = min(runs, key=lambda run: run[0]['seconds'])
+
+	print('123.py: {:.2f} ms (best of {})'.format(result['seconds'] * 1000, len(runs)))
+
+	if args.run_deferred:
+		print('Deferred functions: {:.2f} ms'.format(result['deferredSeconds'] * 1000))
+
+		for error in result['errors']:
+			print('  error in {}'.format(error))
+
+	print('Logging configured: {}'.format('yes' if result['loggingConfigured'] else 'no'))
+	print('SDMTools modules loaded ({}): {}'.format(len(result['modules']), ', '.join(result['modules']) or '-'))
+
+	if times:
+		print('Slowest imports (cumulative):')
+
+		for name, selfTime, cumulative in sorted(times, key=lambda t: -t[2])[:args.top]:
+			print('  {:>9.2f} ms  {}'.format(cumulative / 1000.0, name.strip()))
+	elif not supportsImportTime():
+		print('(-X importtime needs Python 3.7+, only the total is measured)')
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))